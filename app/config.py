@@ -1,4 +1,5 @@
 from pydantic_settings import BaseSettings
+from typing import Literal
 
 """
 Config class for the Halo AI Scribe application.
@@ -15,11 +16,79 @@ class Settings(BaseSettings):
     ANTHROPIC_API_KEY: The Anthropic API key for the application.
     DEEPGRAM_API_KEY: The Deepgram API key for the application.
     CIPHER: The cipher for the application.
+    CIPHER_VERSION: The key version that new ciphertexts are tagged with.
+    CIPHER_PREVIOUS: Retired ciphers by key version, as JSON (e.g. {"1": "old-cipher"}).
+    KEY_ROTATION_ON_STARTUP: Whether to re-encrypt documents to the newest key in the background at startup.
+    KEY_ROTATION_BATCH_SIZE: Number of documents read per batch during key rotation.
+    BLIND_INDEX_KEY: The secret for email blind indexes. Defaults to CIPHER; set it before rotating CIPHER.
+    USAGE_FLUSH_INTERVAL: Seconds between bulk writes of buffered usage counters.
+    USAGE_MAX_LOSS_WINDOW: Maximum seconds a usage increment is buffered before it is written inline; the most usage lost on a crash. 0 writes every increment through.
+    SESSION_CACHE_SIZE: Maximum number of valid sessions cached per process.
+    SESSION_CACHE_TTL: Maximum seconds a session stays cached; bounds how long a session deleted by another process is still accepted here.
+    ADMIN_CACHE_SIZE, TEMPLATE_CACHE_SIZE, USER_CACHE_SIZE: Maximum number of admins, templates and users cached per process.
+    ADMIN_CACHE_TTL, TEMPLATE_CACHE_TTL, USER_CACHE_TTL: Maximum seconds an admin, template or user stays cached; bounds how long a change made by another process goes unseen here.
+    ACTIVE_VISIT_CACHE_SIZE: Maximum number of recording, paused and note-generating visits cached per process.
+    ACTIVE_VISIT_CACHE_TTL: Maximum seconds an active visit stays cached without being written.
+    FINISHED_VISIT_GRACE_PERIOD: Seconds a visit stays cached after it is FINISHED.
+    SESSION_BACKEND: 'mongo' to store sessions in MongoDB, or 'signed' for stateless HMAC-signed session tokens.
+    SESSION_SIGNING_KEY: The secret for signing session tokens. Defaults to CIPHER.
+    SESSION_REVOCATION_REFRESH: Seconds between reloads of tokens revoked by other processes; bounds how long a signed-out token is still accepted elsewhere.
+    WEBSOCKET_QUEUE_SIZE: Maximum number of frames queued for a websocket connection before its overflow policy applies.
+    WEBSOCKET_STREAM_OVERFLOW: Overflow policy for streaming frames: 'drop_oldest' or 'disconnect'. Delta protocol clients resync after a dropped delta.
+    WEBSOCKET_CONTROL_OVERFLOW: Overflow policy for all other frames: 'drop_oldest' or 'disconnect'.
+    STREAM_FLUSH_INTERVAL: Minimum seconds between callbacks for a streamed LLM response; 0 calls back on every text event.
+    STREAM_FLUSH_CHARS: Number of new characters in a streamed LLM response that triggers a callback before the interval has passed.
+    BROADCAST_BACKPLANE: 'local' to deliver websocket broadcasts within one process, or 'mongo' to share them between workers through a capped collection.
+    BROADCAST_COLLECTION_SIZE: Size in bytes of the capped collection used by the 'mongo' backplane.
+    WEBSOCKET_HEARTBEAT_INTERVAL: Seconds between websocket health checks, each of which pings every connection.
+    WEBSOCKET_IDLE_TIMEOUT: Seconds without any message from a client, pongs included, before its connection is evicted; only applies once the client has answered a ping.
+    WEBSOCKET_MAX_CONNECTIONS_PER_USER: Maximum open websocket connections per user per process; the least recently active one is evicted beyond it.
+    COMMAND_CONCURRENCY: Maximum websocket commands running at once per user; commands for the same visit or template always run one at a time.
+    COMMAND_QUEUE_SIZE: Maximum pending and running websocket commands per user; further commands are rejected with a queue_full error.
+    REPLAY_BUFFER_SIZE: Number of recent broadcast events kept per user for clients resuming a websocket session.
+    REPLAY_RETENTION: Seconds a user's replay buffer is kept after their last websocket connection closes.
+    SYNC_TOMBSTONE_RETENTION: Seconds deletions are remembered for /user/sync; clients with an older cursor reload their lists.
     """
     MONGODB_URL: str
     ANTHROPIC_API_KEY: str
     DEEPGRAM_API_KEY: str
     CIPHER: str
+    CIPHER_VERSION: int = 1
+    CIPHER_PREVIOUS: dict[int, str] = {}
+    KEY_ROTATION_ON_STARTUP: bool = True
+    KEY_ROTATION_BATCH_SIZE: int = 100
+    BLIND_INDEX_KEY: str = ""
+    USAGE_FLUSH_INTERVAL: float = 10
+    USAGE_MAX_LOSS_WINDOW: float = 30
+    SESSION_CACHE_SIZE: int = 10000
+    SESSION_CACHE_TTL: float = 60
+    ADMIN_CACHE_SIZE: int = 16
+    ADMIN_CACHE_TTL: float = 300
+    TEMPLATE_CACHE_SIZE: int = 5000
+    TEMPLATE_CACHE_TTL: float = 300
+    USER_CACHE_SIZE: int = 5000
+    USER_CACHE_TTL: float = 60
+    ACTIVE_VISIT_CACHE_SIZE: int = 1000
+    ACTIVE_VISIT_CACHE_TTL: float = 14400
+    FINISHED_VISIT_GRACE_PERIOD: float = 300
+    SESSION_BACKEND: Literal['mongo', 'signed'] = 'mongo'
+    SESSION_SIGNING_KEY: str = ""
+    SESSION_REVOCATION_REFRESH: float = 30
+    WEBSOCKET_QUEUE_SIZE: int = 64
+    WEBSOCKET_STREAM_OVERFLOW: Literal['drop_oldest', 'disconnect'] = 'drop_oldest'
+    WEBSOCKET_CONTROL_OVERFLOW: Literal['drop_oldest', 'disconnect'] = 'disconnect'
+    STREAM_FLUSH_INTERVAL: float = 0.1
+    STREAM_FLUSH_CHARS: int = 400
+    BROADCAST_BACKPLANE: Literal['local', 'mongo'] = 'local'
+    BROADCAST_COLLECTION_SIZE: int = 64 * 1024 * 1024
+    WEBSOCKET_HEARTBEAT_INTERVAL: float = 30
+    WEBSOCKET_IDLE_TIMEOUT: float = 90
+    WEBSOCKET_MAX_CONNECTIONS_PER_USER: int = 10
+    COMMAND_CONCURRENCY: int = 4
+    COMMAND_QUEUE_SIZE: int = 32
+    REPLAY_BUFFER_SIZE: int = 256
+    REPLAY_RETENTION: float = 300
+    SYNC_TOMBSTONE_RETENTION: float = 30 * 24 * 3600
     class Config:
         env_file = ".env"
 
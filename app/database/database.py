@@ -1,10 +1,24 @@
 from app.config import settings
-from app.services.utils import decrypt, encrypt, hash_password
+from app.services.utils import decrypt, encrypt, hash_password, email_index
+from app.services.keyring import keyring
+from app.database.records import UserRecord, TemplateRecord, VisitRecord
+from app.database.usage import UsageBuffer
+from app.database.indexes import IndexManager
+from app.services.cache import TTLCache
+from app.services.tokens import SessionSigner, derive_session_signing_key
 from bson import ObjectId
 from datetime import datetime, timedelta
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from app.services.logging import logger
-import json
+import anyio.from_thread
+import asyncio
+import base64
+import copy
+import functools
+import inspect
+import re
+import weakref
 
 """
 MongoDB Database Handler for the Halo Application.
@@ -18,15 +32,132 @@ Key features:
 - User authentication and management
 - Template management
 - Visit tracking and statistics
+- Delta sync of visits and templates changed since a cursor, with tombstones for deletions
 
-All database operations are encapsulated in the database class,
-with proper error handling and logging.
+All database operations are encapsulated in the async_database class, which uses
+pymongo's async API so Mongo round-trips never block the event loop. The database
+class is a synchronous facade over the same instance for `def` endpoints.
 """
 
-class database:
+ENCRYPTED_FIELDS = {
+    'users': ['encrypt_name', 'encrypt_email', 'emr_integration.encrypt_credentials'],
+    'templates': ['encrypt_name', 'encrypt_instructions', 'encrypt_print', 'encrypt_header', 'encrypt_footer'],
+    'visits': ['encrypt_name', 'encrypt_additional_context', 'encrypt_transcript', 'encrypt_note'],
+    'admins': ['encrypt_name', 'encrypt_email', 'encrypt_master_note_generation_instructions', 'encrypt_master_template_polish_instructions'],
+}
+
+ACTIVE_VISIT_STATUSES = ('RECORDING', 'PAUSED', 'GENERATING_NOTE')
+
+VISIT_SUMMARY_FIELDS = ['visit_id', 'name', 'status', 'created_at', 'modified_at', 'recording_started_at', 'recording_finished_at', 'recording_duration']
+TEMPLATE_SUMMARY_FIELDS = ['template_id', 'name', 'status', 'created_at', 'modified_at']
+
+# Changes written this long before a sync may still be in flight, so a completed
+# sync's cursor trails the current time by this much and recent changes are resent.
+SYNC_OVERLAP = timedelta(seconds=5)
+
+ENCRYPTED_ARRAY_FIELDS = {
+    'visits': {'transcript_segments': 'encrypt_text'},
+}
+
+def encode_visit_cursor(visit):
+    """
+    Encode the keyset position of a visit as an opaque cursor.
+
+    Args:
+        visit (dict): The raw visit document.
+
+    Returns:
+        str: The cursor.
+    """
+    return base64.urlsafe_b64encode(f"{visit['created_at'].isoformat()}|{visit['_id']}".encode()).decode()
+
+def decode_visit_cursor(cursor):
+    """
+    Decode a cursor produced by encode_visit_cursor.
+
+    Args:
+        cursor (str): The cursor.
+
+    Returns:
+        tuple: The created_at datetime and ObjectId of the last visit returned.
+    """
+    created_at, visit_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    return datetime.fromisoformat(created_at), ObjectId(visit_id)
+
+def encode_sync_cursor(synced_at, document_id=None):
+    """
+    Encode a sync position as an opaque cursor.
+
+    Args:
+        synced_at (datetime): The sync time of the position.
+        document_id (ObjectId, optional): The last document returned at that time, when a
+                                          sync page ends there. Defaults to None.
+
+    Returns:
+        str: The cursor.
+    """
+    return base64.urlsafe_b64encode(f"{synced_at.isoformat()}|{document_id or ''}".encode()).decode()
+
+def decode_sync_cursor(cursor):
+    """
+    Decode a cursor produced by encode_sync_cursor.
+
+    Args:
+        cursor (str): The cursor.
+
+    Returns:
+        tuple: The synced_at datetime and the ObjectId of the last document returned, or None.
+    """
+    synced_at, document_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    return datetime.fromisoformat(synced_at), ObjectId(document_id) if document_id else None
+
+def get_field(document, path):
+    """
+    Read a dotted field path from a document.
+
+    Args:
+        document (dict): The document to read from.
+        path (str): The dotted field path.
+
+    Returns:
+        The value at the path, or None if any part of the path is missing.
+    """
+    value = document
+    for part in path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def literal_fields(fields):
+    """
+    Wrap field values so an update pipeline stores them as-is.
+
+    Args:
+        fields (dict): Field names mapped to plain values.
+
+    Returns:
+        dict: The fields with every value wrapped in $literal.
+    """
+    return {field: {'$literal': value} for field, value in fields.items()}
+
+def stored_duration(path='$recording_duration'):
+    """
+    Build an aggregation expression reading a stored recording duration as a number.
+
+    Args:
+        path (str, optional): The field path of the duration. Defaults to '$recording_duration'.
+
+    Returns:
+        dict: The expression, which evaluates to 0 for missing or malformed durations.
+    """
+    return {'$convert': {'input': path, 'to': 'double', 'onError': 0, 'onNull': 0}}
+
+class async_database:
     """
     Main database class that handles all interactions with MongoDB.
-    Provides methods for CRUD operations on users, sessions, templates, and visits.
+    Provides async methods for CRUD operations on users, sessions, templates, and visits.
     """
     def __init__(self):
         """
@@ -38,17 +169,68 @@ class database:
             Exception: If there's an error connecting to the database.
         """
         try:
-            self.client = MongoClient(settings.MONGODB_URL)
+            self.client = AsyncMongoClient(settings.MONGODB_URL)
             self.database = self.client['database']
             self.sessions = self.database['sessions']
             self.users = self.database['users']
             self.templates = self.database['templates']
             self.visits = self.database['visits']
             self.admins = self.database['admins']
+            self.daily_statistics = self.database['daily_statistics']
+            self.indexes = IndexManager(self.database)
+            self.revoked_sessions = self.database['revoked_sessions']
+            self.tombstones = self.database['tombstones']
+            self.session_cache = TTLCache(settings.SESSION_CACHE_SIZE, settings.SESSION_CACHE_TTL)
+            self.admin_cache = TTLCache(settings.ADMIN_CACHE_SIZE, settings.ADMIN_CACHE_TTL)
+            self.template_cache = TTLCache(settings.TEMPLATE_CACHE_SIZE, settings.TEMPLATE_CACHE_TTL)
+            self.user_cache = TTLCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL)
+            self.visit_cache = TTLCache(settings.ACTIVE_VISIT_CACHE_SIZE, settings.ACTIVE_VISIT_CACHE_TTL)
+            self.visit_locks = weakref.WeakValueDictionary()
+            self.session_signer = SessionSigner(derive_session_signing_key(settings.SESSION_SIGNING_KEY or settings.CIPHER)) if settings.SESSION_BACKEND == 'signed' else None
+            self.usage = UsageBuffer(self.daily_statistics, settings.USAGE_FLUSH_INTERVAL, settings.USAGE_MAX_LOSS_WINDOW)
         except Exception as e:
             logger.error(f"Database initialization error: {str(e)}")
             raise
 
+    async def load_record(self, cache, collection, record_type, document_id):
+        """
+        Read a whole document through a cache as a lazily decrypted record.
+        
+        Args:
+            cache (TTLCache): The cache for the collection.
+            collection: The collection to read from on a cache miss.
+            record_type (type): The Record subclass to wrap the document in.
+            document_id (str): The ID of the document.
+            
+        Returns:
+            Record: The cached or freshly loaded record, or None if not found.
+            
+        Note:
+            Cached records keep the fields they have already decrypted, so repeated reads
+            of a hot document cost neither a round-trip nor a decryption.
+            A document invalidated while it is being read is returned but not cached.
+        """
+        record = cache.get(document_id)
+        if record is None:
+            generation = cache.begin_load(document_id)
+            try:
+                document = await collection.find_one({'_id': ObjectId(document_id)})
+                record = record_type(document) if document else None
+            finally:
+                cache.finish_load(document_id, generation, record)
+        return record
+
+    async def warm_caches(self):
+        """
+        Load the admin document and the default templates into their caches.
+        """
+        try:
+            await self.get_admin()
+            async for template in self.templates.find({'status': 'DEFAULT'}):
+                self.template_cache.set(str(template['_id']), TemplateRecord(template))
+        except Exception as e:
+            logger.error(f"warm_caches error: {str(e)}")
+
     def decrypt_session(self, session):
         """
         Decrypt and format a session document from the database.
@@ -73,7 +255,7 @@ class database:
             logger.error(f"decrypt_session error for session_id {session.get('_id', 'unknown')}: {str(e)}")
             return None
 
-    def create_session(self, user_id):
+    async def create_session(self, user_id):
         """
         Create a new session for a user.
         
@@ -84,17 +266,23 @@ class database:
             dict: The newly created session document, or None if creation failed.
             
         Note:
-            Session expiration is set to 1 minute from creation.
+            Session expiration is set to 1 day from creation.
+            With the 'signed' session backend, the session ID is a signed token and nothing is stored.
+            Otherwise the new session is cached, so the requests that follow sign-in skip the lookup.
         """
         try:
             session = {'user_id': user_id, 'expiration_date': datetime.utcnow() + timedelta(days=1)}
-            self.sessions.insert_one(session)
+            if self.session_signer:
+                session['expiration_date'] = session['expiration_date'].replace(microsecond=0)
+                return self.decrypt_session({**session, '_id': self.session_signer.sign(user_id, session['expiration_date'])})
+            await self.sessions.insert_one(session)
+            self.cache_session(str(session['_id']), user_id, session['expiration_date'])
             return self.decrypt_session(session)
         except Exception as e:
             logger.error(f"create_session error for user_id {user_id}: {str(e)}")
             return None
 
-    def delete_session(self, session_id):
+    async def delete_session(self, session_id):
         """
         Delete a session from the database.
         
@@ -103,13 +291,26 @@ class database:
             
         Note:
             This method does not return a value, and logs any errors.
+            The session is evicted from this process's session cache first.
+            With the 'signed' session backend, the token is added to the revocation list instead.
         """
         try:
-            self.sessions.delete_one({'_id': ObjectId(session_id)})
+            if self.session_signer:
+                claims = self.session_signer.decode(session_id)
+                if claims:
+                    self.session_signer.revoke(claims['token_id'], claims['expiration_date'])
+                    await self.revoked_sessions.update_one(
+                        {'_id': claims['token_id']},
+                        {'$set': {'expiration_date': claims['expiration_date']}},
+                        upsert=True
+                    )
+                return
+            self.session_cache.delete(session_id)
+            await self.sessions.delete_one({'_id': ObjectId(session_id)})
         except Exception as e:
             logger.error(f"delete_session error for session_id {session_id}: {str(e)}")
 
-    def get_session(self, session_id):
+    async def get_session(self, session_id):
         """
         Retrieve a session by its ID.
         
@@ -120,13 +321,31 @@ class database:
             dict: The session document with formatted fields, or None if not found or error occurs.
         """
         try:
-            session = self.sessions.find_one({'_id': ObjectId(session_id)})
+            if self.session_signer:
+                claims = self.session_signer.verify(session_id)
+                return self.decrypt_session({'_id': session_id, 'user_id': claims['user_id'], 'expiration_date': claims['expiration_date']}) if claims else None
+            session = await self.sessions.find_one({'_id': ObjectId(session_id)})
             return self.decrypt_session(session)
         except Exception as e:
             logger.error(f"get_session error for session_id {session_id}: {str(e)}")
             return None
 
-    def is_session_valid(self, session_id):
+    def cache_session(self, session_id, user_id, expiration_date):
+        """
+        Cache a valid session until it expires.
+        
+        Args:
+            session_id (str): The ID of the session.
+            user_id (str): The ID of the user the session belongs to.
+            expiration_date (datetime): When the session expires.
+            
+        Returns:
+            str: The user_id.
+        """
+        self.session_cache.set(session_id, user_id, (expiration_date - datetime.utcnow()).total_seconds())
+        return user_id
+
+    async def is_session_valid(self, session_id):
         """
         Check if a session is valid (exists and not expired).
         
@@ -135,17 +354,58 @@ class database:
             
         Returns:
             str: The user_id associated with the session if valid, None otherwise.
+            
+        Note:
+            Signed session tokens are verified without a database lookup.
+            Valid Mongo sessions are served from the session cache until they expire or
+            SESSION_CACHE_TTL passes, whichever is sooner, without a database lookup.
+            A session deleted while it is being read is not cached.
         """
         try:
-            session = self.get_session(session_id)
-            if session:
-                if datetime.fromisoformat(session['expiration_date'].replace('Z', '+00:00')) > datetime.utcnow():
-                    return session['user_id']
-            return None
+            if self.session_signer:
+                claims = self.session_signer.verify(session_id)
+                return claims['user_id'] if claims else None
+            user_id = self.session_cache.get(session_id)
+            if user_id is not None:
+                return user_id
+            generation = self.session_cache.begin_load(session_id)
+            user_id = ttl = None
+            try:
+                session = await self.sessions.find_one({'_id': ObjectId(session_id)}, {'user_id': 1, 'expiration_date': 1})
+                if session and session['expiration_date'] > datetime.utcnow():
+                    user_id = str(session['user_id'])
+                    ttl = (session['expiration_date'] - datetime.utcnow()).total_seconds()
+            finally:
+                self.session_cache.finish_load(session_id, generation, user_id, ttl)
+            return user_id
         except Exception as e:
             logger.error(f"is_session_valid error for session_id {session_id}: {str(e)}")
             return None
 
+    async def refresh_revoked_sessions(self):
+        """
+        Load session tokens revoked by any process into this process's revocation list.
+        
+        Note:
+            Only revocations of unexpired tokens are kept; a TTL index removes the rest.
+        """
+        try:
+            revoked = {document['_id']: document['expiration_date'] async for document in self.revoked_sessions.find()}
+            self.session_signer.merge_revocations(revoked)
+        except Exception as e:
+            logger.error(f"refresh_revoked_sessions error: {str(e)}")
+
+    async def watch_revoked_sessions(self, interval):
+        """
+        Refresh the revocation list every interval until cancelled.
+        
+        Args:
+            interval (float): Seconds between refreshes.
+        """
+        while True:
+            await self.refresh_revoked_sessions()
+            await asyncio.sleep(interval)
+
     def decrypt_user(self, user):
         """
         Decrypt and format a user document from the database.
@@ -157,34 +417,16 @@ class database:
             dict: The decrypted user document with formatted fields, or None if error occurs.
             
         Note:
-            Converts ObjectIds to strings and decrypts sensitive fields.
+            Compatibility wrapper over UserRecord that decrypts every loaded field.
+            Use get_user_record to decrypt fields only when they are read.
         """
         try:
-            user_copy = user.copy()
-            user_copy['user_id'] = str(user_copy['_id'])
-            user_copy['visit_ids'] = [str(visit_id) for visit_id in user_copy['visit_ids']]
-            user_copy['template_ids'] = [str(template_id) for template_id in user_copy['template_ids']]
-            user_copy['name'] = decrypt(user_copy['encrypt_name'])
-            user_copy['email'] = decrypt(user_copy['encrypt_email'])
-            user_copy['created_at'] = str(user_copy['created_at'])
-            user_copy['modified_at'] = str(user_copy['modified_at'])
-            if 'emr_integration' in user_copy and user_copy['emr_integration']:
-                emr_integration = user_copy['emr_integration']
-                if 'encrypt_credentials' in emr_integration:
-                    decrypted_credentials = decrypt(emr_integration['encrypt_credentials'])
-                    emr_integration['credentials'] = json.loads(decrypted_credentials) if decrypted_credentials else {}
-                    del emr_integration['encrypt_credentials']
-                user_copy['emr_integration'] = emr_integration
-            del user_copy['_id']
-            del user_copy['encrypt_name']
-            del user_copy['encrypt_email']
-            del user_copy['hash_password']
-            return user_copy
+            return UserRecord(user).to_dict()
         except Exception as e:
             logger.error(f"decrypt_user error for user_id {user.get('_id', 'unknown')}: {str(e)}")
             return None
     
-    def create_user(self, name, email, password):
+    async def create_user(self, name, email, password):
         """
         Create a new user in the database.
         
@@ -197,17 +439,14 @@ class database:
             dict: The newly created user document with decrypted fields, or None if creation failed.
             
         Note:
-            Checks for existing users with the same email before creation.
+            Checks for existing users with the same email before creation using the email blind index.
             Automatically assigns default templates to new users.
         """
         try:
             encrypted_email = encrypt(email)
-            all_users = list(self.users.find())
-            for user in all_users:
-                decrypted_email = decrypt(user['encrypt_email'])
-                if decrypted_email == email:
-                    return None
-            default_templates = list(self.templates.find({'status': 'DEFAULT'}))
+            if await self.users.find_one({'index_email': email_index(email)}, {'_id': 1}):
+                return None
+            default_templates = await self.templates.find({'status': 'DEFAULT'}).to_list()
             default_template_ids = [template['_id'] for template in default_templates]
             default_template_id = str(default_templates[-1]['_id']) if default_templates else ''
             user = {
@@ -216,22 +455,24 @@ class database:
                 'status': 'ACTIVE',
                 'encrypt_name': encrypt(name),
                 'encrypt_email': encrypted_email,
+                'index_email': email_index(email),
                 'hash_password': hash_password(password),
                 'user_specialty': '',
                 'default_template_id': default_template_id,
                 'default_language': 'en',
                 'template_ids': default_template_ids,
                 'visit_ids': [],
-                'daily_statistics': {},
                 'emr_integration': {}
             }
-            self.users.insert_one(user)
+            await self.users.insert_one(user)
             return self.decrypt_user(user)
+        except DuplicateKeyError:
+            return None
         except Exception as e:
             logger.error(f"create_user error for email {email}: {str(e)}")
             return None
         
-    def update_user(self, user_id, name=None, email=None, password=None, user_specialty=None, default_template_id=None, default_language=None, template_ids=None, visit_ids=None, emr_integration=None):
+    async def update_user(self, user_id, name=None, email=None, password=None, user_specialty=None, default_template_id=None, default_language=None, template_ids=None, visit_ids=None, emr_integration=None):
         """
         Update a user's information in the database.
         
@@ -256,6 +497,7 @@ class database:
                 update_fields['encrypt_name'] = encrypt(name)
             if email is not None:
                 update_fields['encrypt_email'] = encrypt(email)
+                update_fields['index_email'] = email_index(email)
             if password is not None:
                 update_fields['hash_password'] = hash_password(password)
             if default_template_id is not None:
@@ -272,14 +514,16 @@ class database:
                 update_fields['emr_integration'] = emr_integration
             if update_fields:
                 update_fields['modified_at'] = datetime.utcnow()
-                self.users.update_one({'_id': ObjectId(user_id)}, {'$set': update_fields})
-            user = self.users.find_one({'_id': ObjectId(user_id)})
-            return self.decrypt_user(user)
+                user = await self.users.find_one_and_update({'_id': ObjectId(user_id)}, {'$set': update_fields}, return_document=ReturnDocument.AFTER)
+                self.user_cache.delete(user_id)
+            else:
+                user = await self.users.find_one({'_id': ObjectId(user_id)})
+            return self.decrypt_user(user) if user else None
         except Exception as e:
             logger.error(f"update_user error for user_id {user_id}: {str(e)}")
             return None
     
-    def delete_user(self, user_id):
+    async def delete_user(self, user_id):
         """
         Delete a user from the database.
         
@@ -290,30 +534,53 @@ class database:
             bool: True if deletion was successful, False otherwise.
         """
         try:
-            self.users.delete_one({'_id': ObjectId(user_id)})
+            await self.users.delete_one({'_id': ObjectId(user_id)})
+            self.user_cache.delete(user_id)
             return True
         except Exception as e:
             logger.error(f"delete_user error for user_id {user_id}: {str(e)}")
             return False
     
-    def get_user(self, user_id):
+    async def get_user(self, user_id, fields=None):
         """
         Retrieve a user by their ID.
         
         Args:
             user_id (str): The ID of the user to retrieve.
+            fields (list, optional): The user fields to return. Defaults to all fields.
             
         Returns:
             dict: The user document with decrypted fields, or None if not found or error occurs.
         """
         try:
-            user = self.users.find_one({'_id': ObjectId(user_id)})
-            return self.decrypt_user(user)
+            user = await self.get_user_record(user_id)
+            return copy.deepcopy(user.to_dict(fields)) if user else None
         except Exception as e:
             logger.error(f"get_user error for user_id {user_id}: {str(e)}")
             return None
+
+    async def get_user_record(self, user_id, fields=None):
+        """
+        Retrieve a user by their ID as a lazily decrypted record.
+        
+        Args:
+            user_id (str): The ID of the user to retrieve.
+            fields (list, optional): The user fields the caller reads. Users are cached whole
+                and fields are decrypted only when read, so this does not narrow the query.
+            
+        Returns:
+            UserRecord: The user record, or None if not found or error occurs.
+            
+        Note:
+            Served from the user cache; callers must not modify the record's values.
+        """
+        try:
+            return await self.load_record(self.user_cache, self.users, UserRecord, user_id)
+        except Exception as e:
+            logger.error(f"get_user_record error for user_id {user_id}: {str(e)}")
+            return None
     
-    def get_user_by_email(self, email):
+    async def get_user_by_email(self, email):
         """
         Retrieve a user by their email address.
         
@@ -324,17 +591,13 @@ class database:
             dict: The user document with decrypted fields, or None if not found or error occurs.
         """
         try:
-            all_users = list(self.users.find())
-            for user in all_users:
-                decrypted_email = decrypt(user['encrypt_email'])
-                if decrypted_email == email:
-                    return self.decrypt_user(user)
-            return None
+            user = await self.users.find_one({'index_email': email_index(email)})
+            return self.decrypt_user(user) if user else None
         except Exception as e:
             logger.error(f"get_user_by_email error for email {email}: {str(e)}")
             return None
     
-    def verify_user(self, email, password):
+    async def verify_user(self, email, password):
         """
         Verify a user's login credentials.
         
@@ -346,37 +609,160 @@ class database:
             dict: The user document with decrypted fields if credentials are valid, None otherwise.
         """
         try:
-            hashed_password = hash_password(password)
-            all_users = list(self.users.find())
-            for user in all_users:
-                decrypted_email = decrypt(user['encrypt_email'])
-                if decrypted_email == email and user['hash_password'] == hashed_password:
-                    return self.decrypt_user(user)
-            return None
+            user = await self.users.find_one({'index_email': email_index(email), 'hash_password': hash_password(password)})
+            return self.decrypt_user(user) if user else None
         except Exception as e:
             logger.error(f"verify_user error for email {email}: {str(e)}")
             return None
     
-    def get_user_templates(self, user_id):
+    async def get_user_templates(self, user_id, fields=None):
         """
         Retrieve all templates associated with a user.
         
         Args:
             user_id (str): The ID of the user.
+            fields (list, optional): The template fields to load. Defaults to all fields.
             
         Returns:
             list: A list of template documents with decrypted fields, or empty list if error occurs.
         """
         try:
-            user = self.get_user(user_id)
+            user = await self.users.find_one({'_id': ObjectId(user_id)}, {'template_ids': 1})
             template_ids = [ObjectId(tid) for tid in user['template_ids']]
-            templates = list(self.templates.find({'_id': {'$in': template_ids}}))
+            templates = await self.templates.find({'_id': {'$in': template_ids}}, TemplateRecord.projection(fields)).to_list()
             return [self.decrypt_template(template) for template in templates]
         except Exception as e:
             logger.error(f"get_user_templates error for user_id {user_id}: {str(e)}")
             return []
 
-    def get_user_visits(self, user_id, subset=False, offset=0, limit=20):
+    async def get_bootstrap(self, user_id, visit_limit=10):
+        """
+        Assemble everything a client loads on connect: the user's profile, template summaries and first page of visit summaries.
+        
+        Args:
+            user_id (str): The ID of the user.
+            visit_limit (int, optional): Minimum number of visits in the first page. Defaults to 10.
+            
+        Returns:
+            dict: The user under 'user', template summaries under 'templates', and visit summaries
+                  and the next page's cursor under 'visits' and 'next_cursor', or None if not found or error occurs.
+            
+        Note:
+            The user is read once, from the user cache, and its template_ids drive the template query.
+            Templates and visits are then queried concurrently, decrypting only summary fields.
+            The visit page matches /user/get_visits with subset=True: today's visits and at least visit_limit.
+        """
+        try:
+            user = await self.get_user_record(user_id)
+            if not user:
+                return None
+            today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+            template_ids = [ObjectId(template_id) for template_id in user.get('template_ids') or []]
+            templates, visits = await asyncio.gather(
+                self.templates.find({'_id': {'$in': template_ids}}, TemplateRecord.projection(TEMPLATE_SUMMARY_FIELDS)).to_list(),
+                self.list_visit_summaries(user_id, limit=visit_limit, expand_since=today)
+            )
+            return {
+                'user': copy.deepcopy(user.to_dict()),
+                'templates': [TemplateRecord(template).to_dict() for template in templates],
+                'visits': visits['visits'],
+                'next_cursor': visits['next_cursor']
+            }
+        except Exception as e:
+            logger.error(f"get_bootstrap error for user_id {user_id}: {str(e)}")
+            return None
+
+    async def get_changes(self, user_id, since=None, limit=100):
+        """
+        List the visits and templates a user's client must update since a sync cursor.
+        
+        Args:
+            user_id (str): The ID of the user.
+            since (tuple, optional): The previous sync's cursor, as returned by decode_sync_cursor.
+                                     Defaults to None, which asks for a reset.
+            limit (int, optional): Maximum number of changes of each kind to return. Defaults to 100.
+            
+        Returns:
+            dict: Visit and template summaries created or modified since the cursor under 'visits'
+                  and 'templates', the IDs of deleted visits and templates under 'deleted', the
+                  next sync's cursor under 'cursor', whether more changes remain under 'has_more'
+                  and whether the client must reload its lists under 'reset'.
+                  None if error occurs.
+            
+        Note:
+            Every write to a visit or template sets its synced_at, and tombstones carry the
+            deletion time as synced_at. Served by the (user_id, synced_at, _id) indexes on
+            visits, templates and tombstones, regardless of how many visits the user has.
+            Default templates are included.
+            Pages are keyset paginated on (synced_at, _id), so changes sharing a timestamp are
+            never skipped or repeated between pages.
+            When since is missing or older than the tombstone retention, deletions may have
+            been forgotten, so only reset and a fresh cursor are returned; the client reloads
+            its lists with /user/get_visits and /user/get_templates and syncs from the cursor.
+            The cursor of a completed sync trails the current time by SYNC_OVERLAP, so recent
+            changes may be sent again and should be applied idempotently.
+        """
+        try:
+            now = datetime.utcnow()
+            empty = {'visits': [], 'templates': [], 'deleted': {'visits': [], 'templates': []}, 'has_more': False}
+            if since is None or since[0] < now - timedelta(seconds=settings.SYNC_TOMBSTONE_RETENTION):
+                return {**empty, 'cursor': encode_sync_cursor(now - SYNC_OVERLAP), 'reset': True}
+            synced_at, document_id = since
+            if document_id:
+                position = {'$or': [{'synced_at': {'$gt': synced_at}}, {'synced_at': synced_at, '_id': {'$gt': document_id}}]}
+            else:
+                position = {'synced_at': {'$gte': synced_at}}
+            order = [('synced_at', 1), ('_id', 1)]
+            visits, templates, tombstones = await asyncio.gather(
+                self.visits.find({'user_id': user_id, **position}, {**VisitRecord.projection(VISIT_SUMMARY_FIELDS), 'synced_at': 1}).sort(order).limit(limit + 1).to_list(),
+                self.templates.find({'user_id': {'$in': [user_id, 'HALO']}, **position}, {**TemplateRecord.projection(TEMPLATE_SUMMARY_FIELDS), 'synced_at': 1}).sort(order).limit(limit + 1).to_list(),
+                self.tombstones.find({'user_id': {'$in': [user_id, 'HALO']}, **position}, {'kind': 1, 'id': 1, 'synced_at': 1}).sort(order).limit(limit + 1).to_list()
+            )
+            truncated = [(documents[limit - 1]['synced_at'], documents[limit - 1]['_id'])
+                         for documents in (visits, templates, tombstones) if len(documents) > limit]
+            if truncated:
+                cursor = min(truncated)
+                visits, templates, tombstones = ([document for document in documents[:limit] if (document['synced_at'], document['_id']) <= cursor]
+                                                 for documents in (visits, templates, tombstones))
+            else:
+                cursor = (max(synced_at, now - SYNC_OVERLAP), None)
+            return {
+                'visits': [self.decrypt_visit(visit) for visit in visits],
+                'templates': [TemplateRecord(template).to_dict() for template in templates],
+                'deleted': {
+                    'visits': [tombstone['id'] for tombstone in tombstones if tombstone['kind'] == 'visit'],
+                    'templates': [tombstone['id'] for tombstone in tombstones if tombstone['kind'] == 'template'],
+                },
+                'cursor': encode_sync_cursor(*cursor),
+                'has_more': bool(truncated),
+                'reset': False
+            }
+        except Exception as e:
+            logger.error(f"get_changes error for user_id {user_id}: {str(e)}")
+            return None
+
+    async def create_tombstone(self, user_id, kind, id):
+        """
+        Record a deletion for clients syncing with get_changes.
+        
+        Args:
+            user_id (str): The ID of the user who owned the deleted document, or 'HALO' for default templates.
+            kind (str): 'visit' or 'template'.
+            id (str): The ID of the deleted document.
+            
+        Note:
+            Tombstones expire SYNC_TOMBSTONE_RETENTION seconds after the deletion through a TTL index.
+        """
+        now = datetime.utcnow()
+        await self.tombstones.insert_one({
+            'user_id': user_id,
+            'kind': kind,
+            'id': str(id),
+            'synced_at': now,
+            'expires_at': now + timedelta(seconds=settings.SYNC_TOMBSTONE_RETENTION)
+        })
+
+    async def get_user_visits(self, user_id, subset=False, offset=0, limit=20, fields=None):
         """
         Retrieve visits associated with a user.
         
@@ -386,13 +772,15 @@ class database:
                                     If False, uses pagination with offset and limit. Defaults to False.
             offset (int, optional): Number of visits to skip for pagination. Defaults to 0.
             limit (int, optional): Maximum number of visits to return. Defaults to 20.
+            fields (list, optional): The visit fields to load. Defaults to all fields.
             
         Returns:
             list: A list of visit documents with decrypted fields, or empty list if error occurs.
         """
         try:
-            user = self.get_user(user_id)
+            user = await self.users.find_one({'_id': ObjectId(user_id)}, {'visit_ids': 1})
             visit_ids = [ObjectId(vid) for vid in user['visit_ids']]
+            projection = VisitRecord.projection(fields)
             
             if subset:
                 today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
@@ -400,18 +788,67 @@ class database:
                     '_id': {'$in': visit_ids},
                     'created_at': {'$gte': today, '$lt': today + timedelta(days=1)}
                 }
-                today_visits = list(self.visits.find(query).sort('created_at', -1))
+                today_visits = await self.visits.find(query, projection).sort('created_at', -1).to_list()
                 if len(today_visits) >= 10:
                     return [self.decrypt_visit(visit) for visit in today_visits]
-                return [self.decrypt_visit(visit) for visit in 
-                       self.visits.find({'_id': {'$in': visit_ids}}).sort('created_at', -1).limit(10)]
+                return [self.decrypt_visit(visit) async for visit in 
+                       self.visits.find({'_id': {'$in': visit_ids}}, projection).sort('created_at', -1).limit(10)]
             else:
-                return [self.decrypt_visit(visit) for visit in 
-                       self.visits.find({'_id': {'$in': visit_ids}}).sort('created_at', -1).skip(offset).limit(limit)]
+                return [self.decrypt_visit(visit) async for visit in 
+                       self.visits.find({'_id': {'$in': visit_ids}}, projection).sort('created_at', -1).skip(offset).limit(limit)]
         except Exception as e:
             logger.error(f"get_user_visits error for user_id {user_id}: {str(e)}")
             return []
 
+    async def list_visit_summaries(self, user_id, cursor=None, limit=20, start=None, end=None, expand_since=None):
+        """
+        List a user's visits newest first as compact summaries, with keyset pagination.
+        
+        Args:
+            user_id (str): The ID of the user.
+            cursor (str, optional): The next_cursor from the previous page. Defaults to the first page.
+            limit (int, optional): Maximum number of visits to return. Defaults to 20.
+            start (datetime, optional): Only include visits created at or after this time.
+            end (datetime, optional): Only include visits created before this time.
+            expand_since (datetime, optional): Also include every visit created at or after this
+                                               time, even beyond the limit.
+            
+        Returns:
+            dict: The visit summaries under 'visits' and the cursor for the next page under
+                  'next_cursor' (None on the last page), or an empty page if error occurs.
+            
+        Note:
+            Summaries contain only VISIT_SUMMARY_FIELDS, so transcripts and notes are never read.
+            Served by the (user_id, created_at, _id) index regardless of how many visits the user has.
+        """
+        try:
+            query = {'user_id': user_id}
+            if start or end:
+                query['created_at'] = {}
+                if start: query['created_at']['$gte'] = start
+                if end: query['created_at']['$lt'] = end
+            if cursor:
+                created_at, visit_id = decode_visit_cursor(cursor)
+                query['$or'] = [{'created_at': {'$lt': created_at}}, {'created_at': created_at, '_id': {'$lt': visit_id}}]
+            results = self.visits.find(query, VisitRecord.projection(VISIT_SUMMARY_FIELDS)).sort([('created_at', -1), ('_id', -1)])
+            if expand_since is None:
+                results = results.limit(limit + 1)
+            visits = []
+            has_more = False
+            async for visit in results:
+                if len(visits) >= limit and (expand_since is None or visit['created_at'] < expand_since):
+                    has_more = True
+                    break
+                visits.append(visit)
+            await results.close()
+            return {
+                'visits': [self.decrypt_visit(visit) for visit in visits],
+                'next_cursor': encode_visit_cursor(visits[-1]) if has_more else None
+            }
+        except Exception as e:
+            logger.error(f"list_visit_summaries error for user_id {user_id}: {str(e)}")
+            return {'visits': [], 'next_cursor': None}
+
     def decrypt_template(self, template):
         """
         Decrypt and format a template document from the database.
@@ -423,31 +860,16 @@ class database:
             dict: The decrypted template document with formatted fields, or None if error occurs.
             
         Note:
-            Converts ObjectIds to strings and decrypts sensitive fields.
+            Compatibility wrapper over TemplateRecord that decrypts every loaded field.
+            Use get_template_record to decrypt fields only when they are read.
         """
         try:
-            template_copy = template.copy()
-            template_copy['template_id'] = str(template_copy['_id'])
-            template_copy['user_id'] = str(template_copy['user_id'])
-            template_copy['created_at'] = str(template_copy['created_at'])
-            template_copy['modified_at'] = str(template_copy['modified_at'])
-            template_copy['name'] = decrypt(template_copy['encrypt_name'])
-            template_copy['instructions'] = decrypt(template_copy['encrypt_instructions'])
-            template_copy['print'] = decrypt(template_copy['encrypt_print'])
-            if 'encrypt_header' in template_copy: template_copy['header'] = decrypt(template_copy['encrypt_header'])
-            if 'encrypt_footer' in template_copy: template_copy['footer'] = decrypt(template_copy['encrypt_footer'])
-            del template_copy['_id']
-            del template_copy['encrypt_name']
-            del template_copy['encrypt_instructions']
-            del template_copy['encrypt_print']
-            if 'encrypt_header' in template_copy: del template_copy['encrypt_header']
-            if 'encrypt_footer' in template_copy: del template_copy['encrypt_footer']
-            return template_copy
+            return TemplateRecord(template).to_dict()
         except Exception as e:
             logger.error(f"decrypt_template error for template_id {template.get('_id', 'unknown')}: {str(e)}")
             return None
     
-    def create_template(self, user_id, status="READY", name="New Template", instructions=""):
+    async def create_template(self, user_id, status="READY", name="New Template", instructions=""):
         """
         Create a new template for a user.
         
@@ -461,11 +883,11 @@ class database:
             The template is initialized with default values and added to the user's template_ids.
         """
         try:
-            user = self.get_user(user_id)
             template = {
                 'user_id': user_id,
                 'created_at': datetime.utcnow(),
                 'modified_at': datetime.utcnow(),
+                'synced_at': datetime.utcnow(),
                 'status': status,
                 'encrypt_name': encrypt(name),
                 'encrypt_instructions': encrypt(instructions),
@@ -473,19 +895,21 @@ class database:
                 'encrypt_header': encrypt(''),
                 'encrypt_footer': encrypt(''),
             }
-            self.templates.insert_one(template)
-            self.users.update_one({'_id': ObjectId(user_id)}, {'$push': {'template_ids': template['_id']}})
+            await self.templates.insert_one(template)
+            await self.users.update_one({'_id': ObjectId(user_id)}, {'$push': {'template_ids': template['_id']}})
+            self.user_cache.delete(user_id)
             return self.decrypt_template(template)
         except Exception as e:
             logger.error(f"create_template error for user_id {user_id}: {str(e)}")
             return None
 
-    def update_template(self, template_id, status=None, name=None, instructions=None, print=None, header=None, footer=None):
+    async def update_template(self, template_id, status=None, name=None, instructions=None, print=None, header=None, footer=None):
         """
         Update a template's information in the database.
         
         Args:
             template_id (str): The ID of the template to update.
+            status (str, optional): The template's new status.
             name (str, optional): The template's new name.
             instructions (str, optional): The template's new instructions.
             print (str, optional): The template's new print format.
@@ -494,6 +918,10 @@ class database:
             
         Returns:
             dict: The updated template document with decrypted fields, or None if update failed.
+            
+        Note:
+            modified_at only changes with the instructions. synced_at is set on any change,
+            so /user/sync picks up renames and status changes.
         """
         try:
             update_fields = {}
@@ -512,14 +940,17 @@ class database:
             if instructions is not None:
                 update_fields['modified_at'] = datetime.utcnow()
             if update_fields:
-                self.templates.update_one({'_id': ObjectId(template_id)}, {'$set': update_fields})
-            template = self.templates.find_one({'_id': ObjectId(template_id)})
-            return self.decrypt_template(template)
+                update_fields['synced_at'] = datetime.utcnow()
+                template = await self.templates.find_one_and_update({'_id': ObjectId(template_id)}, {'$set': update_fields}, return_document=ReturnDocument.AFTER)
+                self.template_cache.delete(template_id)
+            else:
+                template = await self.templates.find_one({'_id': ObjectId(template_id)})
+            return self.decrypt_template(template) if template else None
         except Exception as e:
             logger.error(f"update_template error for template_id {template_id}: {str(e)}")
             return None
 
-    def delete_template(self, template_id, user_id):
+    async def delete_template(self, template_id, user_id):
         """
         Delete a template from the database and remove it from the user's template list.
         
@@ -531,29 +962,54 @@ class database:
             bool: True if deletion was successful, False otherwise.
         """
         try:
-            self.templates.delete_one({'_id': ObjectId(template_id)})
-            self.users.update_one({'_id': ObjectId(user_id)}, {'$pull': {'template_ids': ObjectId(template_id)}})
+            await self.templates.delete_one({'_id': ObjectId(template_id)})
+            await self.users.update_one({'_id': ObjectId(user_id)}, {'$pull': {'template_ids': ObjectId(template_id)}})
+            await self.create_tombstone(user_id, 'template', template_id)
+            self.template_cache.delete(template_id)
+            self.user_cache.delete(user_id)
             return True
         except Exception as e:
             logger.error(f"delete_template error for template_id {template_id}, user_id {user_id}: {str(e)}")
             return False
 
-    def get_template(self, template_id):
+    async def get_template(self, template_id, fields=None):
         """
         Retrieve a template by its ID.
         
         Args:
             template_id (str): The ID of the template to retrieve.
+            fields (list, optional): The template fields to return. Defaults to all fields.
             
         Returns:
             dict: The template document with decrypted fields, or None if not found or error occurs.
         """
         try:
-            template = self.templates.find_one({'_id': ObjectId(template_id)})
-            return self.decrypt_template(template)
+            template = await self.get_template_record(template_id)
+            return copy.deepcopy(template.to_dict(fields)) if template else None
         except Exception as e:
             logger.error(f"get_template error for template_id {template_id}: {str(e)}")
             return None
+
+    async def get_template_record(self, template_id, fields=None):
+        """
+        Retrieve a template by its ID as a lazily decrypted record.
+        
+        Args:
+            template_id (str): The ID of the template to retrieve.
+            fields (list, optional): The template fields the caller reads. Templates are cached
+                whole and fields are decrypted only when read, so this does not narrow the query.
+            
+        Returns:
+            TemplateRecord: The template record, or None if not found or error occurs.
+            
+        Note:
+            Served from the template cache; callers must not modify the record's values.
+        """
+        try:
+            return await self.load_record(self.template_cache, self.templates, TemplateRecord, template_id)
+        except Exception as e:
+            logger.error(f"get_template_record error for template_id {template_id}: {str(e)}")
+            return None
     
     def decrypt_visit(self, visit):
         """
@@ -566,32 +1022,16 @@ class database:
             dict: The decrypted visit document with formatted fields, or None if error occurs.
             
         Note:
-            Converts ObjectIds to strings and decrypts sensitive fields.
+            Compatibility wrapper over VisitRecord that decrypts every loaded field.
+            Use get_visit_record to decrypt fields only when they are read.
         """
         try:
-            visit_copy = visit.copy()
-            visit_copy['visit_id'] = str(visit_copy['_id'])
-            visit_copy['user_id'] = str(visit_copy['user_id'])
-            visit_copy['created_at'] = str(visit_copy['created_at'])
-            visit_copy['modified_at'] = str(visit_copy['modified_at'])
-            if visit_copy['template_modified_at']: visit_copy['template_modified_at'] = str(visit_copy['template_modified_at'])
-            if visit_copy['recording_started_at']: visit_copy['recording_started_at'] = str(visit_copy['recording_started_at'])
-            if visit_copy['recording_finished_at']: visit_copy['recording_finished_at'] = str(visit_copy['recording_finished_at'])
-            visit_copy['name'] = decrypt(visit_copy['encrypt_name'])
-            visit_copy['additional_context'] = decrypt(visit_copy['encrypt_additional_context'])
-            visit_copy['transcript'] = decrypt(visit_copy['encrypt_transcript'])
-            visit_copy['note'] = decrypt(visit_copy['encrypt_note'])
-            del visit_copy['_id']
-            del visit_copy['encrypt_name']
-            del visit_copy['encrypt_additional_context']
-            del visit_copy['encrypt_transcript']
-            del visit_copy['encrypt_note']
-            return visit_copy
+            return VisitRecord(visit).to_dict()
         except Exception as e:
             logger.error(f"decrypt_visit error for visit_id {visit.get('_id', 'unknown')}: {str(e)}")
             return None
     
-    def create_visit(self, user_id):
+    async def create_visit(self, user_id):
         """
         Create a new visit for a user.
         
@@ -606,11 +1046,12 @@ class database:
             Also updates the user's daily statistics.
         """
         try:
-            user = self.get_user(user_id)
+            user = await self.get_user_record(user_id, fields=['default_template_id', 'default_language'])
             visit = {
                 'user_id': user_id,
                 'created_at': datetime.utcnow(),
                 'modified_at': datetime.utcnow(),
+                'synced_at': datetime.utcnow(),
                 'status': 'NOT_STARTED',
                 'encrypt_name': encrypt(''),
                 'template_modified_at': datetime.utcnow(),
@@ -621,17 +1062,66 @@ class database:
                 'recording_duration': '',
                 'recording_finished_at': '',
                 'encrypt_transcript': encrypt(''),
+                'transcript_segments': [],
                 'encrypt_note': encrypt(''),
             }
-            self.visits.insert_one(visit)
-            self.users.update_one({'_id': ObjectId(user_id)}, {'$push': {'visit_ids': visit['_id']}})
-            self.update_daily_statistic(user_id, 'visits', 1)
+            await self.visits.insert_one(visit)
+            await self.users.update_one({'_id': ObjectId(user_id)}, {'$push': {'visit_ids': visit['_id']}})
+            self.user_cache.delete(user_id)
+            await self.update_daily_statistic(user_id, 'visits', 1)
             return self.decrypt_visit(visit)
         except Exception as e:
             logger.error(f"create_visit error for user_id {user_id}: {str(e)}")
             return None
     
-    def update_visit(self, visit_id, status=None, name=None, template_modified_at=None, template_id=None, language=None, additional_context=None, recording_started_at=None, recording_duration=None, recording_finished_at=None, transcript=None, note=None):
+    def visit_lock(self, visit_id):
+        """
+        Get the lock that orders writes to a visit within this process.
+        
+        Args:
+            visit_id (str): The ID of the visit.
+            
+        Returns:
+            asyncio.Lock: The visit's lock, which is discarded once no one holds or awaits it.
+            
+        Note:
+            Holding the lock across the write and the cache update keeps the active visit
+            cache in the same order as the database, e.g. a transcript segment appended
+            while a pause is in flight is never lost or applied twice.
+        """
+        lock = self.visit_locks.get(visit_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self.visit_locks[visit_id] = lock
+        return lock
+
+    def cache_visit(self, visit):
+        """
+        Write a freshly updated visit through to the active visit cache.
+        
+        Args:
+            visit (dict): The visit document as stored after the update.
+            
+        Returns:
+            VisitRecord: A record over the visit.
+            
+        Note:
+            Visits that are RECORDING, PAUSED or GENERATING_NOTE are cached; FINISHED visits
+            stay cached for FINISHED_VISIT_GRACE_PERIOD seconds so note generation and naming
+            can still read them. Any other status evicts the visit.
+        """
+        visit_id = str(visit['_id'])
+        record = VisitRecord(visit)
+        record.inherit_transcript(self.visit_cache.peek(visit_id))
+        if visit.get('status') in ACTIVE_VISIT_STATUSES:
+            self.visit_cache.set(visit_id, record)
+        elif visit.get('status') == 'FINISHED':
+            self.visit_cache.set(visit_id, record, settings.FINISHED_VISIT_GRACE_PERIOD)
+        else:
+            self.visit_cache.delete(visit_id)
+        return record
+
+    async def update_visit(self, visit_id, status=None, name=None, template_modified_at=None, template_id=None, language=None, additional_context=None, recording_started_at=None, recording_duration=None, recording_finished_at=None, transcript=None, note=None):
         """
         Update a visit's information in the database.
         
@@ -646,14 +1136,16 @@ class database:
             recording_started_at (datetime, optional): The timestamp when recording started.
             recording_duration (str, optional): The duration of the recording.
             recording_finished_at (datetime, optional): The timestamp when recording finished.
-            transcript (str, optional): The transcript of the visit.
+            transcript (str, optional): The transcript of the visit. Replaces any appended segments.
             note (str, optional): Notes for the visit.
             
         Returns:
             dict: The updated visit document with decrypted fields, or None if update failed.
             
         Note:
-            Updates the user's daily statistics if recording duration changes.
+            Runs as a single find_one_and_update. When the recording duration changes,
+            the increment over the stored duration is computed server-side and added to
+            the user's daily statistics.
         """
         try:
             update_fields = {}
@@ -675,24 +1167,119 @@ class database:
                 update_fields['recording_finished_at'] = recording_finished_at
             if transcript is not None:
                 update_fields['encrypt_transcript'] = encrypt(transcript)
+                update_fields['transcript_segments'] = []
             if note is not None:
                 update_fields['encrypt_note'] = encrypt(note)
             if recording_duration is not None:
-                current_visit = self.visits.find_one({'_id': ObjectId(visit_id)})
                 update_fields['recording_duration'] = recording_duration
-                duration_increment = max(0, float(recording_duration or 0) - float(current_visit.get('recording_duration', 0) or 0))
-                if duration_increment > 0:
-                    self.update_daily_statistic(str(current_visit['user_id']), 'audio_time', duration_increment)
-            if update_fields:
-                update_fields['modified_at'] = datetime.utcnow()
-                self.visits.update_one({'_id': ObjectId(visit_id)}, {'$set': update_fields})            
-            visit = self.visits.find_one({'_id': ObjectId(visit_id)})
-            return self.decrypt_visit(visit)
+            if not update_fields:
+                visit = await self.visits.find_one({'_id': ObjectId(visit_id)})
+                return self.decrypt_visit(visit) if visit else None
+            update_fields['modified_at'] = datetime.utcnow()
+            update_fields['synced_at'] = update_fields['modified_at']
+            if recording_duration is None:
+                update = {'$set': update_fields}
+            else:
+                update = [{'$set': {
+                    **literal_fields(update_fields),
+                    'recording_duration_increment': {'$max': [0, {'$subtract': [float(recording_duration or 0), stored_duration()]}]}
+                }}]
+            async with self.visit_lock(visit_id):
+                visit = await self.visits.find_one_and_update({'_id': ObjectId(visit_id)}, update, return_document=ReturnDocument.AFTER)
+                if not visit:
+                    self.visit_cache.delete(visit_id)
+                    return None
+                record = self.cache_visit(visit)
+            if recording_duration is not None and visit['recording_duration_increment'] > 0:
+                await self.update_daily_statistic(str(visit['user_id']), 'audio_time', visit['recording_duration_increment'])
+            return record.to_dict()
         except Exception as e:
             logger.error(f"update_visit error for visit_id {visit_id}: {str(e)}")
             return None
 
-    def delete_visit(self, visit_id, user_id):
+    async def stop_recording(self, visit_id, status, recording_finished_at=None):
+        """
+        Pause or finish a visit's recording, adding the time since it last started to its duration.
+        
+        Args:
+            visit_id (str): The ID of the visit to update.
+            status (str): The visit's new status ('PAUSED' or 'FINISHED').
+            recording_finished_at (str, optional): The timestamp when recording finished.
+            
+        Returns:
+            dict: The updated visit document with decrypted fields, or None if update failed.
+            
+        Note:
+            The elapsed time is computed server-side from recording_started_at in one
+            find_one_and_update. A missing or malformed start time adds nothing.
+        """
+        try:
+            now = datetime.utcnow()
+            update_fields = {'status': status, 'modified_at': now, 'synced_at': now}
+            if recording_finished_at is not None:
+                update_fields['recording_finished_at'] = recording_finished_at
+            started_at = {'$dateFromString': {'dateString': {'$substrCP': ['$recording_started_at', 0, 23]}, 'onError': None, 'onNull': None}}
+            elapsed = {'$cond': [
+                {'$eq': [{'$type': '$$started_at'}, 'date']},
+                {'$max': [0, {'$floor': {'$divide': [{'$subtract': [now, '$$started_at']}, 1000]}}]},
+                0
+            ]}
+            update = [
+                {'$set': {'recording_duration_increment': {'$let': {'vars': {'started_at': started_at}, 'in': elapsed}}}},
+                {'$set': {
+                    **literal_fields(update_fields),
+                    'recording_duration': {'$toString': {'$toLong': {'$add': [stored_duration(), '$recording_duration_increment']}}}
+                }}
+            ]
+            async with self.visit_lock(visit_id):
+                visit = await self.visits.find_one_and_update({'_id': ObjectId(visit_id)}, update, return_document=ReturnDocument.AFTER)
+                if not visit:
+                    self.visit_cache.delete(visit_id)
+                    return None
+                record = self.cache_visit(visit)
+            if visit['recording_duration_increment'] > 0:
+                await self.update_daily_statistic(str(visit['user_id']), 'audio_time', visit['recording_duration_increment'])
+            return record.to_dict()
+        except Exception as e:
+            logger.error(f"stop_recording error for visit_id {visit_id}: {str(e)}")
+            return None
+
+    async def append_transcript_segment(self, visit_id, text, timestamp, speaker=None):
+        """
+        Append one transcript segment to a visit without reading the existing transcript.
+        
+        Args:
+            visit_id (str): The ID of the visit to append to.
+            text (str): The transcribed text of the segment.
+            timestamp (datetime): When the segment was transcribed.
+            speaker (int, optional): The diarized speaker of the segment.
+            
+        Returns:
+            bool: True if the segment was appended, False otherwise.
+            
+        Note:
+            Each segment is encrypted on its own and written with $push, so the cost
+            of an append does not grow with the length of the recording.
+        """
+        try:
+            segment = {'encrypt_text': encrypt(text), 'timestamp': timestamp, 'speaker': speaker}
+            now = datetime.utcnow()
+            # MongoDB keeps milliseconds; the cached record must carry the stored modified_at to revalidate.
+            modified_at = now.replace(microsecond=now.microsecond // 1000 * 1000)
+            async with self.visit_lock(visit_id):
+                result = await self.visits.update_one(
+                    {'_id': ObjectId(visit_id)},
+                    {'$push': {'transcript_segments': segment}, '$set': {'modified_at': modified_at, 'synced_at': modified_at}}
+                )
+                record = self.visit_cache.peek(visit_id)
+                if record is not None:
+                    record.append_segment(segment, text, modified_at)
+            return result.matched_count == 1
+        except Exception as e:
+            logger.error(f"append_transcript_segment error for visit_id {visit_id}: {str(e)}")
+            return False
+
+    async def delete_visit(self, visit_id, user_id):
         """
         Delete a visit from the database and remove it from the user's visit list.
         
@@ -704,31 +1291,91 @@ class database:
             bool: True if deletion was successful, False otherwise.
         """
         try:
-            self.visits.delete_one({'_id': ObjectId(visit_id)})
-            self.users.update_one({'_id': ObjectId(user_id)}, {'$pull': {'visit_ids': ObjectId(visit_id)}})
+            async with self.visit_lock(visit_id):
+                await self.visits.delete_one({'_id': ObjectId(visit_id)})
+                self.visit_cache.delete(visit_id)
+            await self.users.update_one({'_id': ObjectId(user_id)}, {'$pull': {'visit_ids': ObjectId(visit_id)}})
+            await self.create_tombstone(user_id, 'visit', visit_id)
+            self.user_cache.delete(user_id)
             return True
         except Exception as e:
             logger.error(f"delete_visit error for visit_id {visit_id}, user_id {user_id}: {str(e)}")
             return False
 
-    def get_visit(self, visit_id):
+    async def cached_visit(self, visit_id):
+        """
+        Get a visit from the active visit cache if it is still current.
+        
+        Args:
+            visit_id (str): The ID of the visit.
+            
+        Returns:
+            VisitRecord: The cached record, or None if the visit is not cached or is stale.
+            
+        Note:
+            The cache only sees this process's writes, so a cached visit is checked against
+            the stored modified_at, which every visit write sets. Reading one timestamp is far
+            cheaper than reading and decrypting the visit. A visit written by another worker
+            is evicted and read from MongoDB.
+        """
+        record = self.visit_cache.get(visit_id)
+        if record is None:
+            return None
+        current = await self.visits.find_one({'_id': ObjectId(visit_id)}, {'modified_at': 1})
+        if current and record.matches(current):
+            return record
+        self.visit_cache.delete(visit_id)
+        return None
+
+    async def get_visit(self, visit_id, fields=None):
         """
         Retrieve a visit by its ID.
         
         Args:
             visit_id (str): The ID of the visit to retrieve.
+            fields (list, optional): The visit fields to load. Defaults to all fields.
             
         Returns:
             dict: The visit document with decrypted fields, or None if not found or error occurs.
+            
+        Note:
+            Active visits are served from the active visit cache.
         """
         try:
-            visit = self.visits.find_one({'_id': ObjectId(visit_id)})
+            record = await self.cached_visit(visit_id)
+            if record is not None:
+                return copy.deepcopy(record.to_dict(fields))
+            visit = await self.visits.find_one({'_id': ObjectId(visit_id)}, VisitRecord.projection(fields))
             return self.decrypt_visit(visit)
         except Exception as e:
             logger.error(f"get_visit error for visit_id {visit_id}: {str(e)}")
             return None
 
-    def create_default_template(self, name, instructions, print='', header='', footer=''):
+    async def get_visit_record(self, visit_id, fields=None):
+        """
+        Retrieve a visit by its ID as a lazily decrypted record.
+        
+        Args:
+            visit_id (str): The ID of the visit to retrieve.
+            fields (list, optional): The visit fields to load. Defaults to all fields.
+            
+        Returns:
+            VisitRecord: The visit record, or None if not found or error occurs.
+            
+        Note:
+            Active visits are served from the active visit cache; callers must not modify the record's values.
+        """
+        try:
+            record = await self.cached_visit(visit_id)
+            if record is not None:
+                return record
+            visit = await self.visits.find_one({'_id': ObjectId(visit_id)}, VisitRecord.projection(fields))
+            return VisitRecord(visit) if visit else None
+        except Exception as e:
+            logger.error(f"get_visit_record error for visit_id {visit_id}: {str(e)}")
+            return None
+
+    async def create_default_template(self, name, instructions, print='', header='', footer=''):
         """
         Create a default template available to all users.
         
@@ -750,6 +1397,7 @@ class database:
                 'user_id': 'HALO',
                 'created_at': datetime.utcnow(),
                 'modified_at': datetime.utcnow(),
+                'synced_at': datetime.utcnow(),
                 'status': 'DEFAULT',
                 'encrypt_name': encrypt(name),
                 'encrypt_instructions': encrypt(instructions),
@@ -757,14 +1405,15 @@ class database:
                 'encrypt_header': encrypt(header),
                 'encrypt_footer': encrypt(footer),
             }
-            self.templates.insert_one(template)
-            self.users.update_many({}, {'$push': {'template_ids': template['_id']}})
+            await self.templates.insert_one(template)
+            await self.users.update_many({}, {'$push': {'template_ids': template['_id']}})
+            self.user_cache.clear()
             return self.decrypt_template(template)
         except Exception as e:
             logger.error(f"create_default_template error for name {name}: {str(e)}")
             return None
 
-    def update_default_template(self, template_id, name=None, instructions=None, print=None, header=None, footer=None):
+    async def update_default_template(self, template_id, name=None, instructions=None, print=None, header=None, footer=None):
         """
         Update a default template.
         
@@ -793,13 +1442,16 @@ class database:
                 update_fields['encrypt_footer'] = encrypt(footer)
             if update_fields:
                 update_fields['modified_at'] = datetime.utcnow()
-                self.templates.update_one({'_id': ObjectId(template_id)}, {'$set': update_fields})
-            template = self.templates.find_one({'_id': ObjectId(template_id)})
-            return self.decrypt_template(template)
+                update_fields['synced_at'] = update_fields['modified_at']
+                template = await self.templates.find_one_and_update({'_id': ObjectId(template_id)}, {'$set': update_fields}, return_document=ReturnDocument.AFTER)
+                self.template_cache.delete(template_id)
+            else:
+                template = await self.templates.find_one({'_id': ObjectId(template_id)})
+            return self.decrypt_template(template) if template else None
         except Exception as e:
             logger.error(f"update_default_template error for template_id {template_id}: {str(e)}")
 
-    def delete_default_template(self, template_id):
+    async def delete_default_template(self, template_id):
         """
         Delete a default template and remove it from all users' template lists.
         
@@ -810,14 +1462,17 @@ class database:
             bool: True if deletion was successful, False otherwise.
         """
         try:
-            self.templates.delete_one({'_id': ObjectId(template_id)})
-            self.users.update_many({}, {'$pull': {'template_ids': ObjectId(template_id)}})
+            await self.templates.delete_one({'_id': ObjectId(template_id)})
+            await self.users.update_many({}, {'$pull': {'template_ids': ObjectId(template_id)}})
+            await self.create_tombstone('HALO', 'template', template_id)
+            self.template_cache.delete(template_id)
+            self.user_cache.clear()
             return True
         except Exception as e:
             logger.error(f"delete_default_template error for template_id {template_id}: {str(e)}")
             return False
 
-    def get_default_template(self, template_id):
+    async def get_default_template(self, template_id):
         """
         Retrieve a default template by its ID.
         
@@ -828,13 +1483,13 @@ class database:
             dict: The template document with decrypted fields, or None if not found or error occurs.
         """
         try:
-            template = self.templates.find_one({'_id': ObjectId(template_id)})
-            return self.decrypt_template(template)
+            template = await self.get_template_record(template_id)
+            return copy.deepcopy(template.to_dict()) if template else None
         except Exception as e:
             logger.error(f"get_default_template error for template_id {template_id}: {str(e)}")
             return None
     
-    def get_all_default_templates(self):
+    async def get_all_default_templates(self):
         """
         Retrieve all templates from the database with status 'DEFAULT'.
         
@@ -843,12 +1498,12 @@ class database:
         """
         try:
             templates = self.templates.find({'status': 'DEFAULT'})
-            return [self.decrypt_template(template) for template in templates]
+            return [self.decrypt_template(template) async for template in templates]
         except Exception as e:
             logger.error(f"get_all_default_templates error: {str(e)}")
             return []
 
-    def update_daily_statistic(self, user_id, stat_type, value):
+    async def update_daily_statistic(self, user_id, stat_type, value):
         """
         Update a user's daily statistics.
         
@@ -858,34 +1513,127 @@ class database:
             value: The value to add to the statistic.
             
         Note:
-            Creates a new daily record if one doesn't exist for today.
+            Increments are buffered and written to the daily_statistics collection in bulk.
             For 'visits', increments by 1.
             For 'audio_time', increments by the provided value.
         """
         try:
-            today = datetime.utcnow().strftime('%Y-%m-%d')
-            self.users.update_one(
-                {'_id': ObjectId(user_id), f'daily_statistics.{today}': {'$exists': False}},
-                {'$set': {f'daily_statistics.{today}': {'visits': 0, 'audio_time': 0}}}
-            )
             if stat_type == 'visits':
-                self.users.update_one(
-                    {'_id': ObjectId(user_id)},
-                    {'$inc': {f'daily_statistics.{today}.visits': 1}}
-                )
+                value = 1
             elif stat_type == 'audio_time':
                 if isinstance(value, str):
                     try:
                         value = float(value)
                     except ValueError:
                         value = 0
-                self.users.update_one(
-                    {'_id': ObjectId(user_id)},
-                    {'$inc': {f'daily_statistics.{today}.audio_time': value}}
-                )
+            else:
+                return
+            self.usage.add(user_id, datetime.utcnow().strftime('%Y-%m-%d'), stat_type, value)
+            if self.usage.is_overdue():
+                await self.usage.flush()
         except Exception as e:
             logger.error(f"update_daily_statistic error for user_id {user_id}, stat_type {stat_type}, value {value}: {str(e)}")
 
+    async def get_usage_statistics(self, user_emails=None, start_date=None, end_date=None):
+        """
+        Aggregate users' daily statistics over a date range.
+        
+        Args:
+            user_emails (list, optional): Email addresses of the users to include. Defaults to all users.
+            start_date (str, optional): First date to include (format: YYYY-MM-DD). Defaults to 1970-01-01.
+            end_date (str, optional): Last date to include (format: YYYY-MM-DD). Defaults to today.
+            
+        Returns:
+            dict: Total visits and audio time, plus a per-user breakdown keyed by user_id.
+            
+        Note:
+            Runs as one aggregation over users joined to daily_statistics; only names and
+            emails are decrypted in Python.
+        """
+        start_date = start_date or '1970-01-01'
+        end_date = end_date or datetime.utcnow().strftime('%Y-%m-%d')
+        pipeline = []
+        if user_emails:
+            pipeline.append({'$match': {'index_email': {'$in': [email_index(email) for email in user_emails]}}})
+        pipeline += [
+            {'$project': {'encrypt_name': 1, 'encrypt_email': 1}},
+            {'$lookup': {
+                'from': 'daily_statistics',
+                'let': {'user_id': {'$toString': '$_id'}},
+                'pipeline': [
+                    {'$match': {'$expr': {'$eq': ['$user_id', '$$user_id']}, 'date': {'$gte': start_date, '$lte': end_date}}},
+                    {'$group': {'_id': None, 'visits': {'$sum': '$visits'}, 'audio_time': {'$sum': '$audio_time'}}}
+                ],
+                'as': 'statistics'
+            }}
+        ]
+        total_visits = total_audio_time = 0
+        user_breakdowns = {}
+        try:
+            async for user in await self.users.aggregate(pipeline):
+                statistics = user['statistics'][0] if user['statistics'] else {}
+                user_visits = statistics.get('visits', 0)
+                user_audio_time = statistics.get('audio_time', 0)
+                total_visits += user_visits
+                total_audio_time += user_audio_time
+                user_breakdowns[str(user['_id'])] = {
+                    'name': decrypt(user['encrypt_name']),
+                    'email': decrypt(user['encrypt_email']),
+                    'total_visits': user_visits,
+                    'total_audio_time': user_audio_time,
+                }
+        except Exception as e:
+            logger.error(f"get_usage_statistics error for start_date {start_date}, end_date {end_date}: {str(e)}")
+        return {
+            'total_visits': total_visits,
+            'total_audio_time': total_audio_time,
+            'users': user_breakdowns
+        }
+
+    async def migrate_daily_statistics(self, batch_size=100):
+        """
+        Move daily statistics embedded in user documents into the daily_statistics collection.
+        
+        Args:
+            batch_size (int, optional): Number of users read per batch. Defaults to 100.
+            
+        Returns:
+            int: The number of users migrated.
+            
+        Note:
+            A user's embedded map is only removed once its days have been written, so an
+            interrupted migration can be re-run without losing statistics. Each day is marked
+            migrated_from_user in the same upsert that adds it, and the unique (user_id, date)
+            index turns a repeated upsert of a marked day into a duplicate key error, which is
+            skipped, so a re-run never counts a day twice.
+        """
+        migrated = 0
+        async for document in self.users.find({'daily_statistics': {'$exists': True}}, {'_id': 1}).batch_size(batch_size):
+            try:
+                user = await self.users.find_one({'_id': document['_id']}, {'daily_statistics': 1})
+                if not user or 'daily_statistics' not in user:
+                    continue
+                requests = [
+                    UpdateOne(
+                        {'user_id': str(user['_id']), 'date': date, 'migrated_from_user': {'$ne': True}},
+                        {'$inc': {'visits': statistics.get('visits', 0), 'audio_time': statistics.get('audio_time', 0)},
+                         '$set': {'migrated_from_user': True}},
+                        upsert=True
+                    )
+                    for date, statistics in (user['daily_statistics'] or {}).items()
+                ]
+                if requests:
+                    try:
+                        await self.daily_statistics.bulk_write(requests, ordered=False)
+                    except BulkWriteError as e:
+                        if any(error['code'] != 11000 for error in e.details.get('writeErrors', [])):
+                            raise
+                await self.users.update_one({'_id': user['_id']}, {'$unset': {'daily_statistics': ''}})
+                migrated += 1
+            except Exception as e:
+                logger.error(f"migrate_daily_statistics error for user_id {document['_id']}: {str(e)}")
+        return migrated
+
     def decrypt_admin(self, admin):
         """
         Decrypt and format an admin document from the database.
@@ -912,6 +1660,7 @@ class database:
             del admin_copy['encrypt_name']
             del admin_copy['encrypt_email']
             del admin_copy['hashed_password']
+            admin_copy.pop('index_email', None)
             del admin_copy['encrypt_master_note_generation_instructions']
             del admin_copy['encrypt_master_template_polish_instructions']
             return admin_copy
@@ -919,7 +1668,7 @@ class database:
             logger.error(f"decrypt_admin error for admin_id {admin.get('_id', 'unknown')}: {str(e)}")
             return None
 
-    def create_admin(self, name, email, password, master_note_generation_instructions='', master_template_polish_instructions=''):
+    async def create_admin(self, name, email, password, master_note_generation_instructions='', master_template_polish_instructions=''):
         """
         Create a new admin in the database.
         
@@ -934,32 +1683,32 @@ class database:
             dict: The newly created admin document with decrypted fields, or None if creation failed.
             
         Note:
-            Checks for existing admins with the same email before creation.
+            Checks for existing admins with the same email before creation using the email blind index.
         """
         try:
             encrypted_email = encrypt(email)
-            all_admins = list(self.admins.find())
-            for admin in all_admins:
-                decrypted_email = decrypt(admin['encrypt_email'])
-                if decrypted_email == email:
-                    return None
+            if await self.admins.find_one({'index_email': email_index(email)}, {'_id': 1}):
+                return None
             admin = {
                 'created_at': datetime.utcnow(),
                 'modified_at': datetime.utcnow(),
                 'status': 'ADMIN',
                 'encrypt_name': encrypt(name),
                 'encrypt_email': encrypted_email,
+                'index_email': email_index(email),
                 'hashed_password': hash_password(password),
                 'encrypt_master_note_generation_instructions': encrypt(master_note_generation_instructions),
                 'encrypt_master_template_polish_instructions': encrypt(master_template_polish_instructions)
             }
-            self.admins.insert_one(admin)
+            await self.admins.insert_one(admin)
             return self.decrypt_admin(admin)
+        except DuplicateKeyError:
+            return None
         except Exception as e:
             logger.error(f"create_admin error for email {email}: {str(e)}")
             return None
 
-    def update_admin(self, admin_id, master_note_generation_instructions=None, master_template_polish_instructions=None):
+    async def update_admin(self, admin_id, master_note_generation_instructions=None, master_template_polish_instructions=None):
         """
         Update an admin's information in the database.
         
@@ -983,14 +1732,16 @@ class database:
                 update_fields['encrypt_master_template_polish_instructions'] = encrypt(master_template_polish_instructions)
             if update_fields:
                 update_fields['modified_at'] = datetime.utcnow()
-                self.admins.update_one({'_id': ObjectId(admin_id)}, {'$set': update_fields})
-            admin = self.admins.find_one({'_id': ObjectId(admin_id)})
-            return self.decrypt_admin(admin)
+                admin = await self.admins.find_one_and_update({'_id': ObjectId(admin_id)}, {'$set': update_fields}, return_document=ReturnDocument.AFTER)
+                self.admin_cache.clear()
+            else:
+                admin = await self.admins.find_one({'_id': ObjectId(admin_id)})
+            return self.decrypt_admin(admin) if admin else None
         except Exception as e:
             logger.error(f"update_admin error for admin_id {admin_id}: {str(e)}")
             return None
 
-    def delete_admin(self, admin_id):
+    async def delete_admin(self, admin_id):
         """
         Delete an admin from the database.
         
@@ -1001,13 +1752,14 @@ class database:
             bool: True if deletion was successful, False otherwise.
         """
         try:
-            self.admins.delete_one({'_id': ObjectId(admin_id)})
+            await self.admins.delete_one({'_id': ObjectId(admin_id)})
+            self.admin_cache.clear()
             return True
         except Exception as e:
             logger.error(f"delete_admin error for admin_id {admin_id}: {str(e)}")
             return False
 
-    def get_admin(self, admin_id=None):
+    async def get_admin(self, admin_id=None):
         """
         Retrieve the admin. Since there's only one admin in the system, 
         this method will return the first admin found if no ID is provided.
@@ -1017,19 +1769,30 @@ class database:
             
         Returns:
             dict: The admin document with decrypted fields, or None if not found or error occurs.
+            
+        Note:
+            The decrypted admin is served from the admin cache until it is updated or expires.
         """
         try:
-            if admin_id:
-                admin = self.admins.find_one({'_id': ObjectId(admin_id)})
-            else:
-                admin = self.admins.find_one()
-            
-            return self.decrypt_admin(admin) if admin else None
+            admin = self.admin_cache.get(admin_id or '')
+            if admin is None:
+                generation = self.admin_cache.begin_load(admin_id or '')
+                try:
+                    if admin_id:
+                        admin = await self.admins.find_one({'_id': ObjectId(admin_id)})
+                    else:
+                        admin = await self.admins.find_one()
+                    admin = self.decrypt_admin(admin) if admin else None
+                finally:
+                    self.admin_cache.finish_load(admin_id or '', generation, admin)
+                if not admin:
+                    return None
+            return copy.deepcopy(admin)
         except Exception as e:
             logger.error(f"get_admin error for admin_id {admin_id}: {str(e)}")
             return None
 
-    def get_admin_by_email(self, email):
+    async def get_admin_by_email(self, email):
         """
         Retrieve an admin by their email address.
         
@@ -1040,17 +1803,13 @@ class database:
             dict: The admin document with decrypted fields, or None if not found or error occurs.
         """
         try:
-            all_admins = list(self.admins.find())
-            for admin in all_admins:
-                decrypted_email = decrypt(admin['encrypt_email'])
-                if decrypted_email == email:
-                    return self.decrypt_admin(admin)
-            return None
+            admin = await self.admins.find_one({'index_email': email_index(email)})
+            return self.decrypt_admin(admin) if admin else None
         except Exception as e:
             logger.error(f"get_admin_by_email error for email {email}: {str(e)}")
             return None
 
-    def verify_admin(self, email, password):
+    async def verify_admin(self, email, password):
         """
         Verify an admin's login credentials.
         
@@ -1062,16 +1821,146 @@ class database:
             dict: The admin document with decrypted fields if credentials are valid, None otherwise.
         """
         try:
-            hashed_password = hash_password(password)
-            all_admins = list(self.admins.find())
-            for admin in all_admins:
-                decrypted_email = decrypt(admin['encrypt_email'])
-                if decrypted_email == email and admin['hashed_password'] == hashed_password:
-                    return self.decrypt_admin(admin)
-            return None
+            admin = await self.admins.find_one({'index_email': email_index(email), 'hashed_password': hash_password(password)})
+            return self.decrypt_admin(admin) if admin else None
         except Exception as e:
             logger.error(f"verify_admin error for email {email}: {str(e)}")
             return None
 
+    async def rotate_encryption_keys(self, batch_size=100):
+        """
+        Re-encrypt every encrypted field that was not produced by the current key.
+        
+        Args:
+            batch_size (int, optional): Number of documents read per batch. Defaults to 100.
+            
+        Returns:
+            int: The number of documents re-encrypted.
+            
+        Note:
+            Only documents with stale ciphertexts are read. Each update is conditional on the
+            old ciphertexts, so fields rewritten concurrently are left alone.
+        """
+        rotated = 0
+        current = re.compile(f'^{re.escape(keyring.prefix)}')
+        for collection_name, fields in ENCRYPTED_FIELDS.items():
+            try:
+                collection = self.database[collection_name]
+                array_fields = ENCRYPTED_ARRAY_FIELDS.get(collection_name, {})
+                query = {'$or': [{field: {'$type': 'string', '$ne': '', '$not': current}} for field in fields] +
+                                [{array: {'$elemMatch': {field: {'$type': 'string', '$ne': '', '$not': current}}}} for array, field in array_fields.items()]}
+                projection = {field: 1 for field in [*fields, *array_fields]}
+                async for document in collection.find(query, projection).batch_size(batch_size):
+                    stale_fields = {}
+                    for field in fields:
+                        value = get_field(document, field)
+                        if isinstance(value, str) and keyring.needs_rotation(value):
+                            stale_fields[field] = value
+                    for array, field in array_fields.items():
+                        for index, element in enumerate(document.get(array) or []):
+                            value = element.get(field)
+                            if isinstance(value, str) and keyring.needs_rotation(value):
+                                stale_fields[f'{array}.{index}.{field}'] = value
+                    if not stale_fields:
+                        continue
+                    result = await collection.update_one(
+                        {'_id': document['_id'], **stale_fields},
+                        {'$set': {field: keyring.rotate(value) for field, value in stale_fields.items()}}
+                    )
+                    rotated += result.modified_count
+            except Exception as e:
+                logger.error(f"rotate_encryption_keys error for collection {collection_name}: {str(e)}")
+        logger.info(f"Re-encrypted {rotated} documents to key version {keyring.current_version}")
+        return rotated
+
+    async def backfill_email_index(self, batch_size=100):
+        """
+        Compute the email blind index for users and admins that do not have one.
+        
+        Args:
+            batch_size (int, optional): Number of documents read per batch. Defaults to 100.
+            
+        Returns:
+            dict: Number of documents backfilled and skipped per collection.
+            
+        Note:
+            Documents whose normalized email collides with an indexed account are skipped and logged.
+        """
+        results = {}
+        for collection in (self.users, self.admins):
+            backfilled = skipped = 0
+            async for document in collection.find({'index_email': {'$exists': False}}, {'encrypt_email': 1}).batch_size(batch_size):
+                try:
+                    result = await collection.update_one(
+                        {'_id': document['_id'], 'index_email': {'$exists': False}},
+                        {'$set': {'index_email': email_index(decrypt(document['encrypt_email']))}}
+                    )
+                    backfilled += result.modified_count
+                except Exception as e:
+                    logger.error(f"backfill_email_index error for {collection.name} _id {document['_id']}: {str(e)}")
+                    skipped += 1
+            results[collection.name] = {'backfilled': backfilled, 'skipped': skipped}
+        return results
+
+    async def backfill_synced_at(self):
+        """
+        Set synced_at from modified_at on visits, templates and tombstones written before it existed.
+        
+        Returns:
+            dict: Number of documents backfilled per collection.
+            
+        Note:
+            Without it, a client syncing from a cursor taken before the upgrade would miss
+            documents that changed between that cursor and the upgrade.
+        """
+        results = {}
+        for collection in (self.visits, self.templates, self.tombstones):
+            try:
+                result = await collection.update_many({'synced_at': {'$exists': False}}, [{'$set': {'synced_at': '$modified_at'}}])
+                results[collection.name] = result.modified_count
+            except Exception as e:
+                logger.error(f"backfill_synced_at error for {collection.name}: {str(e)}")
+                results[collection.name] = 0
+        return results
+
+
+class database:
+    """
+    Synchronous facade over async_database for `def` endpoints.
+    Exposes the same method surface; each call runs on the event loop from the
+    calling worker thread, so both interfaces share one client and connection pool.
+    """
+    def __init__(self, async_db):
+        """
+        Initialize the facade.
+        
+        Args:
+            async_db (async_database): The async database to delegate to.
+        """
+        self.async_db = async_db
+
+    def __getattr__(self, name):
+        """
+        Resolve an attribute on the async database, wrapping coroutine methods.
+        
+        Args:
+            name (str): The attribute name.
+            
+        Returns:
+            The attribute, with coroutine methods wrapped as blocking calls.
+            
+        Note:
+            Wrapped methods must be called from a worker thread, such as the threadpool
+            FastAPI runs `def` endpoints in, never from the event loop thread itself.
+        """
+        attribute = getattr(self.async_db, name)
+        if not inspect.iscoroutinefunction(attribute):
+            return attribute
+        @functools.wraps(attribute)
+        def call(*args, **kwargs):
+            return anyio.from_thread.run(functools.partial(attribute, *args, **kwargs))
+        return call
+
 
-db = database()
\ No newline at end of file
+async_db = async_database()
+db = database(async_db)
\ No newline at end of file
@@ -0,0 +1,162 @@
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from app.services.logging import logger
+
+"""
+Index Manager for the Halo Application.
+
+This module declares every index the application's queries rely on and
+creates them idempotently at startup. After creation it compares the declared
+indexes with the ones that actually exist and logs any drift:
+- Declared indexes that are missing, e.g. because creation conflicted
+- Declared indexes whose keys or options differ from the existing index
+- Existing indexes that are not declared here
+
+It also reports index sizes and usage counters for the admin dashboard.
+"""
+
+INDEXES = {
+    'sessions': [
+        IndexModel([('expiration_date', ASCENDING)], expireAfterSeconds=0, name='expiration_date_ttl'),
+    ],
+    'revoked_sessions': [
+        IndexModel([('expiration_date', ASCENDING)], expireAfterSeconds=0, name='expiration_date_ttl'),
+    ],
+    'users': [
+        IndexModel([('index_email', ASCENDING)], unique=True, partialFilterExpression={'index_email': {'$type': 'string'}}, name='index_email_unique'),
+    ],
+    'admins': [
+        IndexModel([('index_email', ASCENDING)], unique=True, partialFilterExpression={'index_email': {'$type': 'string'}}, name='index_email_unique'),
+    ],
+    'templates': [
+        IndexModel([('status', ASCENDING)], name='status'),
+        IndexModel([('user_id', ASCENDING)], name='user_id'),
+        IndexModel([('user_id', ASCENDING), ('synced_at', ASCENDING), ('_id', ASCENDING)], name='user_id_synced_at'),
+    ],
+    'visits': [
+        IndexModel([('user_id', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)], name='user_id_created_at'),
+        IndexModel([('user_id', ASCENDING), ('synced_at', ASCENDING), ('_id', ASCENDING)], name='user_id_synced_at'),
+    ],
+    'tombstones': [
+        IndexModel([('user_id', ASCENDING), ('synced_at', ASCENDING), ('_id', ASCENDING)], name='user_id_synced_at'),
+        IndexModel([('expires_at', ASCENDING)], expireAfterSeconds=0, name='expires_at_ttl'),
+    ],
+    'daily_statistics': [
+        IndexModel([('user_id', ASCENDING), ('date', ASCENDING)], unique=True, name='user_id_date'),
+    ],
+}
+
+COMPARED_OPTIONS = ('unique', 'expireAfterSeconds', 'partialFilterExpression', 'sparse')
+
+class IndexManager:
+    """
+    Creates the declared indexes and reports drift and usage.
+    """
+    def __init__(self, database, indexes=INDEXES):
+        """
+        Initialize the index manager.
+
+        Args:
+            database: The database holding the indexed collections.
+            indexes (dict, optional): Collection names mapped to their declared IndexModels.
+        """
+        self.database = database
+        self.indexes = indexes
+
+    async def ensure_indexes(self):
+        """
+        Create every declared index, then log drift against the existing indexes.
+
+        Returns:
+            dict: Drift per collection, as returned by get_index_drift.
+
+        Note:
+            Indexes are created one at a time, so a conflict on one index is logged
+            and does not stop the others from being created.
+        """
+        for collection_name, models in self.indexes.items():
+            collection = self.database[collection_name]
+            for model in models:
+                try:
+                    await collection.create_indexes([model])
+                except Exception as e:
+                    logger.error(f"ensure_indexes error for {collection_name} index {model.document['name']}: {str(e)}")
+        drift = await self.get_index_drift()
+        for collection_name, collection_drift in drift.items():
+            for kind, names in collection_drift.items():
+                if names:
+                    logger.error(f"Index drift on {collection_name}: {kind} {', '.join(names)}")
+        return drift
+
+    async def get_index_drift(self):
+        """
+        Compare the declared indexes with the indexes that exist.
+
+        Returns:
+            dict: Per collection, the names of 'missing', 'changed' and 'undeclared' indexes.
+        """
+        drift = {}
+        for collection_name, models in self.indexes.items():
+            declared = {model.document['name']: model.document for model in models}
+            try:
+                existing = {index['name']: index async for index in await self.database[collection_name].list_indexes()}
+            except Exception as e:
+                logger.error(f"get_index_drift error for {collection_name}: {str(e)}")
+                continue
+            existing.pop('_id_', None)
+            drift[collection_name] = {
+                'missing': sorted(name for name in declared if name not in existing),
+                'changed': sorted(name for name, spec in declared.items() if name in existing and not self.matches(spec, existing[name])),
+                'undeclared': sorted(name for name in existing if name not in declared),
+            }
+        return drift
+
+    @staticmethod
+    def matches(declared, existing):
+        """
+        Check whether an existing index has the declared keys and options.
+
+        Args:
+            declared (dict): The declared index document.
+            existing (dict): The index document reported by the server.
+
+        Returns:
+            bool: True if the keys and compared options are the same.
+        """
+        if list(declared['key'].items()) != list(existing['key'].items()):
+            return False
+        return all(declared.get(option) == existing.get(option) for option in COMPARED_OPTIONS)
+
+    async def get_index_stats(self):
+        """
+        Report the size and usage of every index on the managed collections.
+
+        Returns:
+            dict: Per collection, per index name: size in bytes, number of accesses,
+            when access counting started, and whether the index is declared.
+
+        Note:
+            Access counts come from $indexStats and reset when the server restarts.
+        """
+        stats = {}
+        for collection_name, models in self.indexes.items():
+            collection = self.database[collection_name]
+            declared = {model.document['name'] for model in models}
+            try:
+                sizes = {}
+                async for collection_stats in await collection.aggregate([{'$collStats': {'storageStats': {}}}]):
+                    for name, size in collection_stats['storageStats'].get('indexSizes', {}).items():
+                        sizes[name] = sizes.get(name, 0) + size
+                usage = {index['name']: index['accesses'] async for index in await collection.aggregate([{'$indexStats': {}}])}
+                stats[collection_name] = {
+                    name: {
+                        'size': sizes.get(name, 0),
+                        'accesses': usage[name]['ops'] if name in usage else 0,
+                        'since': str(usage[name]['since']) if name in usage else None,
+                        'declared': name in declared or name == '_id_',
+                    }
+                    for name in sorted(set(sizes) | set(usage))
+                }
+            except Exception as e:
+                logger.error(f"get_index_stats error for {collection_name}: {str(e)}")
+                stats[collection_name] = {}
+        return stats
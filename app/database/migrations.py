@@ -0,0 +1,79 @@
+from app.database.database import async_db
+import argparse
+import asyncio
+
+"""
+Database Migrations for the Halo Application.
+
+This module provides one-off maintenance commands for existing data.
+Each command is idempotent and can be re-run safely.
+
+Usage:
+    python -m app.database.migrations backfill_email_index
+    python -m app.database.migrations backfill_synced_at
+    python -m app.database.migrations ensure_indexes
+    python -m app.database.migrations migrate_daily_statistics
+"""
+
+async def backfill_email_index(args):
+    """
+    Create the unique email blind index and backfill existing users and admins.
+
+    Args:
+        args (argparse.Namespace): Parsed command line arguments.
+    """
+    await async_db.indexes.ensure_indexes()
+    for collection_name, counts in (await async_db.backfill_email_index(args.batch_size)).items():
+        print(f"{collection_name}: {counts['backfilled']} backfilled, {counts['skipped']} skipped")
+
+async def backfill_synced_at(args):
+    """
+    Create the sync indexes and backfill synced_at on existing visits, templates and tombstones.
+
+    Args:
+        args (argparse.Namespace): Parsed command line arguments.
+    """
+    await async_db.indexes.ensure_indexes()
+    for collection_name, backfilled in (await async_db.backfill_synced_at()).items():
+        print(f"{collection_name}: {backfilled} backfilled")
+
+async def ensure_indexes(args):
+    """
+    Create every declared index and report drift against the existing indexes.
+
+    Args:
+        args (argparse.Namespace): Parsed command line arguments.
+    """
+    for collection_name, drift in (await async_db.indexes.ensure_indexes()).items():
+        print(f"{collection_name}: " + ", ".join(f"{len(names)} {kind}" for kind, names in drift.items()))
+
+async def migrate_daily_statistics(args):
+    """
+    Move daily statistics out of user documents into the daily_statistics collection.
+
+    Args:
+        args (argparse.Namespace): Parsed command line arguments.
+    """
+    await async_db.indexes.ensure_indexes()
+    migrated = await async_db.migrate_daily_statistics(args.batch_size)
+    print(f"daily_statistics: {migrated} users migrated")
+
+COMMANDS = {
+    'backfill_email_index': backfill_email_index,
+    'backfill_synced_at': backfill_synced_at,
+    'ensure_indexes': ensure_indexes,
+    'migrate_daily_statistics': migrate_daily_statistics,
+}
+
+def main():
+    """
+    Parse the command line and run the requested migration.
+    """
+    parser = argparse.ArgumentParser(description="Halo database migrations")
+    parser.add_argument('command', choices=sorted(COMMANDS))
+    parser.add_argument('--batch-size', type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(COMMANDS[args.command](args))
+
+if __name__ == '__main__':
+    main()
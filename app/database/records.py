@@ -0,0 +1,287 @@
+from app.services.utils import decrypt
+import json
+
+"""
+Lazily Decrypted Records for the Halo Application.
+
+This module provides read-only record types that wrap raw MongoDB documents.
+Encrypted fields are decrypted the first time they are accessed and cached on
+the record, so callers only pay for the fields they actually read.
+
+Records support mapping-style access (record["name"], record.get("name")) and
+can be converted to the plain dictionaries returned by the decrypt_* methods.
+Each record type also maps public field names to the stored fields needed to
+build them, so queries can project only what the caller asks for.
+
+Records are only modified in one place: visit records apply appended transcript
+segments so that cached active visits stay current without being reloaded.
+"""
+
+class Record:
+    """
+    Base record type over a raw document.
+    Subclasses declare how public field names map onto stored fields.
+    """
+    __slots__ = ('_document', '_values')
+
+    ID_FIELD = None
+    ENCRYPTED_FIELDS = {}
+    STRING_FIELDS = ()
+    ID_LIST_FIELDS = ()
+    HIDDEN_FIELDS = ()
+
+    def __init__(self, document):
+        """
+        Initialize the record.
+
+        Args:
+            document (dict): The raw document from the database.
+        """
+        self._document = document
+        self._values = {}
+
+    @classmethod
+    def stored_fields(cls, field):
+        """
+        Get the stored fields needed to build a public field.
+
+        Args:
+            field (str): The public field name.
+
+        Returns:
+            list: The stored field names.
+        """
+        if field == cls.ID_FIELD:
+            return ['_id']
+        if field in cls.ENCRYPTED_FIELDS:
+            return [cls.ENCRYPTED_FIELDS[field]]
+        return [field]
+
+    @classmethod
+    def projection(cls, fields):
+        """
+        Build a MongoDB projection for a list of public fields.
+
+        Args:
+            fields (list): The public field names, or None for the whole document.
+
+        Returns:
+            dict: The projection, or None for the whole document.
+        """
+        if fields is None:
+            return None
+        return {stored: 1 for field in fields for stored in cls.stored_fields(field)}
+
+    def _public_fields(self):
+        """
+        List the public fields available from the wrapped document.
+
+        Returns:
+            list: The public field names, in document order.
+        """
+        stored_to_public = {stored: field for field, stored in self.ENCRYPTED_FIELDS.items()}
+        fields = []
+        for key in self._document:
+            if key == '_id':
+                fields.append(self.ID_FIELD)
+            elif key in stored_to_public:
+                fields.append(stored_to_public[key])
+            elif key not in self.HIDDEN_FIELDS and not key.startswith('encrypt_'):
+                fields.append(key)
+        return fields
+
+    def _resolve(self, field):
+        """
+        Build the value of a public field from the wrapped document.
+
+        Args:
+            field (str): The public field name.
+
+        Returns:
+            The field value.
+
+        Raises:
+            KeyError: If the field is hidden or was not loaded.
+        """
+        document = self._document
+        if field == self.ID_FIELD:
+            return str(document['_id'])
+        if field in self.ENCRYPTED_FIELDS:
+            return decrypt(document[self.ENCRYPTED_FIELDS[field]])
+        if field in self.HIDDEN_FIELDS or field.startswith('encrypt_'):
+            raise KeyError(field)
+        value = document[field]
+        if field in self.ID_LIST_FIELDS:
+            return [str(item) for item in value]
+        if field in self.STRING_FIELDS:
+            return str(value) if value else value
+        return value
+
+    def __getitem__(self, field):
+        """
+        Get a public field, decrypting it on first access.
+        """
+        if field not in self._values:
+            self._values[field] = self._resolve(field)
+        return self._values[field]
+
+    def get(self, field, default=None):
+        """
+        Get a public field, or a default if it is not available.
+        """
+        try:
+            return self[field]
+        except KeyError:
+            return default
+
+    def __contains__(self, field):
+        return field in self._public_fields()
+
+    def keys(self):
+        return self._public_fields()
+
+    def to_dict(self, fields=None):
+        """
+        Convert the record to a plain dictionary, decrypting every loaded field.
+
+        Args:
+            fields (list, optional): The public fields to include besides the ID. Defaults to all fields.
+
+        Returns:
+            dict: The decrypted document.
+        """
+        return {field: self[field] for field in self._public_fields() if fields is None or field in fields or field == self.ID_FIELD}
+
+class UserRecord(Record):
+    """
+    Record over a users document.
+    """
+    __slots__ = ()
+    ID_FIELD = 'user_id'
+    ENCRYPTED_FIELDS = {'name': 'encrypt_name', 'email': 'encrypt_email'}
+    STRING_FIELDS = ('created_at', 'modified_at')
+    ID_LIST_FIELDS = ('visit_ids', 'template_ids')
+    HIDDEN_FIELDS = ('hash_password', 'index_email', 'daily_statistics')
+
+    def _resolve(self, field):
+        """
+        Build a public user field, decrypting EMR credentials when present.
+        """
+        if field == 'emr_integration':
+            emr_integration = self._document['emr_integration']
+            if emr_integration and 'encrypt_credentials' in emr_integration:
+                emr_integration = dict(emr_integration)
+                decrypted_credentials = decrypt(emr_integration.pop('encrypt_credentials'))
+                emr_integration['credentials'] = json.loads(decrypted_credentials) if decrypted_credentials else {}
+            return emr_integration
+        return super()._resolve(field)
+
+class TemplateRecord(Record):
+    """
+    Record over a templates document.
+    """
+    __slots__ = ()
+    ID_FIELD = 'template_id'
+    ENCRYPTED_FIELDS = {'name': 'encrypt_name', 'instructions': 'encrypt_instructions', 'print': 'encrypt_print', 'header': 'encrypt_header', 'footer': 'encrypt_footer'}
+    STRING_FIELDS = ('user_id', 'created_at', 'modified_at')
+    HIDDEN_FIELDS = ('synced_at',)
+
+class VisitRecord(Record):
+    """
+    Record over a visits document.
+    The transcript is assembled from the legacy blob and the appended segments on first access.
+    """
+    __slots__ = ()
+    ID_FIELD = 'visit_id'
+    ENCRYPTED_FIELDS = {'name': 'encrypt_name', 'additional_context': 'encrypt_additional_context', 'note': 'encrypt_note', 'transcript': 'encrypt_transcript'}
+    STRING_FIELDS = ('user_id', 'created_at', 'modified_at', 'template_modified_at', 'recording_started_at', 'recording_finished_at')
+    HIDDEN_FIELDS = ('transcript_segments', 'recording_duration_increment', 'synced_at')
+
+    @classmethod
+    def stored_fields(cls, field):
+        """
+        Get the stored fields needed to build a public visit field.
+        """
+        if field == 'transcript':
+            return ['encrypt_transcript', 'transcript_segments']
+        return super().stored_fields(field)
+
+    def _resolve(self, field):
+        """
+        Build a public visit field, assembling the transcript from its segments.
+        """
+        if field == 'transcript':
+            return assemble_transcript(self._document['encrypt_transcript'], self._document.get('transcript_segments'))
+        return super()._resolve(field)
+
+    def inherit_transcript(self, previous):
+        """
+        Reuse the assembled transcript of an earlier record of the same visit if it is unchanged.
+
+        Args:
+            previous (VisitRecord): The earlier record, or None.
+        """
+        if previous is None or 'transcript' not in previous._values or 'encrypt_transcript' not in self._document:
+            return
+        if previous._document.get('encrypt_transcript') == self._document['encrypt_transcript'] and len(previous._document.get('transcript_segments') or []) == len(self._document.get('transcript_segments') or []):
+            self._values['transcript'] = previous._values['transcript']
+
+    def matches(self, document):
+        """
+        Check whether the record holds the same version of the visit as a stored document.
+
+        Args:
+            document (dict): The stored visit, with at least its modified_at.
+
+        Returns:
+            bool: True if both have the same modification time.
+        """
+        return document.get('modified_at') == self._document.get('modified_at')
+
+    def append_segment(self, segment, text, modified_at):
+        """
+        Apply an appended transcript segment to the record.
+
+        Args:
+            segment (dict): The stored segment, with its encrypted text and timestamp.
+            text (str): The segment's plain text.
+            modified_at (datetime): The visit's new modification time.
+
+        Note:
+            An already assembled transcript is extended in place instead of being decrypted again.
+        """
+        self._document.setdefault('transcript_segments', []).append(segment)
+        self._document['modified_at'] = modified_at
+        self._values.pop('modified_at', None)
+        if 'transcript' in self._values:
+            line = format_segment(segment['timestamp'], text)
+            self._values['transcript'] = f"{self._values['transcript']}\n{line}" if self._values['transcript'] else line
+
+def assemble_transcript(encrypted_transcript, segments):
+    """
+    Assemble the full transcript text from the legacy blob and the appended segments.
+
+    Args:
+        encrypted_transcript (str): The encrypted transcript blob, which may be empty.
+        segments (list): The encrypted transcript segments, in append order.
+
+    Returns:
+        str: The decrypted transcript, one "[HH:MM:SS] text" line per segment.
+    """
+    lines = [decrypt(encrypted_transcript)] if encrypted_transcript else []
+    for segment in segments or []:
+        lines.append(format_segment(segment['timestamp'], decrypt(segment['encrypt_text'])))
+    return "\n".join(lines)
+
+def format_segment(timestamp, text):
+    """
+    Format one transcript segment as a transcript line.
+
+    Args:
+        timestamp (datetime): When the segment was transcribed.
+        text (str): The segment's plain text.
+
+    Returns:
+        str: The "[HH:MM:SS] text" line.
+    """
+    return f"[{timestamp.strftime('%H:%M:%S')}] {text}"
@@ -0,0 +1,142 @@
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app.services.logging import logger
+import asyncio
+import time
+
+"""
+Usage Counter Buffer for the Halo Application.
+
+This module provides a write-behind buffer for per-user daily usage counters.
+Increments to 'visits' and 'audio_time' are coalesced in memory per user and
+day, then written to the daily_statistics collection with one bulk_write.
+
+Flushes happen:
+- Periodically, every flush interval
+- Inline, when the oldest buffered increment is older than the loss window
+- On shutdown
+
+Increments that fail to flush are merged back into the buffer and retried.
+Only the counters whose upsert failed are merged back, so none is counted twice.
+At most the loss window's worth of increments is lost if the process dies.
+"""
+
+class UsageBuffer:
+    """
+    In-process buffer of daily usage counter increments.
+    Counters are keyed by (user_id, date) and hold 'visits' and 'audio_time' totals.
+    """
+    def __init__(self, collection, flush_interval, max_loss_window):
+        """
+        Initialize the buffer.
+
+        Args:
+            collection: The daily_statistics collection to flush into.
+            flush_interval (float): Seconds between periodic flushes.
+            max_loss_window (float): Maximum age in seconds of a buffered increment
+                before it is flushed inline. 0 writes every increment through.
+        """
+        self.collection = collection
+        self.flush_interval = flush_interval
+        self.max_loss_window = max_loss_window
+        self.pending = {}
+        self.oldest = None
+
+    def add(self, user_id, date, stat_type, value):
+        """
+        Buffer an increment.
+
+        Args:
+            user_id (str): The ID of the user.
+            date (str): The day the increment belongs to (format: YYYY-MM-DD).
+            stat_type (str): The counter to increment ('visits' or 'audio_time').
+            value: The amount to add.
+        """
+        counters = self.pending.setdefault((str(user_id), date), {'visits': 0, 'audio_time': 0})
+        counters[stat_type] += value
+        if self.oldest is None:
+            self.oldest = time.monotonic()
+
+    def is_overdue(self):
+        """
+        Check whether the oldest buffered increment has outlived the loss window.
+
+        Returns:
+            bool: True if the buffer should be flushed now.
+        """
+        return self.oldest is not None and time.monotonic() - self.oldest >= self.max_loss_window
+
+    async def flush(self):
+        """
+        Write every buffered increment with one bulk_write.
+
+        Returns:
+            int: The number of (user, day) counters written.
+
+        Note:
+            The buffer is swapped out before writing, so increments recorded during
+            the write go into the next flush. On failure the counters are merged back:
+            for a BulkWriteError only those listed in its writeErrors, since the other
+            upserts of the unordered write were applied.
+            The write is shielded from cancellation, so a flush cancelled mid-write
+            still completes it and nothing is merged back.
+        """
+        if not self.pending:
+            return 0
+        pending, oldest = self.pending, self.oldest
+        self.pending, self.oldest = {}, None
+        keys = list(pending)
+        requests = [
+            UpdateOne({'user_id': user_id, 'date': date}, {'$inc': pending[(user_id, date)]}, upsert=True)
+            for user_id, date in keys
+        ]
+        write = asyncio.ensure_future(self.collection.bulk_write(requests, ordered=False))
+        try:
+            await asyncio.shield(write)
+            return len(requests)
+        except asyncio.CancelledError:
+            write.add_done_callback(lambda write: self._log_failure(write, len(requests)))
+            raise
+        except BulkWriteError as e:
+            failed = {keys[error['index']] for error in e.details.get('writeErrors', [])}
+            logger.error(f"UsageBuffer flush error for {len(failed)} of {len(requests)} counters: {str(e)}")
+            self._restore({key: pending[key] for key in failed}, oldest)
+            return len(requests) - len(failed)
+        except Exception as e:
+            logger.error(f"UsageBuffer flush error for {len(requests)} counters: {str(e)}")
+            self._restore(pending, oldest)
+            return 0
+
+    def _log_failure(self, write, count):
+        """
+        Log the failure of a write that finished after its flush was cancelled.
+
+        Args:
+            write (asyncio.Future): The bulk_write.
+            count (int): The number of counters it wrote.
+        """
+        if not write.cancelled() and write.exception() is not None:
+            logger.error(f"UsageBuffer flush error for {count} counters: {str(write.exception())}")
+
+    def _restore(self, pending, oldest):
+        """
+        Merge counters that failed to flush back into the buffer.
+
+        Args:
+            pending (dict): The counters that were being flushed.
+            oldest (float): When the oldest of them was buffered.
+        """
+        if not pending:
+            return
+        for (user_id, date), counters in pending.items():
+            for stat_type, value in counters.items():
+                self.add(user_id, date, stat_type, value)
+        self.oldest = min(oldest, self.oldest)
+
+    async def run(self):
+        """
+        Flush the buffer every flush interval until cancelled.
+        """
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
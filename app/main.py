@@ -1,8 +1,13 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from app.routers import user, audio, admin, chat, integration, visit
-from app.services.connection import manager
+from app.services.connection import manager, start_connection_manager
+from app.services.backplane import MongoBackplane
+from app.services.metrics import metrics
+from app.database.database import async_db
+from app.config import settings
+import asyncio
 import os
 from datetime import datetime
 from pathlib import Path
@@ -12,12 +17,14 @@ Main module for the Halo AI Scribe application.
 
 This module sets up the FastAPI application and includes middleware for CORS,
 startup and shutdown events, and a root endpoint.
+JSON responses are encoded with orjson.
 """
 
 app = FastAPI(
     title="Halo AI Scribe",
     description="Halo AI Scribe backend.",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 app.add_middleware(
@@ -40,15 +47,39 @@ app.add_middleware(
 async def startup_event():
     """
     Startup event for the FastAPI application.
+    Starts creating any missing indexes, re-encrypting documents to the newest key,
+    periodically flushing buffered usage counters, warming the admin and default
+    template caches and, for signed sessions, reloading revoked session tokens
+    in the background. With the 'mongo' broadcast backplane, also starts receiving
+    broadcasts published by other workers. Starts the websocket heartbeat and
+    idle eviction loop.
     """
+    await start_connection_manager()
+    if settings.BROADCAST_BACKPLANE == 'mongo':
+        manager.use_backplane(MongoBackplane(async_db.database['broadcasts'], settings.BROADCAST_COLLECTION_SIZE))
+        app.state.backplane_task = asyncio.create_task(manager.backplane.run())
+    app.state.index_task = asyncio.create_task(async_db.indexes.ensure_indexes())
+    app.state.usage_flush_task = asyncio.create_task(async_db.usage.run())
+    app.state.cache_warm_task = asyncio.create_task(async_db.warm_caches())
+    if async_db.session_signer:
+        app.state.revocation_task = asyncio.create_task(async_db.watch_revoked_sessions(settings.SESSION_REVOCATION_REFRESH))
+    if settings.KEY_ROTATION_ON_STARTUP:
+        app.state.key_rotation_task = asyncio.create_task(async_db.rotate_encryption_keys(settings.KEY_ROTATION_BATCH_SIZE))
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """
     Shutdown event for the FastAPI application.
+    Writes any buffered usage counters before exiting.
     """
     if manager.health_check_task:
         manager.health_check_task.cancel()
+    app.state.usage_flush_task.cancel()
+    if settings.BROADCAST_BACKPLANE == 'mongo':
+        app.state.backplane_task.cancel()
+    if async_db.session_signer:
+        app.state.revocation_task.cancel()
+    await async_db.usage.flush()
 
 @app.get("/")
 async def root():
@@ -76,6 +107,14 @@ async def logs():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error reading log file: {str(e)}")
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Metrics endpoint for the FastAPI application.
+    Returns the application's metrics in the Prometheus text format.
+    """
+    return metrics.render()
+
 app.include_router(user.router, prefix="/user", tags=["User Operations"])
 app.include_router(admin.router, prefix="/admin", tags=["Admin Operations"])
 app.include_router(audio.router, prefix="/audio", tags=["Audio Operations"])
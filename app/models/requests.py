@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Literal
+from pydantic import BaseModel, Field, TypeAdapter
+from typing import Annotated, Literal, Union
 from fastapi import File
 
 """
@@ -37,6 +37,15 @@ class SignUpRequest(BaseModel):
     email: str
     password: str
 
+class SignOutRequest(BaseModel):
+    """
+    Request model for user sign-out.
+    
+    Fields:
+        session_id (str): The session identifier to end.
+    """
+    session_id: str
+
 class GetUserRequest(BaseModel):
     """
     Request model to retrieve user information.
@@ -118,18 +127,35 @@ class GetDefaultTemplateRequest(BaseModel):
 
 class GetVisitsRequest(BaseModel):
     """
-    Request model to retrieve visits associated with a user.
+    Request model to retrieve visit summaries associated with a user.
     
     Fields:
         session_id (str): The active session identifier.
-        subset (bool): If True, returns initial subset. If False, uses pagination.
-        offset (int, optional): Number of visits to skip for pagination.
+        subset (bool): If True, returns today's visits and at least the 10 most recent. If False, uses pagination.
+        cursor (str, optional): The next_cursor returned with the previous page.
         limit (int, optional): Maximum number of visits to return.
+        start_date (str, optional): Only include visits created on or after this date (format: YYYY-MM-DD).
+        end_date (str, optional): Only include visits created on or before this date (format: YYYY-MM-DD).
     """
     session_id: str
     subset: bool = False
-    offset: int = 0
+    cursor: str = None
     limit: int = 20
+    start_date: str = None
+    end_date: str = None
+
+class SyncRequest(BaseModel):
+    """
+    Request model to retrieve the visits and templates changed since a previous sync.
+    
+    Fields:
+        session_id (str): The active session identifier.
+        since (str, optional): The cursor returned by the previous sync. Omit it to start syncing.
+        limit (int, optional): Maximum number of changes of each kind to return.
+    """
+    session_id: str
+    since: str = None
+    limit: int = Field(100, ge=1, le=1000)
 
 class DeleteAllVisitsForUserRequest(BaseModel):
     """
@@ -140,21 +166,142 @@ class DeleteAllVisitsForUserRequest(BaseModel):
     """
     user_email: str
 
-class WebSocketMessage(BaseModel):
+class UpdateUserData(BaseModel):
+    """
+    Payload of an update_user message. Only the fields that are sent are updated.
+    """
+    user_id: str
+    name: str | None = None
+    user_specialty: str | None = None
+    default_template_id: str | None = None
+    default_language: str | None = None
+
+class EmptyData(BaseModel):
+    """
+    Payload of a message that carries no data, such as create_visit or pong.
+    """
+
+class TemplateData(BaseModel):
+    """
+    Payload of a message about one template.
+    """
+    template_id: str
+
+class UpdateTemplateData(BaseModel):
+    """
+    Payload of an update_template message. Only the fields that are sent are updated.
+    """
+    template_id: str
+    name: str | None = None
+    instructions: str | None = None
+    header: str | None = None
+    footer: str | None = None
+
+class VisitData(BaseModel):
+    """
+    Payload of a message about one visit.
+    """
+    visit_id: str
+
+class UpdateVisitData(BaseModel):
+    """
+    Payload of an update_visit message. Only the fields that are sent are updated.
+    """
+    visit_id: str
+    name: str | None = None
+    status: str | None = None
+    template_id: str | None = None
+    language: str | None = None
+    additional_context: str | None = None
+    recording_started_at: str | None = None
+    recording_duration: int | float | str | None = None
+    recording_finished_at: str | None = None
+    transcript: str | None = None
+    note: str | dict | None = None
+
+class ResyncStreamData(BaseModel):
     """
-    Model for messages sent through WebSocket connections.
+    Payload of a resync_stream message; either visit_id or template_id is set.
+    """
+    visit_id: str | None = None
+    template_id: str | None = None
+
+class WebSocketMessageBase(BaseModel):
+    """
+    Fields shared by all messages sent through WebSocket connections.
     
     Fields:
         type (str): The type of message, defining the action to be performed.
         session_id (str): The active session identifier.
-        data (dict): The payload data for the message.
+        data: The payload, validated by the model for the message type.
     
     Note:
-        The 'type' field is constrained to a predefined set of allowed values.
+        WebSocketMessage is the union of all message models, discriminated by type.
+        Validate incoming messages with websocket_message_adapter.validate_python.
     """
-    type: Literal["create_template", "update_template", "delete_template", "duplicate_template", "polish_template", "template_generated", "create_visit", "update_visit", "delete_visit", "generate_note", "generate_note", "polish_note", "update_user", "start_recording", "pause_recording", "resume_recording", "finish_recording", "transcribe_audio", "error"]
     session_id: str
-    data: dict
+
+class UpdateUserMessage(WebSocketMessageBase):
+    """
+    Message updating the user's profile.
+    """
+    type: Literal["update_user"]
+    data: UpdateUserData
+
+class CreateMessage(WebSocketMessageBase):
+    """
+    Message creating a template or a visit.
+    """
+    type: Literal["create_template", "create_visit"]
+    data: EmptyData = EmptyData()
+
+class TemplateMessage(WebSocketMessageBase):
+    """
+    Message acting on one template.
+    """
+    type: Literal["delete_template", "duplicate_template", "polish_template"]
+    data: TemplateData
+
+class UpdateTemplateMessage(WebSocketMessageBase):
+    """
+    Message updating a template.
+    """
+    type: Literal["update_template"]
+    data: UpdateTemplateData
+
+class VisitMessage(WebSocketMessageBase):
+    """
+    Message acting on one visit, including recording control and note generation.
+    """
+    type: Literal["delete_visit", "generate_note", "start_recording", "pause_recording", "resume_recording", "finish_recording"]
+    data: VisitData
+
+class UpdateVisitMessage(WebSocketMessageBase):
+    """
+    Message updating a visit.
+    """
+    type: Literal["update_visit"]
+    data: UpdateVisitData
+
+class ResyncStreamMessage(WebSocketMessageBase):
+    """
+    Message asking for the full text of an in-progress generation, see app.services.streaming.
+    """
+    type: Literal["resync_stream"]
+    data: ResyncStreamData
+
+class PongMessage(WebSocketMessageBase):
+    """
+    Reply to a heartbeat ping.
+    """
+    type: Literal["pong"]
+    data: EmptyData = EmptyData()
+
+WebSocketMessage = Annotated[
+    Union[UpdateUserMessage, CreateMessage, TemplateMessage, UpdateTemplateMessage, VisitMessage, UpdateVisitMessage, ResyncStreamMessage, PongMessage],
+    Field(discriminator="type")
+]
+websocket_message_adapter = TypeAdapter(WebSocketMessage)
 
 class WebSocketResponse(BaseModel):
     """
@@ -166,9 +313,9 @@ class WebSocketResponse(BaseModel):
         was_requested (bool): Indicates whether this response was directly requested.
     
     Note:
-        The 'type' field is constrained to the same set of values as in WebSocketMessage.
+        The 'type' field is constrained to a predefined set of allowed values.
     """
-    type: Literal["create_template", "update_template", "delete_template", "duplicate_template", "polish_template", "template_generated", "create_visit", "update_visit", "delete_visit", "note_generated", "generate_note", "update_user", "start_recording", "pause_recording", "resume_recording", "finish_recording", "transcribe_audio", "error"]
+    type: Literal["bootstrap", "resumed", "create_template", "update_template", "delete_template", "duplicate_template", "polish_template", "template_generated", "template_delta", "template_resync", "create_visit", "update_visit", "delete_visit", "note_generated", "note_delta", "note_resync", "generate_note", "update_user", "start_recording", "pause_recording", "resume_recording", "finish_recording", "transcribe_audio", "ping", "error"]
     data: dict
     was_requested: bool
 
@@ -1,7 +1,6 @@
 from fastapi import APIRouter, HTTPException
-from app.database.database import db
+from app.database.database import db, async_db
 from app.models.requests import CreateDefaultTemplateRequest, DeleteDefaultTemplateRequest, GetDefaultTemplateRequest, DeleteAllVisitsForUserRequest, GetUserStatsRequest, AdminSigninRequest, AdminSignupRequest, GetAdminRequest, UpdateAdminRequest, UpdateDefaultTemplateRequest
-from datetime import datetime
 from pydantic import BaseModel
 
 """
@@ -32,44 +31,8 @@ def get_user_stats(request: GetUserStatsRequest):
     Returns:
         dict: Statistics for users within the specified date range.
     """
-    user_ids = ([str(user["_id"]) for user in db.users.find({})] 
-                if not request.user_emails or "all" in request.user_emails
-                else [user['user_id'] for email in request.user_emails 
-                      if (user := db.get_user_by_email(email))])
-    
-    end_date = request.end_date or datetime.utcnow().strftime('%Y-%m-%d')
-    start_date = request.start_date or "1970-01-01"
-    
-    total_visits = total_audio_time = 0
-    user_breakdowns = {}
-    
-    for user_id in user_ids:
-        try:
-            user = db.get_user(user_id)
-            if not user or 'daily_statistics' not in user:
-                continue
-                
-            user_stats = {date: stats for date, stats in user['daily_statistics'].items() 
-                         if start_date <= date <= end_date}
-            user_visits = sum(stats.get('visits', 0) for stats in user_stats.values())
-            user_audio_time = sum(stats.get('audio_time', 0) for stats in user_stats.values())
-            
-            total_visits += user_visits
-            total_audio_time += user_audio_time
-            user_breakdowns[user_id] = {
-                'name': user['name'],
-                'email': user['email'],
-                'total_visits': user_visits,
-                'total_audio_time': user_audio_time,
-            }
-        except Exception:
-            continue
-    
-    return {
-        'total_visits': total_visits,
-        'total_audio_time': total_audio_time,
-        'users': user_breakdowns
-    }
+    user_emails = None if not request.user_emails or "all" in request.user_emails else request.user_emails
+    return db.get_usage_statistics(user_emails, request.start_date, request.end_date)
 
 @router.post("/signin")
 async def admin_signin(request: AdminSigninRequest):
@@ -88,7 +51,7 @@ async def admin_signin(request: AdminSigninRequest):
     Raises:
         HTTPException: If credentials are invalid.
     """
-    admin = db.verify_admin(email=request.email, password=request.password)
+    admin = await async_db.verify_admin(email=request.email, password=request.password)
     if admin:
         return admin
     else:
@@ -114,7 +77,7 @@ async def admin_signup(request: AdminSignupRequest):
     Raises:
         HTTPException: If admin creation fails or email already exists.
     """
-    admin = db.create_admin(
+    admin = await async_db.create_admin(
         name=request.name,
         email=request.email,
         password=request.password,
@@ -142,7 +105,7 @@ async def get_admin(request: GetAdminRequest):
     Raises:
         HTTPException: If admin is not found.
     """
-    admin = db.get_admin(admin_id=request.admin_id)
+    admin = await async_db.get_admin(admin_id=request.admin_id)
     if admin:
         return admin
     else:
@@ -166,7 +129,7 @@ async def update_admin(request: UpdateAdminRequest):
     Raises:
         HTTPException: If admin update fails or admin is not found.
     """
-    admin = db.update_admin(
+    admin = await async_db.update_admin(
         admin_id=request.admin_id,
         master_note_generation_instructions=request.master_note_generation_instructions,
         master_template_polish_instructions=request.master_template_polish_instructions
@@ -190,7 +153,7 @@ async def create_default_template(request: CreateDefaultTemplateRequest):
     Returns:
         dict: The created template.
     """
-    template = db.create_default_template(name=request.name, instructions=request.instructions)
+    template = await async_db.create_default_template(name=request.name, instructions=request.instructions)
     return template
 
 @router.post("/update_default_template")
@@ -207,7 +170,7 @@ async def update_default_template(request: UpdateDefaultTemplateRequest):
     Returns:
         dict: The updated template.
     """
-    template = db.update_default_template(template_id=request.template_id, name=request.name, instructions=request.instructions, print=request.print, header=request.header, footer=request.footer)
+    template = await async_db.update_default_template(template_id=request.template_id, name=request.name, instructions=request.instructions, print=request.print, header=request.header, footer=request.footer)
     return template
 
 @router.post("/delete_default_template")
@@ -223,7 +186,7 @@ async def delete_default_template(request: DeleteDefaultTemplateRequest):
     Returns:
         dict: A message indicating the template has been deleted.
     """
-    db.delete_default_template(template_id=request.template_id)
+    await async_db.delete_default_template(template_id=request.template_id)
     return {"message": "Default Template Deleted"}
 
 @router.get("/get_default_template")
@@ -239,7 +202,7 @@ async def get_default_template(request: GetDefaultTemplateRequest):
     Returns:
         dict: The retrieved template.
     """
-    template = db.get_default_template(template_id=request.template_id)
+    template = await async_db.get_default_template(template_id=request.template_id)
     return template
 
 @router.get("/get_all_default_templates")
@@ -255,10 +218,23 @@ async def get_all_default_templates():
     Returns:
         list: A list of all default templates.
     """
-    templates = db.get_all_default_templates()
+    templates = await async_db.get_all_default_templates()
     return templates
 
     
+@router.get("/get_index_stats")
+async def get_index_stats():
+    """
+    Retrieve index sizes and usage statistics.
+
+    This endpoint allows the admin to see how large each index is and how often it is used.
+
+    Returns:
+        dict: Per collection, each index's size in bytes, access count, when counting started,
+        and whether it is declared by the application.
+    """
+    return await async_db.indexes.get_index_stats()
+
 @router.post("/delete_all_visits_for_user")
 def delete_all_visits_for_user(request: DeleteAllVisitsForUserRequest):
     """
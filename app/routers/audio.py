@@ -1,5 +1,5 @@
 import asyncio
-from app.database.database import db
+from app.database.database import async_db
 from app.services.logging import logger
 from fastapi import HTTPException
 import os
@@ -71,6 +71,7 @@ class Transcriber:
         self.last_audio_time = time.time()
         self.keep_alive_task = None
         self.is_finals = []
+        self.is_finals_speaker = None
         self.loop = asyncio.get_event_loop()
         self.is_connected = False
         self.reconnect_attempts = 0
@@ -191,38 +192,51 @@ class Transcriber:
         Note:
             Only processes results that contain valid transcript data.
             Collects interim results until a final speech segment is detected.
+            The speaker of an utterance is the diarized speaker of its first word.
         """
         if not result.channel or not result.channel.alternatives: return   
-        transcript = result.channel.alternatives[0].transcript
+        alternative = result.channel.alternatives[0]
+        transcript = alternative.transcript
         if not transcript: return
         if result.is_final:
+            if not self.is_finals and alternative.words:
+                self.is_finals_speaker = getattr(alternative.words[0], "speaker", None)
             self.is_finals.append(transcript)
             if getattr(result, "speech_final", False):
-                utterance = " ".join(self.is_finals)
-                self.is_finals = []
-                asyncio.run_coroutine_threadsafe(
-                    self._store_transcript(utterance, datetime.utcnow().isoformat()),
-                    self.loop
-                )
+                self._flush_utterance()
+
+    def _flush_utterance(self):
+        """
+        Store the collected final transcripts as one utterance.
+        
+        Note:
+            Called from Deepgram's callback thread, so storage is scheduled on the event loop.
+        """
+        utterance = " ".join(self.is_finals)
+        speaker = self.is_finals_speaker
+        self.is_finals = []
+        self.is_finals_speaker = None
+        asyncio.run_coroutine_threadsafe(
+            self._store_transcript(utterance, datetime.utcnow(), speaker),
+            self.loop
+        )
     
-    async def _store_transcript(self, transcript_text, timestamp):
+    async def _store_transcript(self, transcript_text, timestamp, speaker=None):
         """
-        Store transcribed text in the database with timestamp formatting.
+        Store transcribed text in the database as a new transcript segment.
         
         Args:
             transcript_text (str): The transcribed text to store.
-            timestamp (str): ISO formatted timestamp of when the transcript was created.
+            timestamp (datetime): When the transcript was created.
+            speaker (int, optional): The diarized speaker of the transcript.
             
         Note:
-            Appends new transcripts to existing ones with formatted timestamps.
+            Appends a single encrypted segment without reading the existing transcript.
             Handles database errors gracefully with proper logging.
         """
         try:
-            current_transcript = db.get_visit(self.visit_id)["transcript"]
-            timestamp_formatted = datetime.fromisoformat(timestamp).strftime("%H:%M:%S")
-            new_transcript = f"[{timestamp_formatted}] {transcript_text}"
-            if current_transcript: new_transcript = f"{current_transcript}\n{new_transcript}"
-            db.update_visit(self.visit_id, transcript=new_transcript)
+            if not await async_db.append_transcript_segment(self.visit_id, transcript_text, timestamp, speaker):
+                logger.error(f"Error storing transcript: visit {self.visit_id} not found")
         except Exception as e:
             logger.error(f"Error storing transcript: {str(e)}")
     
@@ -262,12 +276,7 @@ class Transcriber:
             Stores any accumulated interim transcripts when utterance ends.
         """
         if self.is_finals:
-            utterance = " ".join(self.is_finals)
-            self.is_finals = []
-            asyncio.run_coroutine_threadsafe(
-                self._store_transcript(utterance, datetime.utcnow().isoformat()),
-                self.loop
-            )
+            self._flush_utterance()
     
     async def send_audio(self, audio_data: bytes):
         """
@@ -397,7 +406,7 @@ async def handle_start_recording(websocket_session_id: str, user_id: str, data:
     """
     try:
         recording_started_at = str(datetime.utcnow())
-        visit = db.update_visit(data["visit_id"], status="RECORDING", recording_started_at=recording_started_at)
+        visit = await async_db.update_visit(data["visit_id"], status="RECORDING", recording_started_at=recording_started_at)
         broadcast_message = {
             "type": "start_recording",
             "data": {
@@ -432,14 +441,7 @@ async def handle_pause_recording(websocket_session_id: str, user_id: str, data:
         Handles cases where recording_started_at might not be set.
     """
     try:
-        old_visit = db.get_visit(data["visit_id"])
-        old_duration = int(old_visit["recording_duration"] if old_visit["recording_duration"] else 0)
-        if old_visit.get("recording_started_at"):
-            time_diff = int((datetime.utcnow() - datetime.fromisoformat(old_visit["recording_started_at"])).total_seconds())
-            new_duration = old_duration + time_diff
-        else:
-            new_duration = old_duration
-        visit = db.update_visit(data["visit_id"], status="PAUSED", recording_duration=str(new_duration))
+        visit = await async_db.stop_recording(data["visit_id"], "PAUSED")
         broadcast_message = {
             "type": "pause_recording",
             "data": {
@@ -475,7 +477,7 @@ async def handle_resume_recording(websocket_session_id: str, user_id: str, data:
     """
     try:
         recording_started_at = str(datetime.utcnow())
-        visit = db.update_visit(data["visit_id"], status="RECORDING", recording_started_at=recording_started_at)
+        visit = await async_db.update_visit(data["visit_id"], status="RECORDING", recording_started_at=recording_started_at)
         broadcast_message = {
             "type": "resume_recording",
             "data": {
@@ -513,14 +515,7 @@ async def handle_finish_recording(websocket_session_id: str, user_id: str, data:
     """
     try:
         recording_finished_at = str(datetime.utcnow())
-        old_visit = db.get_visit(data["visit_id"])
-        old_duration = int(old_visit.get("recording_duration") or 0)
-        if old_visit.get("recording_started_at"):
-            time_diff = int((datetime.utcnow() - datetime.fromisoformat(old_visit["recording_started_at"])).total_seconds())
-            new_duration = old_duration + time_diff
-        else:
-            new_duration = old_duration
-        visit = db.update_visit(data["visit_id"], status="FINISHED", recording_finished_at=recording_finished_at, recording_duration=str(new_duration))
+        visit = await async_db.stop_recording(data["visit_id"], "FINISHED", recording_finished_at=recording_finished_at)
         broadcast_message = {
             "type": "finish_recording",
             "data": {
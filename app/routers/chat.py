@@ -1,6 +1,7 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from app.services.anthropic import ask_claude_stream, ask_claude
 from app.models.requests import AskRequest
+from app.services.streaming import LEGACY_PROTOCOL, DELTA_PROTOCOL, Stream
 import json
 import logging
 
@@ -28,7 +29,7 @@ async def ask(request: AskRequest):
     return await ask_claude(request.message, model="claude-3-5-sonnet-latest", max_tokens=8192)
 
 @router.websocket("/ws")
-async def chat_websocket(websocket: WebSocket):
+async def chat_websocket(websocket: WebSocket, protocol: int = LEGACY_PROTOCOL):
     """
     Handle WebSocket connections for real-time chat functionality.
     
@@ -38,16 +39,19 @@ async def chat_websocket(websocket: WebSocket):
     
     Args:
         websocket (WebSocket): The WebSocket connection instance.
+        protocol (int, optional): The streaming protocol version the client speaks. Defaults to LEGACY_PROTOCOL.
         
     Note:
         - Supports multiple concurrent connections
         - Streams responses in real-time using Claude AI
         - Handles JSON message parsing and error responses
+        - Delta frames are sent directly and in order, so they cannot gap and need no resync
         
     Message Format:
         Incoming: {"message": "user message text"}
         Outgoing: 
-            - {"type": "chunk", "content": "partial response"}
+            - {"type": "chunk", "content": "partial response"} (legacy protocol, full response so far)
+            - {"type": "delta", "seq": 1, "offset": 0, "content": "new text"} (delta protocol)
             - {"type": "complete", "content": "full response"}
             - {"type": "error", "message": "error description"}
             
@@ -67,8 +71,13 @@ async def chat_websocket(websocket: WebSocket):
                     await websocket.send_text(json.dumps({"type": "error", "message": "No message provided"}))
                     continue
                 
+                stream = Stream(None, [''])
                 async def stream_callback(partial_response):
-                    await websocket.send_text(json.dumps({"type": "chunk", "content": partial_response}))
+                    if protocol == DELTA_PROTOCOL:
+                        delta = stream.update('', partial_response)
+                        await websocket.send_text(json.dumps({"type": "delta", "seq": delta['seq'], "offset": delta['offset'], "content": delta['delta']}))
+                    else:
+                        await websocket.send_text(json.dumps({"type": "chunk", "content": partial_response}))
                 
                 full_response = await ask_claude_stream(message, stream_callback, model="claude-3-5-haiku-latest", max_tokens=8192)
                 await websocket.send_text(json.dumps({"type": "complete", "content": full_response}))
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException
-from app.database.database import db
+from app.database.database import async_db
 from app.services.logging import logger
 from app.models.requests import VerifyEMRIntegrationRequest, GetPatientsEMRIntegrationRequest, CreateNoteEMRIntegrationRequest
 from app.integrations import officeally, advancemd
@@ -27,7 +27,7 @@ async def verify(request: VerifyEMRIntegrationRequest):
         Currently supports OFFICE_ALLY EMR system.
         Stores encrypted credentials upon successful verification.
     """
-    user_id = db.is_session_valid(request.session_id)
+    user_id = await async_db.is_session_valid(request.session_id)
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid session")
     
@@ -48,14 +48,14 @@ async def verify(request: VerifyEMRIntegrationRequest):
             "verified": verified,
             "credentials": request.credentials if verified else {}
         }
-        user = db.update_user(user_id=user_id, emr_integration=emr_integration)
+        user = await async_db.update_user(user_id=user_id, emr_integration=emr_integration)
         broadcast_message = {
             "type": "update_user",
             "data": user
         }
         await manager.broadcast('', user_id, broadcast_message)
 
-        template = db.create_template(user_id=user_id, name=request.emr.replace('_', ' ').title(), instructions=instructions, status="EMR")
+        template = await async_db.create_template(user_id=user_id, name=request.emr.replace('_', ' ').title(), instructions=instructions, status="EMR")
         broadcast_message = {
             "type": "create_template",
             "data": template
@@ -72,12 +72,12 @@ async def get_patients(request: GetPatientsEMRIntegrationRequest):
     """
     Get patients from EMR integration.
     """
-    user_id = db.is_session_valid(request.session_id)
+    user_id = await async_db.is_session_valid(request.session_id)
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid session")
     
     try:
-        user = db.get_user(user_id)
+        user = await async_db.get_user_record(user_id, fields=["emr_integration"])
 
         if user.get("emr_integration").get("emr") == "OFFICE_ALLY":
             patients = officeally.get_patients(user.get("emr_integration").get("credentials").get("username"), user.get("emr_integration").get("credentials").get("password"))
@@ -99,13 +99,13 @@ async def create_note(request: CreateNoteEMRIntegrationRequest):
     """
     Create a note for a patient.
     """
-    user_id = db.is_session_valid(request.session_id)
+    user_id = await async_db.is_session_valid(request.session_id)
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid session")
 
     try:
-        user = db.get_user(user_id)
-        visit = db.get_visit(request.visit_id)
+        user = await async_db.get_user_record(user_id, fields=["emr_integration"])
+        visit = await async_db.get_visit_record(request.visit_id, fields=["note"])
 
         if user.get("emr_integration").get("emr") == "OFFICE_ALLY":
             officeally.create_note(user.get("emr_integration").get("credentials").get("username"), user.get("emr_integration").get("credentials").get("password"), request.patient_id, json.loads(visit.get("note")) if isinstance(visit.get("note"), str) else visit.get("note"))
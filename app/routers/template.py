@@ -1,8 +1,10 @@
-from app.database.database import db
+from app.database.database import async_db
 from app.services.connection import manager
 from app.services.logging import logger
 from app.services.prompts import get_template_instructions
 from app.services.anthropic import ask_claude_stream
+from app.services.streaming import LEGACY_PROTOCOL, DELTA_PROTOCOL, open_stream, close_stream
+from app.services.commands import is_running_in_background, run_in_background
 from fastapi import HTTPException
 
 """
@@ -27,7 +29,7 @@ async def handle_create_template(websocket_session_id: str, user_id: str, data:
         Broadcasts the created template to all connected clients for the user.
     """
     try:
-        template = db.create_template(user_id)
+        template = await async_db.create_template(user_id)
         broadcast_message = {
             "type": "create_template",
             "data": template
@@ -56,7 +58,7 @@ async def handle_update_template(websocket_session_id: str, user_id: str, data:
     try:
         valid_fields = ["name", "instructions", "header", "footer"]
         update_fields = {k: v for k, v in data.items() if k in valid_fields}
-        template = db.update_template(template_id=data["template_id"], **update_fields)
+        template = await async_db.update_template(template_id=data["template_id"], **update_fields)
         broadcast_message = {
             "type": "update_template",
             "data": {
@@ -87,7 +89,7 @@ async def handle_delete_template(websocket_session_id: str, user_id: str, data:
         Broadcasts the deletion event to all connected clients for the user.
     """
     try:
-        db.delete_template(template_id=data["template_id"], user_id=user_id)
+        await async_db.delete_template(template_id=data["template_id"], user_id=user_id)
         broadcast_message = {
             "type": "delete_template",
             "data": {
@@ -117,9 +119,9 @@ async def handle_duplicate_template(websocket_session_id: str, user_id: str, dat
         connected clients for the user.
     """
     try:
-        old_template = db.get_template(data["template_id"])
-        new_template = db.create_template(user_id)
-        new_template = db.update_template(new_template["template_id"], name=old_template["name"] + " (Copy)", instructions=old_template["instructions"])
+        old_template = await async_db.get_template_record(data["template_id"], fields=["name", "instructions"])
+        new_template = await async_db.create_template(user_id)
+        new_template = await async_db.update_template(new_template["template_id"], name=old_template["name"] + " (Copy)", instructions=old_template["instructions"])
         broadcast_message = {
             "type": "duplicate_template",
             "data": new_template
@@ -142,38 +144,65 @@ async def handle_polish_template(websocket_session_id: str, user_id: str, data:
         HTTPException: If there's an error during template polishing.
         
     Note:
-        This function is currently a placeholder for future implementation.
+        The polished instructions are generated in the background once the status is
+        GENERATING_TEMPLATE, so the template's command lane is released. While a polish for
+        the template is running, the requester gets an already_running error.
     """
     try:
-        admin = db.get_admin()
-        template = db.get_template(template_id=data["template_id"])
+        if is_running_in_background(("polish_template", data["template_id"])):
+            await manager.send(websocket_session_id, user_id, {
+                "type": "error",
+                "data": {
+                    "reason": "already_running",
+                    "message": "This template is already being polished.",
+                    "request_type": "polish_template",
+                    "template_id": data["template_id"]
+                }
+            })
+            return
+        admin = await async_db.get_admin()
+        template = await async_db.get_template_record(template_id=data["template_id"], fields=["instructions"])
         
         message = get_template_instructions(admin.get("master_template_polish_instructions"), template.get("instructions"))
         
-        db.update_template(template_id=data["template_id"], status="GENERATING_TEMPLATE")
+        await async_db.update_template(template_id=data["template_id"], status="GENERATING_TEMPLATE")
+        stream = open_stream('template', data["template_id"], user_id, [''])
         async def handle_response(response):
+            delta = stream.update('', response)
+            await manager.broadcast(websocket_session_id, user_id, {
+                "type": "template_delta",
+                "data": {"template_id": data["template_id"], **delta}
+            }, streaming=True, protocol=DELTA_PROTOCOL)
+            if manager.has_protocol(user_id, LEGACY_PROTOCOL):
+                broadcast_message = {
+                    "type": "template_generated",
+                    "data": {
+                        "template_id": data["template_id"],
+                        "status": "GENERATING_TEMPLATE",
+                        "instructions": response
+                    }
+                }
+                await manager.broadcast(websocket_session_id, user_id, broadcast_message, streaming=True, protocol=LEGACY_PROTOCOL)
+        async def polish_template():
+            try:
+                response = await ask_claude_stream(message, handle_response)
+            finally:
+                close_stream('template', data["template_id"], stream)
+            
+            template = await async_db.update_template(template_id=data["template_id"], instructions=response, status="FINISHED")
             broadcast_message = {
                 "type": "template_generated",
                 "data": {
                     "template_id": data["template_id"],
-                    "status": "GENERATING_TEMPLATE",
-                    "instructions": response
+                    "status": "FINISHED",
+                    "instructions": response,
+                    "modified_at": template.get("modified_at")
                 }
             }
             await manager.broadcast(websocket_session_id, user_id, broadcast_message)
-        response = await ask_claude_stream(message, handle_response)
         
-        template = db.update_template(template_id=data["template_id"], instructions=response, status="FINISHED")
-        broadcast_message = {
-            "type": "template_generated",
-            "data": {
-                "template_id": data["template_id"],
-                "status": "FINISHED",
-                "instructions": response,
-                "modified_at": template.get("modified_at")
-            }
-        }
-        await manager.broadcast(websocket_session_id, user_id, broadcast_message)
+        if not run_in_background(("polish_template", data["template_id"]), "polish_template", polish_template):
+            close_stream('template', data["template_id"], stream)
     except Exception as e:
         logger.error(f"Error polishing template: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,15 +1,18 @@
-from app.models.requests import SignInRequest, SignUpRequest, GetUserRequest, GetTemplatesRequest, GetVisitsRequest, WebSocketMessage
+from app.models.requests import SignInRequest, SignUpRequest, SignOutRequest, GetUserRequest, GetTemplatesRequest, GetVisitsRequest, SyncRequest, WebSocketMessage, websocket_message_adapter
 from fastapi import APIRouter, HTTPException
 from fastapi.websockets import WebSocket, WebSocketDisconnect
-from app.database.database import db
+from app.database.database import db, async_db, decode_sync_cursor, decode_visit_cursor
 from app.services.connection import manager
+from app.services.streaming import LEGACY_PROTOCOL, get_stream
+from app.services.commands import submit_command
+from app.services.handlers import HandlerRegistry
+from app.config import settings
 from app.routers.template import handle_create_template, handle_update_template, handle_delete_template, handle_duplicate_template, handle_polish_template
 from app.routers.visit import handle_create_visit, handle_update_visit, handle_delete_visit, handle_generate_note
 from app.routers.audio import handle_start_recording, handle_pause_recording, handle_resume_recording, handle_finish_recording
 from app.services.logging import logger
-import asyncio
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 
 """
 User Router for managing user operations.
@@ -68,6 +71,23 @@ def signup(request: SignUpRequest):
     else:
         raise HTTPException(status_code=400, detail="Failed to create user")
 
+@router.post("/signout")
+def signout(request: SignOutRequest):
+    """
+    End a user's session.
+    
+    Args:
+        request (SignOutRequest): Request containing the session ID.
+        
+    Returns:
+        dict: A confirmation message.
+        
+    Note:
+        Deletes Mongo-backed sessions and revokes signed session tokens.
+    """
+    db.delete_session(request.session_id)
+    return {"message": "Signed out"}
+
 @router.post("/get")
 def get_user(request: GetUserRequest):
     """
@@ -125,22 +145,70 @@ def get_visits(request: GetVisitsRequest):
         request (GetVisitsRequest): Request containing session ID and pagination params.
         
     Returns:
-        list: List of visits associated with the user.
+        dict: Visit summaries under 'visits' and the cursor for the next page under 'next_cursor'.
         
     Raises:
-        HTTPException: If session is invalid with 401 status code.
+        HTTPException: If session is invalid with 401 status code, or if the cursor, start_date
+                       or end_date is malformed with 400 status code.
         
     Note:
         Validates the session before retrieving visit information.
-        Supports pagination when subset is False.
+        Summaries do not include transcripts or notes.
+        Supports cursor pagination and date-range filters when subset is False.
     """
     user_id = db.is_session_valid(request.session_id)
     if user_id:
-        visits = db.get_user_visits(user_id, request.subset, request.offset, request.limit)
-        return visits
+        if request.subset:
+            today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+            return db.list_visit_summaries(user_id, limit=10, expand_since=today)
+        try:
+            start = datetime.strptime(request.start_date, '%Y-%m-%d') if request.start_date else None
+            end = datetime.strptime(request.end_date, '%Y-%m-%d') + timedelta(days=1) if request.end_date else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date, expected YYYY-MM-DD")
+        if request.cursor:
+            try:
+                decode_visit_cursor(request.cursor)
+            except Exception:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+        return db.list_visit_summaries(user_id, request.cursor, request.limit, start, end)
     else:
         raise HTTPException(status_code=401, detail="Invalid session")
 
+@router.post("/sync")
+def sync(request: SyncRequest):
+    """
+    Retrieve the visits and templates created, modified or deleted since a previous sync.
+    
+    Args:
+        request (SyncRequest): Request containing session ID, the previous sync's cursor and a limit.
+        
+    Returns:
+        dict: Changed visit and template summaries under 'visits' and 'templates', deleted IDs under
+              'deleted', the cursor for the next sync under 'cursor', and 'has_more' and 'reset' flags.
+        
+    Raises:
+        HTTPException: If session is invalid with 401 status code, if the cursor is malformed
+                       with 400 status code, or if the changes cannot be read with 500 status code.
+        
+    Note:
+        Validates the session before retrieving changes.
+        When 'has_more' is set, sync again with the returned cursor right away.
+        When 'reset' is set, reload the lists with /user/get_visits and /user/get_templates,
+        then sync from the returned cursor.
+    """
+    user_id = db.is_session_valid(request.session_id)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Invalid session")
+    try:
+        since = decode_sync_cursor(request.since) if request.since else None
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid sync cursor")
+    changes = db.get_changes(user_id, since, request.limit)
+    if changes is None:
+        raise HTTPException(status_code=500, detail="Failed to read changes")
+    return changes
+
 async def handle_update_user(websocket_session_id: str, user_id: str, data: dict):
     """
     Update a user's profile information and broadcast the update event.
@@ -160,7 +228,7 @@ async def handle_update_user(websocket_session_id: str, user_id: str, data: dict
     try:
         valid_fields = ["name", "user_specialty", "default_template_id", "default_language"]
         update_fields = {k: v for k, v in data.items() if k in valid_fields}
-        user = db.update_user(user_id=data["user_id"], **update_fields)
+        user = await async_db.update_user(user_id=data["user_id"], **update_fields)
         broadcast_message = {
             "type": "update_user",
             "data": {
@@ -174,118 +242,161 @@ async def handle_update_user(websocket_session_id: str, user_id: str, data: dict
         logger.error(f"Error updating user: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def handle_resync_stream(websocket_session_id: str, user_id: str, data: dict):
+    """
+    Send the full text of an in-progress note or template generation to the requesting connection.
+    
+    Args:
+        websocket_session_id (str): The ID of the websocket session that saw a gap in the deltas.
+        user_id (str): The ID of the user.
+        data (dict): The data containing either visit_id or template_id.
+        
+    Note:
+        Nothing is sent if the generation has already finished; its FINISHED
+        message carries the full text.
+    """
+    if "visit_id" in data:
+        kind, id_field = "note", "visit_id"
+    else:
+        kind, id_field = "template", "template_id"
+    stream = get_stream(kind, data[id_field], user_id)
+    if stream is None:
+        return
+    await manager.send(websocket_session_id, user_id, {
+        "type": f"{kind}_resync",
+        "data": {id_field: data[id_field], **stream.snapshot()}
+    })
+
 @router.websocket("/ws/{session_id}")
-async def websocket_endpoint(websocket: WebSocket, session_id: str):
+async def websocket_endpoint(websocket: WebSocket, session_id: str, protocol: int = LEGACY_PROTOCOL, resume: str = None):
     """
     WebSocket endpoint for real-time communication.
     
     Args:
         websocket (WebSocket): The WebSocket connection.
         session_id (str): The session ID for authentication.
+        protocol (int, optional): The streaming protocol version the client speaks, see app.services.streaming.
+            Defaults to LEGACY_PROTOCOL.
+        resume (str, optional): The resume token of the client's previous connection,
+            see app.services.connection. Defaults to None.
         
     Note:
         Validates the session before establishing the WebSocket connection.
-        Handles different message types and routes them to appropriate handlers.
-        Manages connection lifecycle including cleanup on disconnect.
+        Sends a bootstrap message with the user, template summaries and first page of
+        visit summaries right after connecting, in place of /get, /get_templates and /get_visits.
+        A client reconnecting with a resume token instead receives the events it missed,
+        falling back to the bootstrap when they are no longer available.
+        Handles different message types and routes them to appropriate handlers
+        through the user's command queue, so messages for the same visit or template
+        run in order. When the queue is full the message is rejected with a
+        queue_full error for the client to retry. Stream resyncs bypass the queue.
+        Manages connection lifecycle including cleanup on disconnect, where recordings
+        left running are paused through the command queue, in order with the visit's other commands.
     """
     active_recordings = []
     
-    user_id = db.is_session_valid(session_id)
+    user_id = await async_db.is_session_valid(session_id)
     if not user_id: 
         await websocket.close(code=1008, reason="Invalid session")
         return
 
     websocket_session_id = str(uuid.uuid4())
-    await manager.connect(websocket, websocket_session_id, user_id)
+    await manager.connect(websocket, websocket_session_id, user_id, protocol, resume,
+                          snapshot=lambda: async_db.get_bootstrap(user_id))
 
     try:
         while True:
-            message = WebSocketMessage(**await websocket.receive_json())
-            if db.is_session_valid(message.session_id) is None and len(active_recordings) == 0: 
+            raw = await websocket.receive_json()
+            manager.touch(websocket_session_id, user_id)
+            message, errors = handlers.parse(raw)
+            if message is None:
+                await manager.send(websocket_session_id, user_id, {
+                    "type": "error",
+                    "data": {"reason": "invalid_message", "message": "Invalid message.", "errors": errors}
+                })
+                continue
+            if message.type == 'pong':
+                manager.record_pong(websocket_session_id, user_id)
+                continue
+            if await async_db.is_session_valid(message.session_id) is None and len(active_recordings) == 0: 
                 await websocket.close(code=1008, reason="Invalid session")
                 return
 
-            asyncio.create_task(process_message(websocket_session_id, user_id, message))
+            if message.type == 'resync_stream':
+                await handle_resync_stream(websocket_session_id, user_id, message.data.model_dump(exclude_unset=True))
+                continue
+
+            if not submit_command(user_id, command_key(message), message.type,
+                                  lambda message=message: handlers.dispatch(websocket_session_id, user_id, message),
+                                  settings.COMMAND_CONCURRENCY, settings.COMMAND_QUEUE_SIZE):
+                await manager.send(websocket_session_id, user_id, {
+                    "type": "error",
+                    "data": {
+                        "reason": "queue_full",
+                        "message": "Too many pending requests, please retry.",
+                        "request_type": message.type,
+                        **message.data.model_dump(include={"visit_id", "template_id"})
+                    }
+                })
+                continue
 
             try:
                 if message.type == 'start_recording':
-                    active_recordings.append(message.data['visit_id'])
+                    active_recordings.append(message.data.visit_id)
                 elif message.type == 'pause_recording':
-                    active_recordings.remove(message.data['visit_id'])
+                    active_recordings.remove(message.data.visit_id)
                 elif message.type == 'resume_recording':
-                    active_recordings.append(message.data['visit_id'])
+                    active_recordings.append(message.data.visit_id)
                 elif message.type == 'finish_recording':
-                    active_recordings.remove(message.data['visit_id'])
+                    active_recordings.remove(message.data.visit_id)
             except:
                 pass
         
     except WebSocketDisconnect:
         for visit_id in active_recordings:
-            old_visit = db.get_visit(visit_id)
-            old_duration = int(old_visit["recording_duration"] if old_visit["recording_duration"] else 0)
-            if old_visit.get("recording_started_at"):
-                time_diff = int((datetime.utcnow() - datetime.fromisoformat(old_visit["recording_started_at"])).total_seconds())
-                new_duration = old_duration + time_diff
-            else:
-                new_duration = old_duration
-            visit = db.update_visit(visit_id, status="PAUSED", recording_duration=str(new_duration))
-            broadcast_message = {
-                "type": "pause_recording",
-                "data": {
-                    "visit_id": visit_id,
-                    "status": "PAUSED",
-                    "modified_at": visit["modified_at"],
-                    "recording_duration": visit["recording_duration"]
-                }
-            }
-            await manager.broadcast(websocket_session_id, user_id, broadcast_message)
+            pause = lambda visit_id=visit_id: handle_pause_recording(websocket_session_id, user_id, {"visit_id": visit_id})
+            if not submit_command(user_id, ("visit", visit_id), "pause_recording", pause,
+                                  settings.COMMAND_CONCURRENCY, settings.COMMAND_QUEUE_SIZE):
+                logger.error(f"Command queue full pausing visit {visit_id} for user {user_id} on disconnect, pausing directly")
+                try:
+                    await pause()
+                except Exception as e:
+                    logger.error(f"Pause on disconnect error for visit {visit_id}, user {user_id}: {str(e)}")
         await manager.disconnect(websocket, websocket_session_id, user_id)
     except Exception as e:
         logger.error(f"Error in websocket: {e}")
         await websocket.close(code=1011, reason=str(e))
 
-async def process_message(websocket_session_id: str, user_id: str, message: WebSocketMessage):
+def command_key(message: WebSocketMessage):
     """
-    Process incoming WebSocket messages and route to appropriate handlers.
+    Get the entity a websocket message applies to, so messages for the same entity run in order.
     
     Args:
-        websocket_session_id (str): The ID of the websocket session.
-        user_id (str): The ID of the user sending the message.
-        message (WebSocketMessage): The message to process.
+        message (WebSocketMessage): The message.
         
-    Note:
-        Routes different message types to their respective handlers.
-        Times the processing of each message type for performance monitoring.
-        Logs errors that occur during message processing.
+    Returns:
+        tuple: The entity kind and ID, or None if the message does not apply to an existing entity.
     """
-    try:
-        if message.type == 'update_user':
-            await handle_update_user(websocket_session_id, user_id, message.data)
-        elif message.type == 'create_template':
-            await handle_create_template(websocket_session_id, user_id, message.data)
-        elif message.type == 'update_template':
-            await handle_update_template(websocket_session_id, user_id, message.data)
-        elif message.type == 'delete_template':
-            await handle_delete_template(websocket_session_id, user_id, message.data)
-        elif message.type == 'duplicate_template':
-            await handle_duplicate_template(websocket_session_id, user_id, message.data)
-        elif message.type == 'polish_template':
-            await handle_polish_template(websocket_session_id, user_id, message.data)
-        elif message.type == 'create_visit':
-            await handle_create_visit(websocket_session_id, user_id, message.data)
-        elif message.type == 'update_visit':
-            await handle_update_visit(websocket_session_id, user_id, message.data)
-        elif message.type == 'delete_visit':
-            await handle_delete_visit(websocket_session_id, user_id, message.data)
-        elif message.type == 'generate_note':
-            await handle_generate_note(websocket_session_id, user_id, message.data)   
-        elif message.type == 'start_recording':
-            await handle_start_recording(websocket_session_id, user_id, message.data)
-        elif message.type == 'pause_recording':
-            await handle_pause_recording(websocket_session_id, user_id, message.data)
-        elif message.type == 'resume_recording':
-            await handle_resume_recording(websocket_session_id, user_id, message.data)
-        elif message.type == 'finish_recording':
-            await handle_finish_recording(websocket_session_id, user_id, message.data)
-    except Exception as e:
-        logger.error(f"Error processing message {message.type}: {e}")
\ No newline at end of file
+    if getattr(message.data, "visit_id", None):
+        return ("visit", message.data.visit_id)
+    if getattr(message.data, "template_id", None):
+        return ("template", message.data.template_id)
+    if message.type == 'update_user':
+        return ("user", message.data.user_id)
+    return None
+
+handlers = HandlerRegistry(websocket_message_adapter)
+handlers.register('update_user', handle_update_user)
+handlers.register('create_template', handle_create_template)
+handlers.register('update_template', handle_update_template)
+handlers.register('delete_template', handle_delete_template)
+handlers.register('duplicate_template', handle_duplicate_template)
+handlers.register('polish_template', handle_polish_template)
+handlers.register('create_visit', handle_create_visit)
+handlers.register('update_visit', handle_update_visit)
+handlers.register('delete_visit', handle_delete_visit)
+handlers.register('generate_note', handle_generate_note)
+handlers.register('start_recording', handle_start_recording)
+handlers.register('pause_recording', handle_pause_recording)
+handlers.register('resume_recording', handle_resume_recording)
+handlers.register('finish_recording', handle_finish_recording)
@@ -1,9 +1,11 @@
-from app.database.database import db
+from app.database.database import async_db
 from app.services.connection import manager
 from app.services.logging import logger
 from fastapi import HTTPException
 from app.services.prompts import get_instructions
 from app.services.anthropic import ask_claude_stream, ask_claude_json, ask_claude
+from app.services.streaming import LEGACY_PROTOCOL, DELTA_PROTOCOL, open_stream, close_stream
+from app.services.commands import is_running_in_background, run_in_background
 from datetime import datetime
 from fastapi import APIRouter
 import asyncio
@@ -34,15 +36,15 @@ async def create_visit(request: CreateVisitRequest):
         HTTPException: If user is not found or there's an error during visit creation.
     """
     try:
-        user = db.get_user_by_email(request.user_email)
+        user = await async_db.get_user_by_email(request.user_email)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
         user_id = user['user_id']
-        visit = db.create_visit(user_id)
+        visit = await async_db.create_visit(user_id)
         
         if request.visit_name or request.visit_additional_context:
-            visit = db.update_visit(
+            visit = await async_db.update_visit(
                 visit_id=visit['visit_id'],
                 name=request.visit_name,
                 additional_context=request.visit_additional_context
@@ -71,7 +73,7 @@ async def handle_create_visit(websocket_session_id: str, user_id: str, data: dic
         Broadcasts the created visit to all connected clients for the user.
     """
     try:
-        visit = db.create_visit(user_id)
+        visit = await async_db.create_visit(user_id)
         broadcast_message = {
             "type": "create_visit",
             "data": visit
@@ -100,7 +102,7 @@ async def handle_update_visit(websocket_session_id: str, user_id: str, data: dic
     try:
         valid_fields = ["name", "status", "template_id", "language", "additional_context", "recording_started_at", "recording_duration", "recording_finished_at", "transcript", "note"]
         update_fields = {k: v for k, v in data.items() if k in valid_fields}
-        visit = db.update_visit(visit_id=data["visit_id"], **update_fields)
+        visit = await async_db.update_visit(visit_id=data["visit_id"], **update_fields)
         broadcast_message = {
             "type": "update_visit",
             "data": {
@@ -130,7 +132,7 @@ async def handle_delete_visit(websocket_session_id: str, user_id: str, data: dic
         Broadcasts the deletion event to all connected clients for the user.
     """
     try:
-        db.delete_visit(visit_id=data["visit_id"], user_id=user_id)
+        await async_db.delete_visit(visit_id=data["visit_id"], user_id=user_id)
         broadcast_message = {
             "type": "delete_visit",
             "data": {
@@ -158,18 +160,33 @@ async def handle_generate_note(websocket_session_id: str, user_id: str, data: di
         1. Retrieves relevant user, visit, and template data
         2. Creates instructions for Claude based on transcript, context and template
         3. Updates visit status to "GENERATING_NOTE"
-        4. Streams the generated note to connected clients
+        4. Streams the generated note to connected clients, as per-section deltas for
+           clients using the delta protocol and as the full note so far for legacy clients
         5. Updates the visit with the completed note and changes status to "FINISHED"
+        Steps 4 and 5 run in the background, so the visit's command lane is released
+        once the status is set. While a generation for the visit is running, the requester
+        gets an already_running error.
     """
     try:
-        admin = db.get_admin()
-        user = db.get_user(user_id=user_id)
-        visit = db.get_visit(visit_id=data["visit_id"])
-        template = db.get_template(template_id=visit.get("template_id"))
+        if is_running_in_background(("generate_note", data["visit_id"])):
+            await manager.send(websocket_session_id, user_id, {
+                "type": "error",
+                "data": {
+                    "reason": "already_running",
+                    "message": "A note is already being generated for this visit.",
+                    "request_type": "generate_note",
+                    "visit_id": data["visit_id"]
+                }
+            })
+            return
+        admin = await async_db.get_admin()
+        user = await async_db.get_user_record(user_id=user_id, fields=["name", "user_specialty", "emr_integration"])
+        visit = await async_db.get_visit_record(visit_id=data["visit_id"], fields=["transcript", "additional_context", "template_id"])
+        template = await async_db.get_template_record(template_id=visit.get("template_id"), fields=["instructions", "status"])
         sections = parse_sections(template.get("instructions"))
 
         if (len(visit.get("transcript").split()) + len(visit.get("additional_context").split())) < 10:
-            db.update_visit(visit_id=data["visit_id"], status="FINISHED", note="Insufficient transcript, please record again.")
+            await async_db.update_visit(visit_id=data["visit_id"], status="FINISHED", note="Insufficient transcript, please record again.")
             await manager.broadcast(websocket_session_id, user_id, {
                 "type": "note_generated",
                 "data": {
@@ -181,16 +198,6 @@ async def handle_generate_note(websocket_session_id: str, user_id: str, data: di
             return
         
         if template.get("status") == "EMR":
-            db.update_visit(visit_id=data["visit_id"], status="GENERATING_NOTE")
-            broadcast_message = {
-                "type": "note_generated",
-                "data": {
-                    "visit_id": data["visit_id"],
-                    "status": "GENERATING_NOTE"
-                }
-            }
-            await manager.broadcast(websocket_session_id, user_id, broadcast_message)
-
             JSON_SCHEMA = ""
             if user.get("emr_integration").get("emr") == "OFFICE_ALLY":
                 JSON_SCHEMA = officeally.JSON_SCHEMA
@@ -199,81 +206,87 @@ async def handle_generate_note(websocket_session_id: str, user_id: str, data: di
             else:
                 logger.error(f"Unsupported EMR: {user.get('emr_integration').get('emr')}")
                 raise HTTPException(status_code=400, detail="Unsupported EMR")
-                return
 
-            instructions = "Today's date: " + datetime.utcnow().strftime("%Y-%m-%d") + "\n\n" + visit.get("transcript") + "\n\n" + visit.get("additional_context") + "\n\n" + template.get("instructions")
-            
-            visit = db.update_visit(visit_id=data["visit_id"], status="FINISHED", note=await ask_claude_json(instructions, JSON_SCHEMA), template_modified_at=str(datetime.utcnow()))
+            await async_db.update_visit(visit_id=data["visit_id"], status="GENERATING_NOTE")
             broadcast_message = {
                 "type": "note_generated",
                 "data": {
                     "visit_id": data["visit_id"],
-                    "status": "FINISHED",
-                    "note": visit.get("note"),
-                    "template_modified_at": visit.get("template_modified_at")
+                    "status": "GENERATING_NOTE"
                 }
             }
             await manager.broadcast(websocket_session_id, user_id, broadcast_message)
+
+            instructions = "Today's date: " + datetime.utcnow().strftime("%Y-%m-%d") + "\n\n" + visit.get("transcript") + "\n\n" + visit.get("additional_context") + "\n\n" + template.get("instructions")
+            
+            async def generate_emr_note():
+                visit = await async_db.update_visit(visit_id=data["visit_id"], status="FINISHED", note=await ask_claude_json(instructions, JSON_SCHEMA), template_modified_at=str(datetime.utcnow()))
+                broadcast_message = {
+                    "type": "note_generated",
+                    "data": {
+                        "visit_id": data["visit_id"],
+                        "status": "FINISHED",
+                        "note": visit.get("note"),
+                        "template_modified_at": visit.get("template_modified_at")
+                    }
+                }
+                await manager.broadcast(websocket_session_id, user_id, broadcast_message)
+            
+            run_in_background(("generate_note", data["visit_id"]), "generate_note", generate_emr_note)
             return
         
-        db.update_visit(visit_id=data["visit_id"], status="GENERATING_NOTE")
-        section_responses = {}
-        response_lock = asyncio.Lock()
+        await async_db.update_visit(visit_id=data["visit_id"], status="GENERATING_NOTE")
+        stream = open_stream('note', data["visit_id"], user_id, [section['name'] for section in sections])
         
         async def handle_section_response(section_name, response):
-            async with response_lock:
-                section_responses[section_name] = response
-                combined_note = ""
-                for section in sections:
-                    if section['name'] in section_responses:
-                        if section['name']:
-                            combined_note += f"**{section['name']}**\n{section_responses[section['name']]}\n\n"
-                        else:
-                            combined_note += f"{section_responses[section['name']]}\n\n"
-                
+            delta = stream.update(section_name, response)
+            await manager.broadcast(websocket_session_id, user_id, {
+                "type": "note_delta",
+                "data": {"visit_id": data["visit_id"], **delta}
+            }, streaming=True, protocol=DELTA_PROTOCOL)
+            if manager.has_protocol(user_id, LEGACY_PROTOCOL):
                 await manager.broadcast(websocket_session_id, user_id, {
                     "type": "note_generated",
                     "data": {
                         "visit_id": data["visit_id"],
                         "status": "GENERATING_NOTE",
-                        "note": combined_note.strip()
+                        "note": stream.combined()
                     }
-                })
+                }, streaming=True, protocol=LEGACY_PROTOCOL)
         
-        tasks = []
-        for section in sections:
-            section_message = get_instructions(
-                admin.get("master_note_generation_instructions"),
-                visit.get("transcript"),
-                visit.get("additional_context"),
-                section['content'],
-                user.get("user_specialty"),
-                user.get("name")
-            )
-            tasks.append(generate_section(section['name'], section_message, handle_section_response))
-        await asyncio.gather(*tasks)
-        
-        final_note = ""
-        for section in sections:
-            if section['name'] in section_responses:
-                if section['name']:
-                    final_note += f"**{section['name']}**\n{section_responses[section['name']]}\n\n"
-                else:
-                    final_note += f"{section_responses[section['name']]}\n\n"
-        
-        final_note = final_note.strip()
-        template_modified_at = str(datetime.utcnow())
-        db.update_visit(visit_id=data["visit_id"], note=final_note, status="FINISHED", template_modified_at=template_modified_at)
+        async def generate_note():
+            tasks = []
+            for section in sections:
+                section_message = get_instructions(
+                    admin.get("master_note_generation_instructions"),
+                    visit.get("transcript"),
+                    visit.get("additional_context"),
+                    section['content'],
+                    user.get("user_specialty"),
+                    user.get("name")
+                )
+                tasks.append(generate_section(section['name'], section_message, handle_section_response))
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                close_stream('note', data["visit_id"], stream)
+            
+            final_note = stream.combined()
+            template_modified_at = str(datetime.utcnow())
+            await async_db.update_visit(visit_id=data["visit_id"], note=final_note, status="FINISHED", template_modified_at=template_modified_at)
+            
+            await manager.broadcast(websocket_session_id, user_id, {
+                "type": "note_generated",
+                "data": {
+                    "visit_id": data["visit_id"],
+                    "status": "FINISHED",
+                    "note": final_note,
+                    "template_modified_at": template_modified_at
+                }
+            })
         
-        await manager.broadcast(websocket_session_id, user_id, {
-            "type": "note_generated",
-            "data": {
-                "visit_id": data["visit_id"],
-                "status": "FINISHED",
-                "note": final_note,
-                "template_modified_at": template_modified_at
-            }
-        })
+        if not run_in_background(("generate_note", data["visit_id"]), "generate_note", generate_note):
+            close_stream('note', data["visit_id"], stream)
 
     except Exception as e:
         logger.error(f"Error generating note: {e}")
@@ -342,10 +355,10 @@ async def handle_generate_visit_name(websocket_session_id: str, user_id: str, da
         Broadcasts the updated name to all connected clients.
     """
     try:
-        visit = db.get_visit(data["visit_id"])
+        visit = await async_db.get_visit_record(data["visit_id"], fields=["name", "transcript", "additional_context"])
         if not visit.get("name") or visit.get("name") == "" or visit.get("name") == "New Visit":
             name = await ask_claude(f"Generate a name for the visit based on the transcript: {visit.get('transcript')} and additional context: {visit.get('additional_context')}. The name should be a single word or phrase that captures the name of the patient that is coming in for the visit. If no patient name can be found in the transcript or additional context, return exactly 'New Visit'.")
-            db.update_visit(data["visit_id"], name=name)
+            await async_db.update_visit(data["visit_id"], name=name)
             broadcast_message = {
                 "type": "update_visit",
                 "data": {
@@ -1,11 +1,20 @@
 import anthropic
+import asyncio
+import time
 from app.config import settings
+from app.services.metrics import metrics
+from app.services.logging import logger
 
 """
 Anthropic Service for the Halo Application.
 
 This module provides a service for interacting with the Anthropic API.
 It includes functionality for streaming and non-streaming responses from the API.
+
+Streamed text events arrive dozens of times per second, so stream callbacks are
+coalesced: the callback receives the full text so far at most once per
+STREAM_FLUSH_INTERVAL seconds, or sooner once STREAM_FLUSH_CHARS new characters
+have accumulated. The final text is always delivered.
 """
 
 MODEL = "claude-3-7-sonnet-latest"
@@ -13,28 +22,134 @@ MAX_TOKENS = 20000
 
 anthropic_client = anthropic.AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
 
-async def ask_claude_stream(message, callback, model=MODEL, max_tokens=MAX_TOKENS):
+metrics.counter('llm_stream_events_total', 'Text events received from Anthropic streams.')
+metrics.counter('llm_stream_callbacks_total', 'Stream callbacks made after coalescing text events.')
+metrics.histogram('llm_stream_callbacks_per_second', 'Stream callbacks per second, observed once per stream.', buckets=(1, 2, 5, 10, 20, 50, 100, 200))
+
+class StreamCoalescer:
+    """
+    Batches streamed text so a callback runs at a bounded rate, always delivering the final text.
+    """
+    def __init__(self, callback, flush_interval, flush_chars):
+        """
+        Initialize the coalescer.
+
+        Args:
+            callback (function): Async function called with the full text so far.
+            flush_interval (float): Minimum seconds between callbacks; 0 calls back on every event.
+            flush_chars (int): Number of new characters that triggers a callback before the interval has passed.
+        """
+        self.callback = callback
+        self.flush_interval = flush_interval
+        self.flush_chars = flush_chars
+        self.text = ""
+        self.flushed_text = ""
+        self.flushed_at = time.monotonic()
+        self.started_at = self.flushed_at
+        self.callbacks = 0
+        self.timer = None
+        self.lock = asyncio.Lock()
+
+    async def add(self, text):
+        """
+        Record the full text so far, calling back now if the interval or size threshold is reached.
+
+        Args:
+            text (str): The full text so far.
+        """
+        self.text = text
+        metrics.inc('llm_stream_events_total')
+        remaining = self.flush_interval - (time.monotonic() - self.flushed_at)
+        if remaining <= 0 or len(text) - len(self.flushed_text) >= self.flush_chars:
+            await self.flush()
+        elif self.timer is None:
+            self.timer = asyncio.create_task(self.flush_later(remaining))
+
+    async def flush_later(self, delay):
+        """
+        Call back after a delay, so text is delivered even if the stream pauses.
+
+        Args:
+            delay (float): Seconds to wait.
+
+        Note:
+            A failed callback is logged; its text is delivered by the next flush or by close().
+        """
+        await asyncio.sleep(delay)
+        self.timer = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"StreamCoalescer delayed flush error: {str(e)}")
+
+    async def flush(self):
+        """
+        Call back with the full text so far, if it changed since the last callback.
+
+        Raises:
+            Exception: If the callback raises; the text is then not marked as delivered.
+        """
+        async with self.lock:
+            text = self.text
+            if text == self.flushed_text:
+                return
+            self.flushed_at = time.monotonic()
+            self.callbacks += 1
+            metrics.inc('llm_stream_callbacks_total')
+            await self.callback(text)
+            self.flushed_text = text
+
+    def cancel(self):
+        """
+        Cancel a pending delayed callback.
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    async def close(self):
+        """
+        Deliver the final text and record the stream's callback rate.
+        """
+        self.cancel()
+        await self.flush()
+        elapsed = time.monotonic() - self.started_at
+        if elapsed > 0:
+            metrics.observe('llm_stream_callbacks_per_second', self.callbacks / elapsed)
+
+async def ask_claude_stream(message, callback, model=MODEL, max_tokens=MAX_TOKENS, flush_interval=None, flush_chars=None):
     """
     Streams a response from the Anthropic API.
 
     Args:
         message (str): The message to send to the API.
-        callback (function): A callback function to handle the response.
+        callback (function): A callback function to handle the response, called with the full text so far.
         model (str): The model to use for the API call.
         max_tokens (int): The maximum number of tokens to generate.
+        flush_interval (float, optional): Minimum seconds between callbacks. Defaults to STREAM_FLUSH_INTERVAL.
+        flush_chars (int, optional): New characters that trigger an early callback. Defaults to STREAM_FLUSH_CHARS.
         
     Returns:
         str: The full response from the API.
     """
     full_text = ""
-    async with anthropic_client.messages.stream(
-        model=model,
-        max_tokens=max_tokens,
-        messages=[{"role": "user", "content": message}]
-    ) as stream:
-        async for text in stream.text_stream:
-            full_text += text
-            await callback(full_text)
+    coalescer = StreamCoalescer(
+        callback,
+        settings.STREAM_FLUSH_INTERVAL if flush_interval is None else flush_interval,
+        settings.STREAM_FLUSH_CHARS if flush_chars is None else flush_chars
+    )
+    try:
+        async with anthropic_client.messages.stream(
+            model=model,
+            max_tokens=max_tokens,
+            messages=[{"role": "user", "content": message}]
+        ) as stream:
+            async for text in stream.text_stream:
+                full_text += text
+                await coalescer.add(full_text)
+    finally:
+        coalescer.cancel()
+    await coalescer.close()
     return full_text
 
 async def ask_claude(message, model=MODEL, max_tokens=MAX_TOKENS):
@@ -72,13 +187,20 @@ async def ask_claude_json(message, json_schema, callback = None, model=MODEL, ma
     RETURN ONLY IN JSON FORMAT. FOLLOW THE JSON SCHEMA PROVIDED AS CLOSELY AS POSSIBLE.
     """
     full_text = ""
-    async with anthropic_client.messages.stream(
-        model=model,
-        max_tokens=max_tokens,
-        messages=[{"role": "user", "content": message2}, {"role": "assistant", "content": "{"}]
-    ) as stream:
-        async for text in stream.text_stream:
-            full_text += text
-            if callback:
-                await callback(full_text)
+    coalescer = StreamCoalescer(callback, settings.STREAM_FLUSH_INTERVAL, settings.STREAM_FLUSH_CHARS) if callback else None
+    try:
+        async with anthropic_client.messages.stream(
+            model=model,
+            max_tokens=max_tokens,
+            messages=[{"role": "user", "content": message2}, {"role": "assistant", "content": "{"}]
+        ) as stream:
+            async for text in stream.text_stream:
+                full_text += text
+                if coalescer:
+                    await coalescer.add(full_text)
+    finally:
+        if coalescer:
+            coalescer.cancel()
+    if coalescer:
+        await coalescer.close()
     return "{" + full_text
\ No newline at end of file
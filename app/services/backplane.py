@@ -0,0 +1,173 @@
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+from datetime import datetime, timedelta
+from app.services.logging import logger
+from app.services.metrics import metrics
+from app.services.utils import encrypt, decrypt
+import asyncio
+import orjson
+import uuid
+
+"""
+Broadcast Backplane Service for the Halo Application.
+
+This module lets websocket broadcasts reach a user's connections on every worker
+process, not only the process that produced the message.
+
+Backplanes:
+- LocalBackplane: the default; delivers to the current process's connections only.
+  Use it when running a single worker.
+- MongoBackplane: every broadcast is delivered locally and published once to a
+  capped collection. Every worker tails the collection with a tailable cursor and
+  delivers messages published by other workers to its own connections. It works
+  against a standalone mongod or a replica set.
+  Messages can hold notes and transcripts, so they are stored encrypted like every
+  other such field. Streaming frames (partial notes and templates) are not published:
+  they are superseded within moments, and connections on other workers receive the
+  generation's status and final message instead.
+
+A backplane calls deliver(envelope) for each message, where the envelope holds the
+user_id, requesting_websocket_session_id, message, streaming and protocol arguments
+of ConnectionManager.broadcast. Envelopes received from other workers also carry
+remote=True.
+"""
+
+metrics.counter('broadcast_backplane_published_total', 'Broadcasts published to the backplane for other workers.')
+metrics.counter('broadcast_backplane_received_total', 'Broadcasts received from other workers through the backplane.')
+
+class LocalBackplane:
+    """
+    Backplane that delivers to the current process only.
+    """
+    local = True
+
+    def __init__(self):
+        """
+        Initialize the backplane.
+        """
+        self.deliver = None
+
+    async def publish(self, envelope: dict) -> int:
+        """
+        Deliver a broadcast to the current process's connections.
+
+        Args:
+            envelope (dict): The broadcast.
+        Returns:
+            int: The number of local connections the message was queued for.
+        """
+        return await self.deliver(envelope)
+
+    async def run(self):
+        """
+        Nothing to receive for a local backplane.
+        """
+        return
+
+class MongoBackplane:
+    """
+    Backplane that shares broadcasts between workers through a capped MongoDB collection.
+    """
+    local = False
+
+    def __init__(self, collection, size: int, poll_interval: float = 1, clock_skew: float = 5):
+        """
+        Initialize the backplane.
+
+        Args:
+            collection: The capped collection to publish to; created if missing.
+            size (int): The capped collection's size in bytes.
+            poll_interval (float, optional): Seconds to wait before reopening a dead cursor. Defaults to 1.
+            clock_skew (float, optional): Seconds another worker's clock may lag behind the newest broadcast seen. Defaults to 5.
+        """
+        self.collection = collection
+        self.size = size
+        self.poll_interval = poll_interval
+        self.clock_skew = timedelta(seconds=clock_skew)
+        self.worker_id = str(uuid.uuid4())
+        self.deliver = None
+
+    async def publish(self, envelope: dict) -> int:
+        """
+        Deliver a broadcast locally and publish it for the other workers, unless it is a streaming frame.
+
+        Args:
+            envelope (dict): The broadcast.
+        Returns:
+            int: The number of local connections the message was queued for.
+        """
+        connection_count = await self.deliver(envelope)
+        if envelope['streaming']:
+            return connection_count
+        try:
+            message = orjson.dumps(envelope['message'], option=orjson.OPT_NON_STR_KEYS).decode()
+            await self.collection.insert_one({
+                **{key: value for key, value in envelope.items() if key != 'message'},
+                'encrypt_message': encrypt(message),
+                'worker_id': self.worker_id,
+                'created_at': datetime.utcnow()
+            })
+            metrics.inc('broadcast_backplane_published_total')
+        except Exception as e:
+            logger.error(f"Backplane publish error for user {envelope['user_id']}: {str(e)}")
+        return connection_count
+
+    async def ensure_collection(self):
+        """
+        Create the capped collection if it does not exist.
+
+        Note:
+            A tailable cursor on an empty capped collection closes immediately,
+            so a marker document is written when the collection is created.
+        """
+        try:
+            await self.collection.database.create_collection(self.collection.name, capped=True, size=self.size)
+            await self.collection.insert_one({'worker_id': None, 'created_at': datetime.utcnow()})
+        except CollectionInvalid:
+            pass
+
+    async def run(self):
+        """
+        Tail the capped collection and deliver other workers' broadcasts until cancelled.
+
+        Note:
+            Only broadcasts published after the backplane starts are delivered. The query
+            always matches the last document seen, since a tailable cursor whose query
+            matches nothing closes immediately.
+            created_at comes from the publishing worker's clock, so the query reaches
+            clock_skew before the newest document seen, and documents already seen in that
+            window are skipped by _id. A dead cursor is reopened the same way.
+        """
+        since = None
+        seen = {}
+        while True:
+            try:
+                if since is None:
+                    await self.ensure_collection()
+                    last = await self.collection.find_one(sort=[('$natural', -1)])
+                    if last is None:
+                        last = {'worker_id': None, 'created_at': datetime.utcnow()}
+                        await self.collection.insert_one(last)
+                    since = last['created_at']
+                    seen = {last['_id']: since}
+                cursor = self.collection.find({'created_at': {'$gte': since - self.clock_skew}}, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    async for document in cursor:
+                        if document['_id'] in seen:
+                            continue
+                        seen[document['_id']] = document['created_at']
+                        if document['created_at'] > since:
+                            since = document['created_at']
+                            seen = {_id: created_at for _id, created_at in seen.items() if created_at >= since - self.clock_skew}
+                        if document['worker_id'] in (self.worker_id, None) or 'encrypt_message' not in document:
+                            continue
+                        metrics.inc('broadcast_backplane_received_total')
+                        envelope = {key: document.get(key) for key in ('user_id', 'requesting_websocket_session_id', 'streaming', 'protocol')}
+                        envelope['message'] = orjson.loads(decrypt(document['encrypt_message']))
+                        envelope['remote'] = True
+                        await self.deliver(envelope)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Backplane tail error for worker {self.worker_id}: {str(e)}")
+            await asyncio.sleep(self.poll_interval)
@@ -0,0 +1,159 @@
+from collections import OrderedDict
+import time
+
+"""
+Cache Service for the Halo Application.
+
+This module provides a small in-process LRU cache with per-entry expiry.
+It is bounded both by entry count and by age, and counts hits and misses
+so its effectiveness can be monitored.
+
+The cache is not thread-safe; it is meant to be used from the event loop.
+
+Read-through loads that await the database use begin_load and finish_load, so a
+value read before an invalidation (delete or clear) is never cached after it.
+"""
+
+class TTLCache:
+    """
+    Least-recently-used cache whose entries expire after a time to live.
+    """
+    def __init__(self, max_size, ttl):
+        """
+        Initialize the cache.
+
+        Args:
+            max_size (int): Maximum number of entries; the least recently used entry is evicted beyond it.
+            ttl (float): Default seconds an entry stays valid.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.loads = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """
+        Get a cached value, counting a hit or a miss.
+
+        Args:
+            key: The cache key.
+            default (optional): Value returned on a miss. Defaults to None.
+
+        Returns:
+            The cached value, or the default if it is missing or expired.
+        """
+        entry = self.entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self.entries[key]
+        self.misses += 1
+        return default
+
+    def peek(self, key, default=None):
+        """
+        Get a cached value without counting a lookup or refreshing its recency.
+
+        Args:
+            key: The cache key.
+            default (optional): Value returned if the entry is missing or expired. Defaults to None.
+
+        Returns:
+            The cached value, or the default.
+        """
+        entry = self.entries.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+        return default
+
+    def set(self, key, value, ttl=None):
+        """
+        Cache a value.
+
+        Args:
+            key: The cache key.
+            value: The value to cache.
+            ttl (float, optional): Seconds the entry stays valid, capped at the cache's ttl. Defaults to the cache's ttl.
+        """
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.max_size <= 0:
+            self.entries.pop(key, None)
+            return
+        self.entries[key] = (value, time.monotonic() + ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def begin_load(self, key):
+        """
+        Start loading a value for a key from its source.
+
+        Args:
+            key: The cache key.
+
+        Returns:
+            int: The key's generation, to pass to finish_load.
+        """
+        load = self.loads.setdefault(key, [0, 0])
+        load[1] += 1
+        return load[0]
+
+    def finish_load(self, key, generation, value=None, ttl=None):
+        """
+        Finish a load started with begin_load, caching the value unless the key was invalidated meanwhile.
+
+        Args:
+            key: The cache key.
+            generation (int): The generation returned by begin_load.
+            value (optional): The loaded value; None caches nothing. Defaults to None.
+            ttl (float, optional): Seconds the entry stays valid. Defaults to the cache's ttl.
+
+        Note:
+            Call it for every begin_load, even if the load failed, so the key's generation is released.
+        """
+        load = self.loads[key]
+        load[1] -= 1
+        current = load[0]
+        if load[1] == 0:
+            del self.loads[key]
+        if value is not None and current == generation:
+            self.set(key, value, ttl)
+
+    def delete(self, key):
+        """
+        Remove an entry if it is cached, and invalidate loads of it in progress.
+
+        Args:
+            key: The cache key.
+        """
+        self.entries.pop(key, None)
+        if key in self.loads:
+            self.loads[key][0] += 1
+
+    def clear(self):
+        """
+        Remove every entry, and invalidate every load in progress.
+        """
+        self.entries.clear()
+        for load in self.loads.values():
+            load[0] += 1
+
+    def stats(self):
+        """
+        Get the cache's size and hit/miss counters.
+
+        Returns:
+            dict: The number of entries, hits, misses and the hit ratio.
+        """
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
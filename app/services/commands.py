@@ -0,0 +1,180 @@
+from collections import deque
+from typing import Dict
+from app.services.logging import logger
+from app.services.metrics import metrics
+import asyncio
+import time
+
+"""
+Command Queue Service for the Halo Application.
+
+This module runs the commands a user sends over their websocket connections
+through a bounded per-user queue, instead of one unbounded task per message.
+
+Key features:
+- Commands for the same entity (e.g. a visit or a template) run one at a time, in the order received
+- Commands for different entities run concurrently, up to a per-user concurrency limit
+- A per-user bound on pending and running commands; submitting beyond it is rejected,
+  so the caller can push back on the client
+- Metrics for queue depth, time spent waiting and rejections
+
+Queues are shared by all of a user's connections in the process and dropped when empty.
+
+Long-running work such as LLM generation must not hold an entity's lane, or every
+later command for the entity waits for it. Such commands do their short setup in the
+lane (e.g. setting the GENERATING_* status) and hand the rest to run_in_background,
+which runs at most one background task per key.
+"""
+
+metrics.counter('command_rejected_total', 'Websocket commands rejected because the user\'s command queue was full, by type.')
+metrics.counter('command_background_total', 'Background commands started outside the command queue, by type.')
+metrics.histogram('command_wait_seconds', 'Seconds websocket commands waited in the queue before running, by type.')
+
+class CommandQueue:
+    """
+    Per-user queue of commands, ordered per entity and bounded in size and concurrency.
+    """
+    def __init__(self, user_id: str, concurrency: int, max_size: int):
+        """
+        Initialize the queue.
+
+        Args:
+            user_id (str): The ID of the user the commands belong to.
+            concurrency (int): Maximum number of commands running at once.
+            max_size (int): Maximum number of pending and running commands.
+        """
+        self.user_id = user_id
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.max_size = max_size
+        self.depth = 0
+        self.lanes = {}
+        self.tasks = set()
+
+    def submit(self, key, name: str, command) -> bool:
+        """
+        Queue a command.
+
+        Args:
+            key: The entity the command applies to; commands with the same key run in order.
+                None for commands that need no ordering.
+            name (str): The command type, used as a metric label.
+            command (function): Async function that runs the command.
+        Returns:
+            bool: False if the queue is full and the command was rejected.
+        """
+        if self.depth >= self.max_size:
+            metrics.inc('command_rejected_total', type=name)
+            return False
+        self.depth += 1
+        item = (name, command, time.monotonic())
+        lane = self.lanes.get(key) if key is not None else None
+        if lane is not None:
+            lane.append(item)
+            return True
+        lane = deque([item])
+        if key is not None:
+            self.lanes[key] = lane
+        task = asyncio.create_task(self.drain(key, lane))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return True
+
+    async def drain(self, key, lane: deque):
+        """
+        Run a lane's commands in order until it is empty.
+
+        Args:
+            key: The lane's entity key, or None.
+            lane (deque): The lane's pending commands; the running command stays at its head.
+        """
+        try:
+            while lane:
+                name, command, enqueued_at = lane[0]
+                try:
+                    async with self.semaphore:
+                        metrics.observe('command_wait_seconds', time.monotonic() - enqueued_at, type=name)
+                        await command()
+                except Exception as e:
+                    logger.error(f"Command error for user {self.user_id}, command {name}: {str(e)}")
+                finally:
+                    lane.popleft()
+                    self.depth -= 1
+        finally:
+            if key is not None and self.lanes.get(key) is lane:
+                del self.lanes[key]
+            if self.depth == 0 and command_queues.get(self.user_id) is self:
+                del command_queues[self.user_id]
+
+command_queues: Dict[str, CommandQueue] = {}
+
+metrics.gauge('command_queue_depth', 'Pending and running websocket commands, summed over users.',
+              lambda: sum(queue.depth for queue in command_queues.values()))
+metrics.gauge('command_queue_depth_max', 'Pending and running websocket commands of the busiest user.',
+              lambda: max((queue.depth for queue in command_queues.values()), default=0))
+
+def submit_command(user_id: str, key, name: str, command, concurrency: int, max_size: int) -> bool:
+    """
+    Queue a command on a user's command queue, creating the queue if needed.
+
+    Args:
+        user_id (str): The ID of the user the command belongs to.
+        key: The entity the command applies to, or None.
+        name (str): The command type.
+        command (function): Async function that runs the command.
+        concurrency (int): Maximum number of the user's commands running at once.
+        max_size (int): Maximum number of the user's pending and running commands.
+    Returns:
+        bool: False if the user's queue is full and the command was rejected.
+    """
+    queue = command_queues.get(user_id)
+    if queue is None:
+        queue = command_queues[user_id] = CommandQueue(user_id, concurrency, max_size)
+    return queue.submit(key, name, command)
+
+background_tasks: Dict[tuple, asyncio.Task] = {}
+
+metrics.gauge('command_background_running', 'Background commands running.', lambda: len(background_tasks))
+
+def is_running_in_background(key) -> bool:
+    """
+    Check whether a background command is running for a key.
+
+    Args:
+        key: The key the command was started with.
+    Returns:
+        bool: True if the command is still running.
+    """
+    return key in background_tasks
+
+def run_in_background(key, name: str, command) -> bool:
+    """
+    Run a long-running command as its own task, outside the command queue's lanes.
+
+    Args:
+        key: Identifies the work, e.g. ("generate_note", visit_id); one command runs per key at a time.
+        name (str): The command type, used as a metric label.
+        command (function): Async function that runs the command.
+    Returns:
+        bool: False if a command is already running for the key and nothing was started.
+    """
+    if key in background_tasks:
+        return False
+    metrics.inc('command_background_total', type=name)
+    background_tasks[key] = asyncio.create_task(run_background_command(key, name, command))
+    return True
+
+async def run_background_command(key, name: str, command):
+    """
+    Run a background command, logging its errors and releasing its key when done.
+
+    Args:
+        key: The key the command was started with.
+        name (str): The command type.
+        command (function): Async function that runs the command.
+    """
+    try:
+        await command()
+    except Exception as e:
+        logger.error(f"Background command error for {key}, command {name}: {str(e)}")
+    finally:
+        del background_tasks[key]
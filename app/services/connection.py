@@ -1,9 +1,17 @@
 from fastapi import WebSocket
 from fastapi.websockets import WebSocketState
 from typing import Dict, List, Set
+from collections import deque
 import asyncio
+import orjson
+import time
 from datetime import datetime
+from app.config import settings
 from app.services.logging import logger
+from app.services.metrics import metrics
+from app.services.streaming import LEGACY_PROTOCOL
+from app.services.backplane import LocalBackplane
+from app.services.replay import EPOCH, ReplayBuffer, parse_resume_token
 
 """
 WebSocket Connection Manager for the Halo Application.
@@ -14,34 +22,185 @@ performing health checks on open connections.
 
 Key features:
 - Connection lifecycle management (connect, disconnect)
-- Message broadcasting to specific users
-- Periodic health checks for stale connections
-- Activity tracking for connections
+- Message broadcasting to specific users, on every worker through a pluggable backplane
+- Per-connection bounded outbound queues, each drained by its own writer task
+- Encode-once broadcasts, so a message is serialized once however many connections receive it
+- Application-level ping/pong heartbeat, with eviction of idle and closed connections
+- A per-user connection cap that evicts the user's least recently active connection
+- Activity tracking for connections, from the messages each client sends
+- Resumable sessions: per-user sequence numbers and a replay buffer of recent events
+
+Broadcasting only enqueues, so a slow or half-dead connection delays nobody but itself.
+When a connection's queue is full, the overflow policy for the frame's kind applies:
+- 'drop_oldest' discards the oldest queued streaming frame (or the oldest frame if none is streaming)
+- 'disconnect' closes the connection so the client can reconnect and resynchronize
+Streaming frames (partial notes and templates) default to 'drop_oldest'; control
+frames default to 'disconnect'. A dropped legacy streaming frame is superseded by the
+next one, which carries the full text so far. A dropped note_delta or template_delta
+leaves a gap in the stream's seq, and the client recovers with resync_stream (see
+app.services.streaming); the final FINISHED message carries the full result either way.
+
+Every health check interval, each connection is sent {"type": "ping", "data": {"timestamp"}},
+which clients answer with {"type": "pong", "session_id", "data": {}}. Any message from the client counts as
+activity. Once a connection has answered a ping, it is evicted after WEBSOCKET_IDLE_TIMEOUT
+seconds without activity. Clients that never answer pings (clients predating the heartbeat
+that only listen) are not evicted as idle; closed connections and failed sends still remove them.
+
+Every non-streaming broadcast carries a per-user "seq" and is kept in the user's replay
+buffer (see app.services.replay). A client reconnecting with the resume token
+"<epoch>:<seq>" of the last event it saw first receives {"type": "resumed", "data":
+{"epoch", "seq"}} followed by the events it missed. When the events are no longer
+buffered, or the token is from another process, it receives a fresh bootstrap snapshot
+instead, whose epoch and seq form its next resume token.
 
 All WebSocket operations are encapsulated in the ConnectionManager class,
 with proper error handling and logging.
 """
 
+def encode_broadcast(message: dict, seq: int = None):
+    """
+    Encode a broadcast message once, in both of its per-connection variants.
+
+    Args:
+        message (dict): The message to broadcast.
+        seq (int, optional): The message's per-user sequence number, added as "seq". Defaults to None.
+    Returns:
+        tuple: The encoded text with was_requested set to true, and with it set to false.
+
+    Note:
+        The message is serialized a single time; the was_requested flag is spliced in
+        before the closing brace rather than re-encoding the message per connection.
+    """
+    body = orjson.dumps(message, option=orjson.OPT_NON_STR_KEYS)[:-1]
+    separator = b',' if len(body) > 1 else b''
+    if seq is not None:
+        body += separator + b'"seq":' + str(seq).encode()
+        separator = b','
+    return (
+        (body + separator + b'"was_requested":true}').decode(),
+        (body + separator + b'"was_requested":false}').decode(),
+    )
+
+metrics.counter('websocket_frames_sent_total', 'Frames sent to websocket connections, by kind.')
+metrics.counter('websocket_frames_dropped_total', 'Frames dropped from full outbound queues, by kind.')
+metrics.counter('websocket_overflow_disconnects_total', 'Connections closed because their outbound queue overflowed, by kind.')
+metrics.histogram('websocket_send_seconds', 'Seconds from enqueueing a frame to finishing its send, by kind.')
+metrics.counter('websocket_connections_opened_total', 'Websocket connections accepted.')
+metrics.counter('websocket_evictions_total', 'Websocket connections closed by the server, by reason.')
+metrics.counter('websocket_resumes_total', 'Websocket connections that resumed a session, by outcome (replayed or snapshot).')
+metrics.counter('websocket_replayed_events_total', 'Buffered events replayed to resuming websocket connections.')
+metrics.histogram('websocket_connection_lifetime_seconds', 'Seconds websocket connections stayed open.', buckets=(1, 10, 60, 300, 900, 1800, 3600, 7200, 14400, 28800, 86400))
+
+class OutboundQueue:
+    """
+    Bounded queue of frames for one connection, drained by a writer task.
+    """
+    def __init__(self, websocket: WebSocket, max_size: int):
+        """
+        Initialize the queue.
+
+        Args:
+            websocket (WebSocket): The connection the frames are sent to.
+            max_size (int): Maximum number of queued frames.
+        """
+        self.websocket = websocket
+        self.max_size = max_size
+        self.frames = deque()
+        self.ready = asyncio.Event()
+        self.task = None
+
+    def put(self, message: str, streaming: bool, policy: str) -> bool:
+        """
+        Queue a frame, applying the overflow policy if the queue is full.
+
+        Args:
+            message (str): The encoded frame to send.
+            streaming (bool): Whether the frame is a streaming frame.
+            policy (str): The overflow policy for the frame's kind ('drop_oldest' or 'disconnect').
+
+        Returns:
+            bool: False if the queue overflowed and the connection must be closed.
+        """
+        kind = 'streaming' if streaming else 'control'
+        if len(self.frames) >= self.max_size:
+            if policy == 'disconnect':
+                metrics.inc('websocket_overflow_disconnects_total', kind=kind)
+                return False
+            self.drop_oldest()
+        self.frames.append((message, kind, time.monotonic()))
+        self.ready.set()
+        return True
+
+    def drop_oldest(self):
+        """
+        Discard the oldest streaming frame, or the oldest frame if none is streaming.
+        """
+        for index, (_, kind, _) in enumerate(self.frames):
+            if kind == 'streaming':
+                del self.frames[index]
+                break
+        else:
+            kind = self.frames.popleft()[1]
+        metrics.inc('websocket_frames_dropped_total', kind=kind)
+
+    async def run(self):
+        """
+        Send queued frames in order until the connection fails or the task is cancelled.
+
+        Raises:
+            Exception: If a send fails.
+        """
+        while True:
+            if not self.frames:
+                self.ready.clear()
+                await self.ready.wait()
+                continue
+            message, kind, enqueued_at = self.frames.popleft()
+            await self.websocket.send_text(message)
+            metrics.inc('websocket_frames_sent_total', kind=kind)
+            metrics.observe('websocket_send_seconds', time.monotonic() - enqueued_at, kind=kind)
 
 class ConnectionManager:
     """
     Main connection manager class that handles all WebSocket connections.
     Provides methods for connection lifecycle, message broadcasting, and health checks.
     """
-    def __init__(self, health_check_interval: int = 30):
+    def __init__(self, health_check_interval: int = 30, idle_timeout: float = 90, max_connections_per_user: int = 10):
         """
         Initialize the connection manager with connection tracking dictionaries.
         
         Args:
-            health_check_interval (int): Interval in seconds between health checks. Defaults to 30.
+            health_check_interval (int): Interval in seconds between health checks and pings. Defaults to 30.
+            idle_timeout (float): Seconds without client activity before a connection is evicted. Defaults to 90.
+            max_connections_per_user (int): Maximum open connections per user. Defaults to 10.
             
         Note:
-            Sets up dictionaries for tracking active connections and last activity timestamps.
+            Sets up dictionaries for tracking active connections, their outbound queues,
+            streaming protocol versions, connection times, last activity timestamps
+            and per-user replay buffers.
         """
         self.active_connections: Dict[str, Dict[str, WebSocket]] = {}
+        self.outbound: Dict[str, OutboundQueue] = {}
+        self.protocols: Dict[str, int] = {}
+        self.connected_at: Dict[str, float] = {}
         self.last_activity: Dict[str, Dict[str, datetime]] = {}
+        self.heartbeats: Set[str] = set()
+        self.replay: Dict[str, ReplayBuffer] = {}
         self.health_check_interval = health_check_interval
+        self.idle_timeout = idle_timeout
+        self.max_connections_per_user = max_connections_per_user
         self.health_check_task = None
+        self.backplane = None
+        self.use_backplane(LocalBackplane())
+        self.overflow_policies = {
+            'streaming': settings.WEBSOCKET_STREAM_OVERFLOW,
+            'control': settings.WEBSOCKET_CONTROL_OVERFLOW,
+        }
+        metrics.gauge('websocket_connections', 'Open websocket connections.', lambda: len(self.outbound))
+        metrics.gauge('websocket_queue_depth', 'Frames waiting in outbound queues, summed over connections.',
+                      lambda: sum(len(queue.frames) for queue in self.outbound.values()))
+        metrics.gauge('websocket_queue_depth_max', 'Frames waiting in the fullest outbound queue.',
+                      lambda: max((len(queue.frames) for queue in self.outbound.values()), default=0))
         
     async def start_health_check(self):
         """
@@ -63,20 +222,67 @@ class ConnectionManager:
             
     async def _check_connections(self):
         """
-        Check all connections and remove closed ones.
+        Check all connections, evicting closed and idle ones and pinging the rest.
         
-        Iterates through all active connections and removes any that are in a disconnected state.
+        Iterates through all active connections and evicts any that are in a disconnected state
+        or, having answered a ping, have had no client activity for the idle timeout. Drops the replay buffers of users
+        who have had no connection for the replay retention period.
         """
-        connections_copy = dict(self.active_connections)
-        for user_id in connections_copy.keys():
-            if user_id in self.active_connections:
-                user_connections_copy = dict(self.active_connections[user_id])
-                for websocket_session_id, websocket in user_connections_copy.items():
-                    if websocket.client_state == WebSocketState.DISCONNECTED:
-                        logger.info(f"Health check: Removing stale connection for user {user_id}, websocket session {websocket_session_id}")
-                        await self._remove_connection(websocket, websocket_session_id, user_id)
+        now = datetime.now()
+        ping = encode_broadcast({"type": "ping", "data": {"timestamp": str(now)}})[1]
+        for user_id in list(self.active_connections):
+            for websocket_session_id, websocket in list(self.active_connections.get(user_id, {}).items()):
+                if websocket.client_state == WebSocketState.DISCONNECTED:
+                    self._evict(websocket_session_id, user_id, 'disconnected')
+                elif (websocket_session_id in self.heartbeats
+                      and (now - self.last_activity[user_id][websocket_session_id]).total_seconds() > self.idle_timeout):
+                    self._evict(websocket_session_id, user_id, 'idle')
+                else:
+                    self._enqueue(websocket_session_id, user_id, ping, False)
+        expired_at = time.monotonic() - settings.REPLAY_RETENTION
+        for user_id in list(self.replay):
+            if user_id not in self.active_connections and self.replay[user_id].touched_at < expired_at:
+                del self.replay[user_id]
+                    
+    def touch(self, websocket_session_id: str, user_id: str):
+        """
+        Record client activity on a connection.
         
-    async def connect(self, websocket: WebSocket, websocket_session_id: str, user_id: str):
+        Args:
+            websocket_session_id (str): The websocket session ID associated with this connection.
+            user_id (str): The ID of the user who owns the connection.
+        """
+        if websocket_session_id in self.last_activity.get(user_id, {}):
+            self.last_activity[user_id][websocket_session_id] = datetime.now()
+            
+    def record_pong(self, websocket_session_id: str, user_id: str):
+        """
+        Record that a connection answers pings, making it subject to idle eviction.
+        
+        Args:
+            websocket_session_id (str): The websocket session ID associated with this connection.
+            user_id (str): The ID of the user who owns the connection.
+        """
+        if websocket_session_id in self.last_activity.get(user_id, {}):
+            self.heartbeats.add(websocket_session_id)
+            
+    def _evict(self, websocket_session_id: str, user_id: str, reason: str):
+        """
+        Close a connection from the server side and stop tracking it.
+        
+        Args:
+            websocket_session_id (str): The websocket session ID associated with this connection.
+            user_id (str): The ID of the user who owns the connection.
+            reason (str): Why the connection is evicted, recorded in the evictions counter.
+        """
+        websocket = self.active_connections[user_id][websocket_session_id]
+        logger.error(f"Evicting websocket session {websocket_session_id} for user {user_id}: {reason}")
+        metrics.inc('websocket_evictions_total', reason=reason)
+        self._forget_connection(websocket_session_id, user_id)
+        asyncio.create_task(self._close(websocket))
+        
+    async def connect(self, websocket: WebSocket, websocket_session_id: str, user_id: str, protocol: int = LEGACY_PROTOCOL,
+                      resume: str = None, snapshot=None):
         """
         Connect a new websocket for a websocket session ID.
         
@@ -84,21 +290,90 @@ class ConnectionManager:
             websocket (WebSocket): The WebSocket connection to register.
             websocket_session_id (str): The websocket session ID associated with this connection.
             user_id (str): The ID of the user who owns the connection.
+            protocol (int, optional): The streaming protocol version the client speaks. Defaults to LEGACY_PROTOCOL.
+            resume (str, optional): The client's resume token, "<epoch>:<seq>". Defaults to None.
+            snapshot (function, optional): Async function returning the bootstrap data sent when
+                the session cannot be resumed. Defaults to None, which sends no bootstrap.
             
         Note:
             Accepts the WebSocket connection and adds it to the active connections.
+            If the user is at the connection cap, evicts their least recently active connection.
+            Starts the writer task that drains the connection's outbound queue.
             Updates the last activity timestamp for the connection.
+            The first frames queued are either the resumed message and the missed events,
+            or the bootstrap snapshot followed by any events published while it was read;
+            the connection only receives live broadcasts after them.
         """
         await websocket.accept()
+        buffer = self.replay.get(user_id)
+        if buffer is None:
+            buffer = self.replay[user_id] = ReplayBuffer(settings.REPLAY_BUFFER_SIZE)
+        seq = parse_resume_token(resume) if resume else None
+        events = buffer.since(seq) if seq is not None else None
+        if events is not None:
+            first = {"type": "resumed", "data": {"epoch": EPOCH, "seq": seq}}
+            metrics.inc('websocket_resumes_total', outcome='replayed')
+        else:
+            first = None
+            if resume:
+                metrics.inc('websocket_resumes_total', outcome='snapshot')
+            for _ in range(3):
+                seq = buffer.seq
+                data = await snapshot() if snapshot else None
+                events = buffer.since(seq)
+                if events is not None:
+                    break
+            else:
+                logger.error(f"Replay buffer overrun while bootstrapping user {user_id}, websocket session {websocket_session_id}")
+                events = []
+            if data:
+                first = {"type": "bootstrap", "data": {**data, "epoch": EPOCH, "seq": seq}}
+            
         if user_id not in self.active_connections:
             self.active_connections[user_id] = {}
         if user_id not in self.last_activity:
             self.last_activity[user_id] = {}
+        while len(self.active_connections[user_id]) >= self.max_connections_per_user:
+            oldest = min(self.last_activity[user_id], key=self.last_activity[user_id].get)
+            self._evict(oldest, user_id, 'connection_cap')
+            if user_id not in self.active_connections:
+                self.active_connections[user_id] = {}
+                self.last_activity[user_id] = {}
             
         self.active_connections[user_id][websocket_session_id] = websocket
         self.last_activity[user_id][websocket_session_id] = datetime.now()
+        queue = OutboundQueue(websocket, settings.WEBSOCKET_QUEUE_SIZE)
+        queue.task = asyncio.create_task(self._write(queue, websocket_session_id, user_id))
+        self.outbound[websocket_session_id] = queue
+        self.protocols[websocket_session_id] = protocol
+        self.connected_at[websocket_session_id] = time.monotonic()
+        metrics.inc('websocket_connections_opened_total')
+        if first:
+            self._enqueue(websocket_session_id, user_id, encode_broadcast(first)[0], False)
+        for event_seq, message, event_protocol in events:
+            if event_protocol is None or event_protocol == protocol:
+                self._enqueue(websocket_session_id, user_id, encode_broadcast(message, event_seq)[1], False)
+                metrics.inc('websocket_replayed_events_total')
         logger.info(f"New connection established for websocket session {websocket_session_id}, user {user_id}")
         
+    async def _write(self, queue: OutboundQueue, websocket_session_id: str, user_id: str):
+        """
+        Writer task for one connection; removes the connection if a send fails.
+        
+        Args:
+            queue (OutboundQueue): The connection's outbound queue.
+            websocket_session_id (str): The websocket session ID associated with this connection.
+            user_id (str): The ID of the user who owns the connection.
+        """
+        try:
+            await queue.run()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error sending message to user {user_id}, websocket session {websocket_session_id}: {str(e)}")
+            if websocket_session_id in self.active_connections.get(user_id, {}):
+                self._evict(websocket_session_id, user_id, 'send_error')
+        
     async def disconnect(self, websocket: WebSocket, websocket_session_id: str, user_id: str):
         """
         Disconnect a websocket for a websocket session.
@@ -113,6 +388,40 @@ class ConnectionManager:
         """
         await self._remove_connection(websocket, websocket_session_id, user_id)
         
+    def _forget_connection(self, websocket_session_id: str, user_id: str) -> bool:
+        """
+        Stop tracking a connection and stop its writer task, without closing the WebSocket.
+        
+        Args:
+            websocket_session_id (str): The websocket session ID associated with this connection.
+            user_id (str): The ID of the user who owns the connection.
+            
+        Returns:
+            bool: True if the connection was being tracked.
+            
+        Note:
+            Cleans up any empty dictionaries in the tracking structures after removal.
+            Frames still queued for the connection are discarded.
+        """
+        if user_id not in self.active_connections or websocket_session_id not in self.active_connections[user_id]:
+            return False
+        del self.active_connections[user_id][websocket_session_id]
+        if user_id in self.last_activity and websocket_session_id in self.last_activity[user_id]:
+            del self.last_activity[user_id][websocket_session_id]
+        if not self.active_connections[user_id]:
+            del self.active_connections[user_id]
+            if user_id in self.last_activity:
+                del self.last_activity[user_id]
+            if user_id in self.replay:
+                self.replay[user_id].touched_at = time.monotonic()
+        queue = self.outbound.pop(websocket_session_id, None)
+        self.protocols.pop(websocket_session_id, None)
+        self.heartbeats.discard(websocket_session_id)
+        metrics.observe('websocket_connection_lifetime_seconds', time.monotonic() - self.connected_at.pop(websocket_session_id))
+        if queue and queue.task is not asyncio.current_task():
+            queue.task.cancel()
+        return True
+        
     async def _remove_connection(self, websocket: WebSocket, websocket_session_id: str, user_id: str):
         """
         Remove a connection from the active connections.
@@ -123,23 +432,77 @@ class ConnectionManager:
             user_id (str): The ID of the user who owns the connection.
             
         Note:
-            Cleans up any empty dictionaries in the tracking structures after removal.
             Handles exceptions if the WebSocket is already closed.
         """
-        if user_id in self.active_connections and websocket_session_id in self.active_connections[user_id]:
-            del self.active_connections[user_id][websocket_session_id]
-            if user_id in self.last_activity and websocket_session_id in self.last_activity[user_id]:
-                del self.last_activity[user_id][websocket_session_id]
-            if not self.active_connections[user_id]:
-                del self.active_connections[user_id]
-                if user_id in self.last_activity:
-                    del self.last_activity[user_id]
+        if self._forget_connection(websocket_session_id, user_id):
             try:
                 await websocket.close()
             except Exception:
                 pass
                 
-    async def broadcast(self, requesting_websocket_session_id: str, user_id: str, message: dict):
+    def use_backplane(self, backplane):
+        """
+        Set the backplane broadcasts are published through.
+        
+        Args:
+            backplane: A backplane from app.services.backplane; run its run() task to receive other workers' broadcasts.
+        """
+        backplane.deliver = self.deliver
+        self.backplane = backplane
+        
+    def has_protocol(self, user_id: str, protocol: int) -> bool:
+        """
+        Check whether any of a user's connections speak a streaming protocol version.
+        
+        Args:
+            user_id (str): The ID of the user.
+            protocol (int): The protocol version.
+            
+        Returns:
+            bool: True if at least one of the user's connections on this worker uses the version.
+            
+        Note:
+            Only this worker's connections count, since streaming frames are not published
+            to other workers.
+        """
+        return any(self.protocols.get(websocket_session_id) == protocol for websocket_session_id in self.active_connections.get(user_id, {}))
+        
+    async def send(self, websocket_session_id: str, user_id: str, message: dict):
+        """
+        Send a message to a single connection, with was_requested=True.
+        
+        Args:
+            websocket_session_id (str): The websocket session ID to send to.
+            user_id (str): The ID of the user who owns the connection.
+            message (dict): The message to send.
+            
+        Returns:
+            bool: True if the message was queued.
+        """
+        if websocket_session_id not in self.active_connections.get(user_id, {}):
+            return False
+        return self._enqueue(websocket_session_id, user_id, encode_broadcast(message)[0], False)
+        
+    def _enqueue(self, websocket_session_id: str, user_id: str, frame: str, streaming: bool) -> bool:
+        """
+        Queue an encoded frame for a connection, closing the connection if its queue overflows under the 'disconnect' policy.
+        
+        Args:
+            websocket_session_id (str): The websocket session ID to send to.
+            user_id (str): The ID of the user who owns the connection.
+            frame (str): The encoded frame.
+            streaming (bool): Whether the frame is a streaming frame.
+            
+        Returns:
+            bool: True if the frame was queued.
+        """
+        policy = self.overflow_policies['streaming' if streaming else 'control']
+        if self.outbound[websocket_session_id].put(frame, streaming, policy):
+            return True
+        self._evict(websocket_session_id, user_id, 'overflow')
+        return False
+        
+    async def broadcast(self, requesting_websocket_session_id: str, user_id: str, message: dict, streaming: bool = False, protocol: int = None):
         """
         Broadcast a message to all connections for a user.
         
@@ -147,44 +510,84 @@ class ConnectionManager:
             requesting_websocket_session_id (str, optional): The websocket session ID that requested this message.
             user_id (str): The ID of the user to broadcast to.
             message (dict): The message to broadcast.
+            streaming (bool, optional): Whether the message is a streaming frame that a later frame
+                supersedes, such as a partially generated note. Defaults to False.
+            protocol (int, optional): Only send to connections speaking this streaming protocol version.
+                Defaults to None, which sends to every connection.
             
         Returns:
-            int: The number of connections that received the message.
+            int: The number of connections on this worker the message was queued for.
             
         Note:
-            Updates the last activity timestamp for each connection that receives the message.
+            Publishes the message once through the backplane, which delivers it to
+            the user's connections on every worker.
+        """
+        return await self.backplane.publish({
+            'user_id': user_id,
+            'requesting_websocket_session_id': requesting_websocket_session_id,
+            'message': message,
+            'streaming': streaming,
+            'protocol': protocol,
+        })
+
+    async def deliver(self, envelope: dict):
+        """
+        Deliver a broadcast to the user's connections on this worker.
+        
+        Args:
+            envelope (dict): The user_id, requesting_websocket_session_id, message, streaming
+                and protocol arguments of a broadcast.
+            
+        Returns:
+            int: The number of connections the message was queued for.
+            
+        Note:
+            Encodes the message once and only queues it; each connection's writer task
+            sends it as a text frame.
             Sets was_requested=True for the websocket session that requested the message.
-            Removes connections that fail to receive the message.
+            Closes connections whose queue overflows under the 'disconnect' policy.
+            Non-streaming messages are numbered and kept in the user's replay buffer,
+            if the user has one, even while the user has no connections.
+            Messages from other workers (remote=True) are expected to find no connections
+            here for most users, so they are dropped without a warning.
         """
+        user_id = envelope['user_id']
+        requesting_websocket_session_id = envelope['requesting_websocket_session_id']
+        protocol = envelope['protocol']
+        streaming = envelope['streaming']
+        seq = None
+        if not streaming and user_id in self.replay:
+            seq = self.replay[user_id].append(envelope['message'], protocol)
         if user_id not in self.active_connections:
-            logger.warning(f"No active connections for user {user_id}")
+            if not envelope.get('remote'):
+                logger.warning(f"No active connections for user {user_id}")
             return 0
             
         connection_count = 0
-        failed_sessions = []
-
-        connections_copy = dict(self.active_connections[user_id])        
-        for websocket_session_id, websocket in connections_copy.items():
-            if (user_id in self.active_connections and 
-                websocket_session_id in self.active_connections[user_id]):
-                try:
-                    msg_copy = dict(message)
-                    msg_copy["was_requested"] = (websocket_session_id == requesting_websocket_session_id)
-                    await websocket.send_json(msg_copy)
-                    connection_count += 1
-                    if user_id in self.last_activity and websocket_session_id in self.last_activity[user_id]:
-                        self.last_activity[user_id][websocket_session_id] = datetime.now()
-                except Exception as e:
-                    logger.error(f"Error sending message to user {user_id}, websocket session {websocket_session_id}: {str(e)}")
-                    failed_sessions.append((websocket_session_id, websocket))
-                
-        for websocket_session_id, websocket in failed_sessions:
-            logger.info(f"Removing failed connection for user {user_id}, websocket session {websocket_session_id}")
-            await self._remove_connection(websocket, websocket_session_id, user_id)
+        requested_text, text = encode_broadcast(envelope['message'], seq)
+
+        for websocket_session_id in list(self.active_connections[user_id]):
+            if protocol is not None and self.protocols[websocket_session_id] != protocol:
+                continue
+            frame = requested_text if websocket_session_id == requesting_websocket_session_id else text
+            if self._enqueue(websocket_session_id, user_id, frame, streaming):
+                connection_count += 1
             
         return connection_count
 
-manager = ConnectionManager()
+    async def _close(self, websocket: WebSocket):
+        """
+        Close a WebSocket that is no longer tracked, ignoring errors if it is already closed.
+        
+        Args:
+            websocket (WebSocket): The WebSocket connection to close.
+        """
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+manager = ConnectionManager(settings.WEBSOCKET_HEARTBEAT_INTERVAL, settings.WEBSOCKET_IDLE_TIMEOUT, settings.WEBSOCKET_MAX_CONNECTIONS_PER_USER)
 
 async def start_connection_manager():
     """
@@ -192,4 +595,4 @@ async def start_connection_manager():
     
     Call this from your application startup to begin periodic health checks.
     """
-    await manager.start_health_check() 
\ No newline at end of file
+    await manager.start_health_check() 
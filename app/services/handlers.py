@@ -0,0 +1,89 @@
+from app.services.logging import logger
+from app.services.metrics import metrics
+from pydantic import ValidationError
+import time
+
+"""
+Handler Registry Service for the Halo Application.
+
+This module maps websocket message types to their handlers and measures them.
+Messages are validated against their typed models (see WebSocketMessage in
+app.models.requests) before dispatch, and handlers receive the validated payload
+as a dict holding only the fields the client sent.
+
+For each message type it records:
+- The number of messages handled
+- The number of messages whose handler raised
+- A latency histogram of handler run time
+
+The metrics are exposed by the /metrics endpoint.
+"""
+
+metrics.counter('websocket_messages_total', 'Websocket messages handled, by type.')
+metrics.counter('websocket_message_errors_total', 'Websocket messages whose handler raised, by type.')
+metrics.counter('websocket_invalid_messages_total', 'Websocket messages that failed validation, by type.')
+metrics.histogram('websocket_message_seconds', 'Seconds spent handling websocket messages, by type.',
+                  buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120))
+
+class HandlerRegistry:
+    """
+    Registry of websocket message handlers, keyed by message type.
+    """
+    def __init__(self, adapter):
+        """
+        Initialize an empty registry.
+
+        Args:
+            adapter (TypeAdapter): Validates raw messages into their typed models.
+        """
+        self.adapter = adapter
+        self.handlers = {}
+
+    def register(self, type: str, handler):
+        """
+        Register the handler for a message type.
+
+        Args:
+            type (str): The message type.
+            handler (function): Async function taking (websocket_session_id, user_id, data).
+        """
+        self.handlers[type] = handler
+
+    def parse(self, raw):
+        """
+        Validate a raw message against the model for its type.
+
+        Args:
+            raw: The decoded JSON message.
+        Returns:
+            tuple: The validated message and None, or None and a list of validation errors.
+        """
+        try:
+            return self.adapter.validate_python(raw), None
+        except ValidationError as e:
+            type = raw.get('type') if isinstance(raw, dict) else None
+            metrics.inc('websocket_invalid_messages_total', type=type if isinstance(type, str) and type in self.handlers else 'unknown')
+            return None, [{'loc': error['loc'], 'msg': error['msg']} for error in e.errors()]
+
+    async def dispatch(self, websocket_session_id: str, user_id: str, message):
+        """
+        Run the handler for a validated message, recording its count, errors and latency.
+
+        Args:
+            websocket_session_id (str): The ID of the websocket session.
+            user_id (str): The ID of the user sending the message.
+            message: The validated message.
+        Returns:
+            bool: True if the handler succeeded.
+        """
+        started_at = time.monotonic()
+        try:
+            await self.handlers[message.type](websocket_session_id, user_id, message.data.model_dump(exclude_unset=True))
+            return True
+        except Exception as e:
+            metrics.inc('websocket_message_errors_total', type=message.type)
+            logger.error(f"Error processing message {message.type}: {e}")
+            return False
+        finally:
+            metrics.inc('websocket_messages_total', type=message.type)
+            metrics.observe('websocket_message_seconds', time.monotonic() - started_at, type=message.type)
@@ -0,0 +1,171 @@
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from app.config import settings
+import base64
+
+"""
+Key Ring Service for the Halo Application.
+
+This module provides a versioned key ring for field-level encryption.
+Each key is derived once per process and every ciphertext is tagged with
+the version of the key that produced it, so keys can be rotated without
+re-deriving them or guessing which key to use.
+
+Ciphertext format:
+- "v<version>:<fernet token>" for tagged ciphertexts
+- "<fernet token>" for legacy ciphertexts written before key versioning
+
+Legacy ciphertexts are decrypted by trying every key in the ring, newest first.
+
+The module also holds the HMAC key used for blind indexes, which must stay
+stable across cipher rotations so existing index values remain searchable.
+"""
+
+KDF_ITERATIONS = 100000
+
+def derive_key(cipher: str) -> Fernet:
+    """
+    Derive a Fernet key from a cipher using PBKDF2-HMAC-SHA256.
+
+    Args:
+        cipher (str): The cipher to derive the key from.
+    Returns:
+        Fernet: The derived key.
+    Note:
+        This is deliberately slow; use the key ring instead of calling it per operation.
+    """
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=cipher.encode(),
+        iterations=KDF_ITERATIONS,
+    )
+    return Fernet(base64.urlsafe_b64encode(kdf.derive(cipher.encode())))
+
+def derive_blind_index_key(secret: str) -> bytes:
+    """
+    Derive the HMAC key used for blind indexes.
+
+    Args:
+        secret (str): The secret to derive the key from.
+    Returns:
+        bytes: The derived HMAC key.
+    """
+    hkdf = HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b"halo-blind-index",
+    )
+    return hkdf.derive(secret.encode())
+
+class KeyRing:
+    """
+    Versioned set of Fernet keys.
+    Encrypts with the current key and decrypts with whichever key the ciphertext is tagged with.
+    """
+    def __init__(self, ciphers: dict, current_version: int):
+        """
+        Initialize the key ring and derive every key once.
+
+        Args:
+            ciphers (dict): Mapping of key version to cipher.
+            current_version (int): The version used for new ciphertexts.
+        Raises:
+            ValueError: If the current version has no cipher.
+        """
+        if current_version not in ciphers:
+            raise ValueError(f"No cipher configured for current key version {current_version}")
+        self.current_version = current_version
+        self.keys = {version: derive_key(cipher) for version, cipher in ciphers.items()}
+        self.prefix = self.tag(current_version)
+        self.newest_first = [self.keys[current_version]] + [key for version, key in sorted(self.keys.items(), reverse=True) if version != current_version]
+
+    @staticmethod
+    def tag(version: int) -> str:
+        """
+        Get the ciphertext prefix for a key version.
+
+        Args:
+            version (int): The key version.
+        Returns:
+            str: The ciphertext prefix.
+        """
+        return f"v{version}:"
+
+    def version_of(self, encrypted_data: str):
+        """
+        Get the key version a ciphertext is tagged with.
+
+        Args:
+            encrypted_data (str): The ciphertext.
+        Returns:
+            int: The key version, or None for legacy untagged ciphertexts.
+        """
+        if encrypted_data.startswith("v"):
+            version, _, _ = encrypted_data[1:].partition(":")
+            if version.isdigit():
+                return int(version)
+        return None
+
+    def encrypt(self, data: str) -> str:
+        """
+        Encrypt data with the current key.
+
+        Args:
+            data (str): The data to encrypt.
+        Returns:
+            str: The tagged ciphertext.
+        """
+        return self.prefix + self.keys[self.current_version].encrypt(data.encode()).decode()
+
+    def decrypt(self, encrypted_data: str) -> str:
+        """
+        Decrypt a tagged or legacy ciphertext.
+
+        Args:
+            encrypted_data (str): The ciphertext.
+        Returns:
+            str: The decrypted data.
+        Raises:
+            InvalidToken: If no key in the ring can decrypt the ciphertext.
+        """
+        version = self.version_of(encrypted_data)
+        if version is not None:
+            if version not in self.keys:
+                raise InvalidToken(f"Unknown key version {version}")
+            token = encrypted_data[len(self.tag(version)):]
+            return self.keys[version].decrypt(token.encode()).decode()
+        for key in self.newest_first:
+            try:
+                return key.decrypt(encrypted_data.encode()).decode()
+            except InvalidToken:
+                continue
+        raise InvalidToken("No key in the key ring can decrypt this value")
+
+    def needs_rotation(self, encrypted_data: str) -> bool:
+        """
+        Check whether a ciphertext was produced by anything other than the current key.
+
+        Args:
+            encrypted_data (str): The ciphertext.
+        Returns:
+            bool: True if the ciphertext should be re-encrypted.
+        """
+        return bool(encrypted_data) and not encrypted_data.startswith(self.prefix)
+
+    def rotate(self, encrypted_data: str) -> str:
+        """
+        Re-encrypt a ciphertext with the current key.
+
+        Args:
+            encrypted_data (str): The ciphertext.
+        Returns:
+            str: The ciphertext tagged with the current key version.
+        """
+        return self.encrypt(self.decrypt(encrypted_data))
+
+blind_index_key = derive_blind_index_key(settings.BLIND_INDEX_KEY or settings.CIPHER)
+keyring = KeyRing({**settings.CIPHER_PREVIOUS, settings.CIPHER_VERSION: settings.CIPHER}, settings.CIPHER_VERSION)
@@ -0,0 +1,181 @@
+import bisect
+
+"""
+Metrics Service for the Halo Application.
+
+This module provides a small in-process metrics registry for the application.
+It supports three kinds of metrics:
+- Counters, which only increase (e.g. frames dropped)
+- Gauges, which are read from a callback when metrics are collected (e.g. queue depth)
+- Histograms, which count observations into buckets (e.g. send latency in seconds)
+
+Metrics can carry labels, and are rendered in the Prometheus text exposition format
+by the /metrics endpoint.
+"""
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+def format_labels(labels):
+    """
+    Format a label tuple for the Prometheus text format.
+
+    Args:
+        labels (tuple): Sorted (name, value) pairs.
+    Returns:
+        str: The formatted labels, or an empty string if there are none.
+    """
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels) + '}'
+
+class Histogram:
+    """
+    Bucketed counts of observed values, plus their count and sum.
+    """
+    def __init__(self, buckets):
+        """
+        Initialize the histogram.
+
+        Args:
+            buckets (tuple): Increasing bucket upper bounds.
+        """
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """
+        Record an observation.
+
+        Args:
+            value (float): The observed value.
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+class Metrics:
+    """
+    Registry of named counters, gauges and histograms.
+    """
+    def __init__(self):
+        """
+        Initialize an empty registry.
+        """
+        self.descriptions = {}
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def counter(self, name, description):
+        """
+        Declare a counter.
+
+        Args:
+            name (str): The metric name.
+            description (str): What the counter counts.
+        """
+        self.descriptions[name] = ('counter', description)
+        self.counters.setdefault(name, {})
+
+    def gauge(self, name, description, read):
+        """
+        Declare a gauge read from a callback.
+
+        Args:
+            name (str): The metric name.
+            description (str): What the gauge measures.
+            read (function): Returns the current value, or a dict of label tuples to values.
+        """
+        self.descriptions[name] = ('gauge', description)
+        self.gauges[name] = read
+
+    def histogram(self, name, description, buckets=DEFAULT_BUCKETS):
+        """
+        Declare a histogram.
+
+        Args:
+            name (str): The metric name.
+            description (str): What the histogram observes.
+            buckets (tuple, optional): Increasing bucket upper bounds. Defaults to DEFAULT_BUCKETS.
+        """
+        self.descriptions[name] = ('histogram', description)
+        self.histograms.setdefault(name, {'buckets': buckets, 'series': {}})
+
+    def inc(self, name, amount=1, **labels):
+        """
+        Increase a counter.
+
+        Args:
+            name (str): The counter name.
+            amount (float, optional): The amount to add. Defaults to 1.
+            **labels: The counter's labels.
+        """
+        series = self.counters[name]
+        key = tuple(sorted(labels.items()))
+        series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        """
+        Record an observation in a histogram.
+
+        Args:
+            name (str): The histogram name.
+            value (float): The observed value.
+            **labels: The histogram's labels.
+        """
+        histogram = self.histograms[name]
+        key = tuple(sorted(labels.items()))
+        if key not in histogram['series']:
+            histogram['series'][key] = Histogram(histogram['buckets'])
+        histogram['series'][key].observe(value)
+
+    def read_gauge(self, name):
+        """
+        Read a gauge's current values.
+
+        Args:
+            name (str): The gauge name.
+        Returns:
+            dict: Label tuples mapped to values.
+        """
+        value = self.gauges[name]()
+        if isinstance(value, dict):
+            return value
+        return {(): value}
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics text.
+        """
+        lines = []
+        for name, (kind, description) in sorted(self.descriptions.items()):
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'counter':
+                for labels, value in self.counters[name].items():
+                    lines.append(f'{name}{format_labels(labels)} {value}')
+            elif kind == 'gauge':
+                try:
+                    for labels, value in self.read_gauge(name).items():
+                        lines.append(f'{name}{format_labels(labels)} {value}')
+                except Exception:
+                    continue
+            else:
+                for labels, histogram in self.histograms[name]['series'].items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{format_labels(labels + (("le", bound),))} {cumulative}')
+                    lines.append(f'{name}_bucket{format_labels(labels + (("le", "+Inf"),))} {histogram.count}')
+                    lines.append(f'{name}_sum{format_labels(labels)} {histogram.sum}')
+                    lines.append(f'{name}_count{format_labels(labels)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
@@ -0,0 +1,83 @@
+from collections import deque
+import time
+import uuid
+
+"""
+Replay Buffer Service for the Halo Application.
+
+This module keeps a bounded buffer of recent broadcast events per user so a client
+that briefly loses its websocket can resume where it left off instead of reloading
+everything.
+
+Every non-streaming broadcast gets a per-user sequence number, sent to clients as
+"seq". Streaming frames (partial notes and templates) are neither numbered nor
+buffered, since the final message of a generation carries its full result.
+
+Resume tokens have the form "<epoch>:<seq>". The epoch identifies the process that
+numbered the events; sequence numbers from another process, or from before a
+restart, cannot be replayed.
+"""
+
+EPOCH = uuid.uuid4().hex
+
+def parse_resume_token(token: str):
+    """
+    Parse a resume token.
+
+    Args:
+        token (str): The token, "<epoch>:<seq>".
+    Returns:
+        int: The last sequence number the client saw, or None if the token is malformed
+        or belongs to another epoch.
+    """
+    epoch, _, seq = (token or "").partition(":")
+    if epoch != EPOCH or not seq.isdigit():
+        return None
+    return int(seq)
+
+class ReplayBuffer:
+    """
+    Ring buffer of a user's recent events, with the user's sequence counter.
+    """
+    def __init__(self, max_size: int):
+        """
+        Initialize the buffer.
+
+        Args:
+            max_size (int): Maximum number of events kept.
+        """
+        self.seq = 0
+        self.events = deque(maxlen=max_size)
+        self.touched_at = time.monotonic()
+
+    def append(self, message: dict, protocol: int = None) -> int:
+        """
+        Number an event and keep it.
+
+        Args:
+            message (dict): The broadcast message.
+            protocol (int, optional): The streaming protocol version the event was limited to, if any.
+        Returns:
+            int: The event's sequence number.
+        """
+        self.seq += 1
+        self.events.append((self.seq, message, protocol))
+        self.touched_at = time.monotonic()
+        return self.seq
+
+    def since(self, seq: int):
+        """
+        Get the events after a sequence number.
+
+        Args:
+            seq (int): The last sequence number the client saw.
+        Returns:
+            list: (seq, message, protocol) tuples in order, or None if some of the events
+            after seq are no longer buffered or seq is in the future.
+        """
+        if seq > self.seq:
+            return None
+        oldest = self.events[0][0] if self.events else self.seq + 1
+        if seq + 1 < oldest:
+            return None
+        return [event for event in self.events if event[0] > seq]
@@ -0,0 +1,132 @@
+from typing import Dict, List, Tuple
+
+"""
+Streaming Protocol Service for the Halo Application.
+
+This module tracks in-progress generations (notes, templates) so they can be
+streamed to clients as append-only deltas instead of the full text so far.
+
+Protocol versions:
+- LEGACY_PROTOCOL (1): every update carries the full text so far, e.g.
+  {"type": "note_generated", "data": {"visit_id", "status": "GENERATING_NOTE", "note"}}
+- DELTA_PROTOCOL (2): every update carries only the new text of one section:
+  {"type": "note_delta", "data": {"visit_id", "seq", "section", "offset", "delta"}}
+  The client truncates the section to `offset` characters and appends `delta`.
+  `seq` increases by one per delta within a stream, so a client that sees a gap
+  (for example because a slow connection had streaming frames dropped) sends
+  {"type": "resync_stream", "data": {"visit_id"}} and receives a resync message
+  carrying the full text of every section:
+  {"type": "note_resync", "data": {"visit_id", "seq", "sections": [{"name", "text"}]}}
+  Deltas with a seq at or below the resync's seq are already included in it.
+
+Templates use the same format with template_delta/template_resync and template_id,
+as a single unnamed section. The final FINISHED message is the same in both versions.
+"""
+
+LEGACY_PROTOCOL = 1
+DELTA_PROTOCOL = 2
+
+class Stream:
+    """
+    The sections generated so far for one generation, and its delta sequence number.
+    """
+    def __init__(self, user_id: str, section_names: List[str]):
+        """
+        Initialize the stream.
+
+        Args:
+            user_id (str): The ID of the user the generation belongs to.
+            section_names (list): The names of the sections, in order.
+        """
+        self.user_id = user_id
+        self.section_names = section_names
+        self.texts = {}
+        self.seq = 0
+
+    def update(self, section: str, text: str) -> dict:
+        """
+        Record a section's text so far and compute the delta from the previous update.
+
+        Args:
+            section (str): The section name.
+            text (str): The section's full text so far.
+        Returns:
+            dict: The delta's seq, section, offset and delta text.
+        """
+        previous = self.texts.get(section, "")
+        offset = len(previous) if text.startswith(previous) else 0
+        self.texts[section] = text
+        self.seq += 1
+        return {'seq': self.seq, 'section': section, 'offset': offset, 'delta': text[offset:]}
+
+    def snapshot(self) -> dict:
+        """
+        Get the full text of every section generated so far.
+
+        Returns:
+            dict: The current seq and the sections, in order.
+        """
+        sections = [{'name': name, 'text': self.texts[name]} for name in self.section_names if name in self.texts]
+        return {'seq': self.seq, 'sections': sections}
+
+    def combined(self) -> str:
+        """
+        Combine the sections generated so far into one text, as sent to legacy clients.
+
+        Returns:
+            str: The sections in order, each named section under a bold heading.
+        """
+        combined = ""
+        for name in self.section_names:
+            if name in self.texts:
+                if name:
+                    combined += f"**{name}**\n{self.texts[name]}\n\n"
+                else:
+                    combined += f"{self.texts[name]}\n\n"
+        return combined.strip()
+
+streams: Dict[Tuple[str, str], Stream] = {}
+
+def open_stream(kind: str, id: str, user_id: str, section_names: List[str]) -> Stream:
+    """
+    Start tracking a generation.
+
+    Args:
+        kind (str): 'note' or 'template'.
+        id (str): The ID of the visit or template being generated.
+        user_id (str): The ID of the user the generation belongs to.
+        section_names (list): The names of the sections, in order.
+    Returns:
+        Stream: The new stream, replacing any earlier stream for the same generation.
+    """
+    stream = Stream(user_id, section_names)
+    streams[(kind, id)] = stream
+    return stream
+
+def close_stream(kind: str, id: str, stream: Stream):
+    """
+    Stop tracking a generation, unless a newer stream has replaced it.
+
+    Args:
+        kind (str): 'note' or 'template'.
+        id (str): The ID of the visit or template.
+        stream (Stream): The stream to close.
+    """
+    if streams.get((kind, id)) is stream:
+        del streams[(kind, id)]
+
+def get_stream(kind: str, id: str, user_id: str):
+    """
+    Get an in-progress generation.
+
+    Args:
+        kind (str): 'note' or 'template'.
+        id (str): The ID of the visit or template.
+        user_id (str): The ID of the user asking for it.
+    Returns:
+        Stream: The stream, or None if there is none in progress for this user.
+    """
+    stream = streams.get((kind, id))
+    if stream is None or stream.user_id != user_id:
+        return None
+    return stream
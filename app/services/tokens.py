@@ -0,0 +1,142 @@
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from datetime import datetime
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+
+"""
+Session Token Service for the Halo Application.
+
+This module provides stateless session tokens for the 'signed' session backend.
+A token carries the user id, its expiry and a random token id, signed with
+HMAC-SHA256, so it can be verified without a database lookup.
+
+Token format:
+- "<base64url payload>.<base64url signature>"
+- The payload is compact JSON: {"u": user_id, "e": expiry as a Unix timestamp, "i": token id}
+
+Signed tokens cannot be deleted, so sign-out adds the token id to a revocation
+list that is checked during verification. Revocations only need to be kept
+until the revoked token would have expired anyway.
+"""
+
+def derive_session_signing_key(secret: str) -> bytes:
+    """
+    Derive the HMAC key used to sign session tokens.
+
+    Args:
+        secret (str): The secret to derive the key from.
+    Returns:
+        bytes: The derived HMAC key.
+    """
+    hkdf = HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b"halo-session-token",
+    )
+    return hkdf.derive(secret.encode())
+
+def b64encode(data: bytes) -> str:
+    """
+    Encode bytes as unpadded base64url.
+    """
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def b64decode(data: str) -> bytes:
+    """
+    Decode unpadded base64url.
+    """
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+class SessionSigner:
+    """
+    Signs and verifies session tokens, and holds the in-process revocation list.
+    """
+    def __init__(self, key: bytes):
+        """
+        Initialize the signer.
+
+        Args:
+            key (bytes): The HMAC key.
+        """
+        self.key = key
+        self.revoked = {}
+
+    def signature(self, payload: str) -> str:
+        """
+        Compute the signature of an encoded payload.
+        """
+        return b64encode(hmac.new(self.key, payload.encode(), hashlib.sha256).digest())
+
+    def sign(self, user_id: str, expiration_date: datetime) -> str:
+        """
+        Create a signed session token.
+
+        Args:
+            user_id (str): The ID of the user the session belongs to.
+            expiration_date (datetime): When the session expires, in UTC.
+        Returns:
+            str: The session token.
+        """
+        claims = {'u': user_id, 'e': int((expiration_date - datetime(1970, 1, 1)).total_seconds()), 'i': secrets.token_urlsafe(9)}
+        payload = b64encode(json.dumps(claims, separators=(',', ':')).encode())
+        return f"{payload}.{self.signature(payload)}"
+
+    def decode(self, token: str):
+        """
+        Check a session token's signature and read its claims.
+
+        Args:
+            token (str): The session token.
+        Returns:
+            dict: The token's user_id, token_id and expiration_date, or None if the token
+            is malformed or tampered with. Expiry and revocation are not checked.
+        """
+        payload, _, signature = token.partition(".")
+        if not signature or not hmac.compare_digest(signature, self.signature(payload)):
+            return None
+        try:
+            claims = json.loads(b64decode(payload))
+            return {'user_id': claims['u'], 'token_id': claims['i'], 'expiration_date': datetime.utcfromtimestamp(claims['e'])}
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def verify(self, token: str):
+        """
+        Verify a session token.
+
+        Args:
+            token (str): The session token.
+        Returns:
+            dict: The token's user_id, token_id and expiration_date, or None if the token
+            is malformed, tampered with, expired or revoked.
+        """
+        claims = self.decode(token)
+        if not claims or claims['expiration_date'] <= datetime.utcnow() or claims['token_id'] in self.revoked:
+            return None
+        return claims
+
+    def revoke(self, token_id: str, expiration_date: datetime):
+        """
+        Add a token id to the revocation list until the token expires.
+
+        Args:
+            token_id (str): The token id.
+            expiration_date (datetime): When the token expires.
+        """
+        self.revoked[token_id] = expiration_date
+
+    def merge_revocations(self, revoked: dict):
+        """
+        Merge revocations made by other processes, dropping revocations of tokens that have expired.
+
+        Args:
+            revoked (dict): Token ids mapped to their expiration dates.
+        """
+        now = datetime.utcnow()
+        merged = {**self.revoked, **revoked}
+        self.revoked = {token_id: expiration_date for token_id, expiration_date in merged.items() if expiration_date > now}
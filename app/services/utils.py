@@ -1,9 +1,6 @@
-from cryptography.fernet import Fernet
-from app.config import settings
-import base64
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from app.services.keyring import keyring, blind_index_key
 import hashlib
+import hmac
 
 """
 Utils Service for the Halo Application.
@@ -18,17 +15,11 @@ def get_encryption_key():
     Args:
         None
     Returns:
-        Fernet: The encryption key for the application.
+        Fernet: The current encryption key from the key ring.
+    Note:
+        Keys are derived once per process by the key ring.
     """
-    salt = settings.CIPHER.encode()
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=salt,
-        iterations=100000,
-    )
-    key = base64.urlsafe_b64encode(kdf.derive(settings.CIPHER.encode()))
-    return Fernet(key)
+    return keyring.keys[keyring.current_version]
 
 def encrypt(data: str) -> str:
     """
@@ -37,13 +28,12 @@ def encrypt(data: str) -> str:
     Args:
         data (str): The data to encrypt.
     Returns:
-        str: The encrypted data.
+        str: The encrypted data, tagged with the current key version.
     """
     if not data:
         return data
         
-    f = get_encryption_key()
-    return f.encrypt(data.encode()).decode()
+    return keyring.encrypt(data)
 
 def decrypt(encrypted_data: str) -> str:
     """
@@ -57,8 +47,7 @@ def decrypt(encrypted_data: str) -> str:
     if not encrypted_data:
         return encrypted_data
         
-    f = get_encryption_key()
-    return f.decrypt(encrypted_data.encode()).decode() 
+    return keyring.decrypt(encrypted_data)
 
 def hash_password(password: str) -> str:
     """
@@ -69,4 +58,28 @@ def hash_password(password: str) -> str:
     Returns:
         str: The hashed password.
     """
-    return hashlib.sha256(password.encode()).hexdigest()
\ No newline at end of file
+    return hashlib.sha256(password.encode()).hexdigest()
+
+def normalize_email(email: str) -> str:
+    """
+    Normalize an email address for comparison.
+
+    Args:
+        email (str): The email address to normalize.
+    Returns:
+        str: The trimmed, lower-cased email address.
+    """
+    return email.strip().lower()
+
+def email_index(email: str) -> str:
+    """
+    Compute the keyed blind index for an email address.
+
+    Args:
+        email (str): The email address to index.
+    Returns:
+        str: The HMAC-SHA256 of the normalized email, as hex.
+    Note:
+        The index supports equality lookups without decrypting stored emails.
+    """
+    return hmac.new(blind_index_key, normalize_email(email).encode(), hashlib.sha256).hexdigest()
@@ -0,0 +1,57 @@
+from app.config import settings
+from app.services.keyring import derive_key
+from app.services.utils import encrypt, decrypt
+import time
+
+"""
+Field Encryption Benchmark for the Halo Application.
+
+Compares the per-field cost of encrypting and decrypting with a key derived
+on every call (the previous behaviour) against the process-wide key ring.
+
+Usage:
+    python -m benchmarks.encryption
+"""
+
+FIELD = "Patient reports intermittent chest pain for the past two weeks." * 4
+
+def legacy_encrypt(data: str) -> str:
+    """
+    Encrypt by deriving the key on every call.
+    """
+    return derive_key(settings.CIPHER).encrypt(data.encode()).decode()
+
+def legacy_decrypt(encrypted_data: str) -> str:
+    """
+    Decrypt by deriving the key on every call.
+    """
+    return derive_key(settings.CIPHER).decrypt(encrypted_data.encode()).decode()
+
+def measure(function, argument, iterations):
+    """
+    Measure the mean cost of a function call in milliseconds.
+    """
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function(argument)
+    return (time.perf_counter() - start) / iterations * 1000
+
+def main():
+    """
+    Run the benchmark and print per-field costs.
+    """
+    legacy_token = legacy_encrypt(FIELD)
+    token = encrypt(FIELD)
+    results = [
+        ("encrypt (per-call PBKDF2)", measure(legacy_encrypt, FIELD, 20)),
+        ("decrypt (per-call PBKDF2)", measure(legacy_decrypt, legacy_token, 20)),
+        ("encrypt (key ring)", measure(encrypt, FIELD, 2000)),
+        ("decrypt (key ring)", measure(decrypt, token, 2000)),
+        ("decrypt legacy token (key ring)", measure(decrypt, legacy_token, 2000)),
+    ]
+    for name, milliseconds in results:
+        print(f"{name:<34} {milliseconds:10.4f} ms/field")
+    print(f"{'listing 20 visits (4 fields each)':<34} {results[1][1] * 80:10.1f} ms -> {results[3][1] * 80:.1f} ms")
+
+if __name__ == "__main__":
+    main()